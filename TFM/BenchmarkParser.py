@@ -0,0 +1,101 @@
+import importlib.util
+import sys
+import time
+
+from extraccion import crear_soup, ld_json_noticia, campos_noticia, comentarios_desde_soup, articulos_portada
+
+# Backends de BeautifulSoup que se comparan en las noticias. Los que no estén instalados se omiten
+PARSERS = ['html.parser', 'lxml', 'html5lib']
+# La portada no usa BeautifulSoup: se indexa con un parser por eventos, el de lxml o el de la
+# biblioteca estándar (html.parser). html5lib no tiene parser por eventos
+PARSERS_PORTADA = ['html.parser', 'lxml']
+REPETICIONES = 5
+
+
+def extraer_noticia(html, parser):
+    """Misma extracción que hace el scraper sobre cada noticia: JSON-LD, campos y comentarios."""
+    soup = crear_soup(html, parser)
+    ld_json_content = ld_json_noticia(html)
+    datos = campos_noticia(ld_json_content) if ld_json_content else {}
+    datos['comentarios'] = comentarios_desde_soup(soup)
+    return datos
+
+
+def parser_instalado(parser):
+    try:
+        crear_soup('', parser)
+        return True
+    except Exception:
+        return False
+
+
+def parser_eventos_instalado(parser):
+    """True si `articulos_portada` puede usar `parser`; sin lxml usaría html.parser sin avisar."""
+    return parser != 'lxml' or importlib.util.find_spec('lxml') is not None
+
+
+def medir(paginas, extraer, parser, repeticiones=REPETICIONES):
+    """
+    Devuelve el mejor tiempo (en segundos) de aplicar `extraer` a todas las páginas con `parser`.
+    """
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for html in paginas.values():
+            extraer(html, parser)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def comparar(titulo, paginas, extraer, parsers, instalado, repeticiones=REPETICIONES):
+    """
+    Aplica `extraer` a las páginas con cada parser, comprueba que el resultado es el mismo
+    que con 'html.parser' y muestra los tiempos.
+    """
+    print(titulo)
+    referencia = {ruta: extraer(html, 'html.parser') for ruta, html in paginas.items()}
+    tiempo_referencia = None
+
+    for parser in parsers:
+        if not instalado(parser):
+            print(f"  {parser}: no instalado")
+            continue
+
+        diferencias = [ruta for ruta, html in paginas.items() if extraer(html, parser) != referencia[ruta]]
+        tiempo = medir(paginas, extraer, parser, repeticiones)
+        if tiempo_referencia is None:
+            tiempo_referencia = tiempo
+
+        print(f"  {parser}: {tiempo * 1000:.1f} ms ({tiempo_referencia / tiempo:.1f}x)")
+        for ruta in diferencias:
+            print(f"    Resultado distinto al de html.parser en {ruta}")
+
+
+def comparar_parsers(rutas, repeticiones=REPETICIONES):
+    """
+    Analiza páginas guardadas con cada backend y muestra los tiempos por separado:
+    la extracción de las noticias con BeautifulSoup (`crear_soup`) y el índice de la
+    portada con el parser por eventos (`articulos_portada`).
+
+    Parámetros:
+    rutas (list): Rutas de ficheros HTML guardados (portadas o noticias).
+    repeticiones (int): Veces que se repite la medida; se muestra la mejor.
+    """
+    paginas = {}
+    for ruta in rutas:
+        with open(ruta, encoding='utf-8') as f:
+            paginas[ruta] = f.read()
+
+    comparar("Noticias (BeautifulSoup):", paginas, extraer_noticia, PARSERS, parser_instalado, repeticiones)
+    comparar("Portada (parser por eventos):", paginas, articulos_portada, PARSERS_PORTADA,
+             parser_eventos_instalado, repeticiones)
+
+
+if __name__ == "__main__":
+    # Uso: python BenchmarkParser.py portada.html noticia1.html noticia2.html ...
+    rutas = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not rutas:
+        print("Indica las páginas HTML guardadas que se quieren analizar.")
+        sys.exit(1)
+    comparar_parsers(rutas)
@@ -1,18 +1,25 @@
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-import json
+import asyncio
 import time
 import os
-from datetime import datetime
-from urllib.parse import urlparse
-import google.generativeai as genai
 from ibm_watson import NaturalLanguageUnderstandingV1
 from ibm_watson.natural_language_understanding_v1 import Features, EntitiesOptions, KeywordsOptions, ConceptsOptions, SentimentOptions
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-from pymongo import MongoClient  # Importación para la conexión con Azure Cosmos DB
+import sesion_http
+from limites_proveedores import ProveedorNoDisponible, resultado_pendiente, es_pendiente
+from cache_enriquecimiento import en_cache, resumen_cache
+from sentimiento_gemini import analizar_sentimientos
+from sentimiento_local import resumen_triaje
+from navegador import PoolNavegadores, NUM_NAVEGADORES, preparar_pagina, extraer_comentarios, extraer_relacionadas, resumen_esperas
+from extraccion import crear_soup, ld_json_noticia, campos_noticia, comentarios_desde_soup, necesita_navegador, sin_senal_comentarios, articulos_portada, relacionadas_desde_soup
+from comentarios import obtener_comentarios
+from concurrencia import NUM_TRABAJADORES, procesar_en_orden, turno_host, turno_host_async
+from motor_async import crear_cliente, obtener_texto, en_hilo, procesar_en_orden_async, ejecutar
+from sumideros import crear_sumideros
+from planificacion import (
+    MAX_SECCIONES, MAX_ARTICULOS_POR_SECCION, PROFUNDIDAD_RELACIONADAS,
+    Presupuesto, es_noticia, planificar, articulos_relacionados, unir_relacionadas,
+)
+from registro_noticias import abrir_registro
 
 from dotenv import load_dotenv
 import os
@@ -37,224 +44,428 @@ IBM_URL = os.getenv("IBM_URL")
 CONNECTION_STRING = os.getenv("COSMOS_CONNECTION_STRING")
 DATABASE_NAME = os.getenv("COSMOS_DATABASE_NAME")
 
-# Configurar modelo de análisis de sentimientos
-generation_config = {
-    "temperature": 1,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 8192,
-    "response_mime_type": "text/plain",
-}
-
-# Crear modelo para análisis de sentimientos
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=generation_config,
-    system_instruction="Tu tarea será categorizar comentarios en Positivo, Negativo o Neutral, añadiendo un porcentaje de confianza. No hace falta que digas nada más. Ejemplo: NEGATIVO Confianza: 95%",
-)
+# 'estatico': las noticias se descargan sin navegador y solo se abre Selenium si hace falta
+# 'selenium': todas las noticias se abren con el navegador
+# Por defecto se usa Selenium hasta comprobar el selector de comentarios (.comment) y el
+# endpoint de comentarios con páginas reales; el modo estático hay que activarlo a propósito
+MODO_EXTRACCION = os.getenv("MODO_EXTRACCION", "selenium")
+
+# Versiones de las APIs, que forman parte de la clave de la caché de análisis
+VERSION_NLU = '2021-08-01'
 
 authenticator = IAMAuthenticator(IBM_API_KEY)
 nlu = NaturalLanguageUnderstandingV1(
-    version='2021-08-01',
+    version=VERSION_NLU,
     authenticator=authenticator
 )
 nlu.set_service_url(IBM_URL)
-
-def conectar_a_cosmos(connection_string, db_name, collection_name):
-    try:
-        client = MongoClient(connection_string)
-        db = client[db_name]
-        print(f"Conectado a la base de datos: {db_name}")
-
-        if collection_name not in db.list_collection_names():
-            print(f"La colección '{collection_name}' no existe. Creándola...")
-            db.create_collection(collection_name)
-        else:
-            print(f"La colección '{collection_name}' ya existe.")
-
-        return db[collection_name]
-    except Exception as e:
-        print(f"Error al conectar a Cosmos DB: {e}")
-        return None
-
-def insertar_datos(collection, datos):
-    try:
-        if isinstance(datos, list):
-            collection.insert_many(datos)
-            print("Datos insertados con éxito en la colección.")
-        else:
-            collection.insert_one(datos)
-            print("Documento insertado con éxito en la colección.")
-    except Exception as e:
-        print(f"Error al insertar datos: {e}")
-
-def extraer_nombre_de_coleccion(url):
-    domain = urlparse(url).netloc.replace('www.', '').split('.')[0]
-    return domain
-
+# IBM NLU usa la sesión HTTP compartida (conexiones reutilizadas, reintentos y timeout)
+sesion_http.configurar_servicio_ibm(nlu)
 
 def analizar_sentimiento(comentario):
-    try:
-        chat_session = model.start_chat(history=[])
-        response = chat_session.send_message(comentario)
-        texto_respuesta = response.text
-
-        if "NEGATIVO" in texto_respuesta:
-            sentimiento = "NEGATIVO"
-        elif "POSITIVO" in texto_respuesta:
-            sentimiento = "POSITIVO"
-        else:
-            sentimiento = "NEUTRAL"
-
-        confianza = int(texto_respuesta.split("Confianza:")[1].strip().replace("%", ""))
-        return {"sentimiento": sentimiento, "confianza": confianza}
-    except Exception as e:
-        print(f"Error al analizar el comentario: {e}")
-        return {"sentimiento": "Indeterminado", "confianza": 0}
+    """Sentimiento de un solo comentario. Para varios, usar analizar_sentimientos (una petición por lote)."""
+    return analizar_sentimientos([comentario])[0]
 
 
 def analizar_con_ibm_nlu(texto):
+    """Análisis de IBM Watson NLU de un texto. Un texto ya analizado se toma de la caché."""
+    return en_cache("ibm_nlu", VERSION_NLU, texto, lambda: _analizar_con_ibm_nlu(texto))
+
+
+def _analizar_con_ibm_nlu(texto):
     try:
-        response = nlu.analyze(
-            text=texto,
-            features=Features(
-                entities=EntitiesOptions(sentiment=True, limit=5),
-                keywords=KeywordsOptions(sentiment=True, limit=5),
-                concepts=ConceptsOptions(limit=5),
-                sentiment=SentimentOptions()
-            )
-        ).get_result()
+        with sesion_http.medir("ibm_nlu"):
+            response = nlu.analyze(
+                text=texto,
+                features=Features(
+                    entities=EntitiesOptions(sentiment=True, limit=5),
+                    keywords=KeywordsOptions(sentiment=True, limit=5),
+                    concepts=ConceptsOptions(limit=5),
+                    sentiment=SentimentOptions()
+                )
+            ).get_result()
 
         return response
+    except ProveedorNoDisponible:
+        return resultado_pendiente({})
     except Exception as e:
         print(f"Error al analizar el texto con IBM NLU: {e}")
         return {}
 
 
-def extraer_datos_selenium(url_noticia):
+def extraer_datos_selenium(url_noticia, pool=None):
     """
     Función para abrir una noticia en Selenium, hacer scroll, aceptar cookies y extraer datos como JSON-LD y comentarios.
     
     Parámetros:
     url_noticia (str): URL de la noticia que se va a procesar.
+    pool (PoolNavegadores): Pool del que se toma prestado el navegador. Si no se indica,
+        se abre un navegador solo para esta noticia.
 
     Retorna:
     dict: Diccionario con los datos extraídos de la noticia.
     """
-    # Usamos las rutas establecidas en el contenedor
-    CHROME_DRIVER_PATH = "/usr/bin/chromedriver"
+    if pool is None:
+        with PoolNavegadores(1) as pool_temporal:
+            return extraer_datos_selenium(url_noticia, pool_temporal)
+
+    # El navegador solo se retiene mientras se carga la página; los análisis
+    # posteriores se hacen después de devolverlo al pool
+    with pool.prestar() as driver:
+        # Abrir la página y esperar solo hasta que estén listos cookies, JSON-LD y comentarios
+        preparar_pagina(driver, url_noticia)
+
+        # Obtener el código fuente de la página después de cargar y hacer scroll
+        page_source = driver.page_source
+
+        # Intentar obtener los comentarios
+        try:
+            # Todos los comentarios en una sola llamada al navegador
+            lista_comentarios = extraer_comentarios(driver)
+        except Exception as e:
+            lista_comentarios = None
+            print(f"Error al intentar obtener los comentarios: {e}")
+
+        relacionadas = None
+        if PROFUNDIDAD_RELACIONADAS:
+            # Como los comentarios, se leen en el navegador: el HTML no se analiza con BeautifulSoup
+            try:
+                relacionadas = extraer_relacionadas(driver, url_noticia)
+            except Exception as e:
+                relacionadas = []
+                print(f"Error al intentar obtener las noticias relacionadas: {e}")
+
+    datos_noticia = datos_desde_html(page_source)
+    if relacionadas is not None:
+        datos_noticia['noticias_relacionadas'] = relacionadas
+    return analizar_noticia(datos_noticia, lista_comentarios)
+
+
+def datos_desde_html(html, ld_json_content=None):
+    """
+    Extrae los datos de la noticia a partir del JSON-LD de la página.
+
+    Parámetros:
+    html (str): Código fuente de la noticia.
+    ld_json_content (dict): JSON-LD de la noticia, si ya se ha leído.
+
+    Retorna:
+    dict: Diccionario con los datos de la noticia (vacío si no hay JSON-LD).
+    """
+    if ld_json_content is None:
+        ld_json_content = ld_json_noticia(html)
+    if ld_json_content is None:
+        print("No se encontró el script con el tipo 'application/ld+json'.")
+        return {}
+    return campos_noticia(ld_json_content)
+
+
+def analizar_noticia(datos_noticia, lista_comentarios):
+    """
+    Añade a la noticia el análisis de IBM Watson NLU del cuerpo y el sentimiento de cada comentario.
+
+    Parámetros:
+    datos_noticia (dict): Datos extraídos del JSON-LD.
+    lista_comentarios (list): Comentarios de la noticia, o None si no se pudieron leer.
+
+    Retorna:
+    dict: Los mismos datos con los análisis añadidos.
+    """
+    if 'article_body' in datos_noticia:
+        # Análisis del artículo con IBM Watson NLU
+        datos_noticia['analisis_nlu'] = analizar_con_ibm_nlu(datos_noticia['article_body'])
 
-    # Configurar el servicio de ChromeDriver
-    service = Service(CHROME_DRIVER_PATH)
+    # Análisis de sentimiento de los comentarios
+    if lista_comentarios is not None:
+        # Análisis de sentimiento usando Gemini: todos los comentarios en unas pocas peticiones
+        analisis = analizar_sentimientos([c['texto_comentario'] for c in lista_comentarios])
+        for comentario_data, analisis_sentimiento in zip(lista_comentarios, analisis):
+            comentario_data.update(analisis_sentimiento)
+        datos_noticia['comentarios'] = lista_comentarios
 
-    # Opciones para ejecutar Chrome en modo headless
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--headless")  # Ejecutar en modo sin interfaz gráfica
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.binary_location = "/usr/bin/chromium"  # Ruta para el navegador
+    return datos_noticia
 
-    # Iniciar el navegador
-    driver = webdriver.Chrome(service=service, options=chrome_options)
 
-    # Abrir la página
-    driver.get(url_noticia)
+def sin_cambios(ld_json_content, fecha_anterior):
+    """True si la noticia ya se procesó con el mismo dateModified que tiene ahora."""
+    return (
+        fecha_anterior is not None
+        and ld_json_content is not None
+        and (ld_json_content.get('dateModified') or '') == fecha_anterior
+    )
+
+
+def noticia_sin_cambios(url_noticia, html):
+    """
+    Resultado de una noticia que no ha cambiado desde que se procesó: no se vuelve a analizar
+    ni a guardar, pero con PROFUNDIDAD_RELACIONADAS > 0 se siguen sus noticias relacionadas,
+    que se leen del HTML ya descargado para comprobar el dateModified.
+    """
+    datos_noticia = {'sin_cambios': True}
+    if PROFUNDIDAD_RELACIONADAS:
+        datos_noticia['noticias_relacionadas'] = relacionadas_desde_soup(crear_soup(html), url_noticia)
+    return datos_noticia
+
 
-    # Esperar unos segundos para que el botón de "Aceptar y continuar" se cargue
-    time.sleep(0.7)
+def comprobar_cambios(url_noticia, fecha_anterior):
+    """
+    Comprueba con una petición HTTP normal si una noticia ya procesada ha cambiado, para
+    no abrirla con Selenium si no hace falta. Si no se puede comprobar, se considera cambiada.
 
-    # Intentar encontrar y hacer clic en el botón de "Aceptar y continuar"
+    Retorna:
+    dict: El resultado de `noticia_sin_cambios` si no ha cambiado, o None si ha cambiado.
+    """
     try:
-        aceptar_boton = driver.find_element(By.CSS_SELECTOR, 'a.mrf-button[data-mrf-role="userAgreeToAll"]')
-        aceptar_boton.click()
-        print("Botón 'Aceptar y continuar' clicado.")
-    except:
-        print("No se encontró el botón 'Aceptar y continuar'.")
-
-    # Esperar un segundo para que la página cargue completamente después de aceptar
-    time.sleep(0.7)
-
-    # Hacer scroll tres veces
-    for i in range(3):
-        driver.execute_script("window.scrollBy(0, document.body.scrollHeight);")
-        time.sleep(0.5)  # Esperar un segundo entre cada scroll para que el contenido se cargue
-
-    # Obtener el código fuente de la página después de cargar y hacer scroll
-    page_source = driver.page_source
-
-    # Analizar el contenido HTML con BeautifulSoup
-    soup = BeautifulSoup(page_source, 'html.parser')
-
-    # Diccionario para almacenar los datos de la noticia
-    datos_noticia = {}
-
-    # Buscar el script con type="application/ld+json"
-    ld_json_script = soup.find('script', {'type': 'application/ld+json'})
-
-    if ld_json_script:
-        # Parsear el contenido JSON
-        ld_json_content = json.loads(ld_json_script.string)
-        
-        # Acceder a la información dentro del JSON
-        datos_noticia['headline'] = ld_json_content.get('headline')
-        datos_noticia['url'] = ld_json_content.get('url')
-        
-        # Manejar si 'image' es un string o un objeto
-        image = ld_json_content.get('image')
-        if isinstance(image, str):
-            datos_noticia['image_url'] = image
-            datos_noticia['image_name'] = ''
-        elif isinstance(image, dict):
-            datos_noticia['image_url'] = image.get('url')
-            datos_noticia['image_name'] = image.get('name')
-
-        datos_noticia['author'] = ld_json_content.get('author', [{}])[0].get('name')
-        datos_noticia['date_published'] = ld_json_content.get('datePublished')
-        datos_noticia['date_modified'] = ld_json_content.get('dateModified')
-        datos_noticia['publisher'] = ld_json_content.get('publisher', {}).get('name')
-        datos_noticia['article_section'] = ld_json_content.get('articleSection', [])
-        datos_noticia['description'] = ld_json_content.get('description')
-        datos_noticia['article_body'] = ld_json_content.get('articleBody')
-        datos_noticia['keywords'] = ld_json_content.get('keywords', [])
-        datos_noticia['content_location'] = ld_json_content.get('contentLocation', [{}])[0].get('name')
+        with turno_host(url_noticia):
+            response = sesion_http.get(url_noticia, endpoint="noticia")
+        response.raise_for_status()
+    except Exception as e:
+        print(f"No se pudo comprobar si la noticia ha cambiado ({e}).")
+        return None
+    if not sin_cambios(ld_json_noticia(response.text), fecha_anterior):
+        return None
+    return noticia_sin_cambios(url_noticia, response.text)
 
-        # Análisis del artículo con IBM Watson NLU
-        analisis_nlu = analizar_con_ibm_nlu(datos_noticia['article_body'])
-        datos_noticia['analisis_nlu'] = analisis_nlu
 
-    else:
-        print("No se encontró el script con el tipo 'application/ld+json'.")
+def extraer_datos_estaticos(url_noticia, pool=None, fecha_anterior=None):
+    """
+    Extrae los datos de una noticia con una petición HTTP normal, sin navegador.
+    Los comentarios se leen del HTML o, si no vienen en él, del endpoint JSON del widget
+    (ver comentarios.py). Solo se abre Selenium si los comentarios siguen necesitando
+    JavaScript o si el HTML servido no trae el JSON-LD.
 
-    # Intentar obtener los comentarios y agregar la información
+    Parámetros:
+    url_noticia (str): URL de la noticia que se va a procesar.
+    pool (PoolNavegadores): Pool que se usa si hay que abrir la noticia con el navegador.
+    fecha_anterior (str): dateModified con el que ya se procesó la noticia, si se procesó.
+
+    Retorna:
+    dict: Diccionario con los datos extraídos de la noticia, o el de `noticia_sin_cambios`
+    si no ha cambiado.
+    """
     try:
-        comentarios = driver.find_elements(By.CLASS_NAME, 'comment')
-        lista_comentarios = []
-        if comentarios:
-            for comentario in comentarios:
-                comentario_data = {}
-                # Nombre del usuario
-                comentario_data['nombre'] = comentario.find_element(By.CLASS_NAME, 'comment-info-name').text
-                # Tiempo de publicación
-                comentario_data['tiempo'] = comentario.find_element(By.CLASS_NAME, 'comment-info-date').text
-                # Texto del comentario
-                comentario_data['texto_comentario'] = comentario.find_element(By.CLASS_NAME, 'comment-info-text').text
-                
-                # Análisis de sentimiento usando Gemini
-                analisis_sentimiento = analizar_sentimiento(comentario_data['texto_comentario'])
-                comentario_data.update(analisis_sentimiento)
-                
-                # Agregar comentario al listado
-                lista_comentarios.append(comentario_data)
-            datos_noticia['comentarios'] = lista_comentarios
-        else:
-            datos_noticia['comentarios'] = []
+        with turno_host(url_noticia):
+            response = sesion_http.get(url_noticia, endpoint="noticia")
+        response.raise_for_status()
     except Exception as e:
-        print(f"Error al intentar obtener los comentarios: {e}")
-    
-    # Cerrar el navegador
-    driver.quit()
+        print(f"Error al descargar la noticia sin navegador ({e}). Se usa Selenium.")
+        return extraer_datos_selenium(url_noticia, pool)
 
-    return datos_noticia
+    return datos_desde_html_servido(url_noticia, response.text, pool, fecha_anterior)
+
+
+def datos_desde_html_servido(url_noticia, html, pool=None, fecha_anterior=None):
+    """
+    Extrae los datos de una noticia a partir del HTML que sirve el periódico, sin renderizar,
+    y abre la noticia con Selenium solo si los comentarios lo necesitan.
+
+    Parámetros:
+    url_noticia (str): URL de la noticia.
+    html (str): HTML de la noticia descargado sin navegador.
+    pool (PoolNavegadores): Pool que se usa si hay que abrir la noticia con el navegador.
+    fecha_anterior (str): dateModified con el que ya se procesó la noticia, si se procesó.
+
+    Retorna:
+    dict: Diccionario con los datos extraídos de la noticia, o el de `noticia_sin_cambios`
+    si no ha cambiado.
+    """
+    ld_json_content = ld_json_noticia(html)
+    if sin_cambios(ld_json_content, fecha_anterior):
+        return noticia_sin_cambios(url_noticia, html)
+
+    soup = crear_soup(html)
+    lista_comentarios = comentarios_desde_soup(soup)
+
+    comentarios_api = None
+    if not lista_comentarios and ld_json_content is not None:
+        # Antes de abrir el navegador se piden los comentarios al endpoint JSON del widget
+        comentarios_api = obtener_comentarios(url_noticia, soup)
+
+    if comentarios_api is None and necesita_navegador(soup, ld_json_content, lista_comentarios):
+        print("Los comentarios de la noticia necesitan JavaScript. Se usa Selenium.")
+        return extraer_datos_selenium(url_noticia, pool)
+
+    if comentarios_api is None and not lista_comentarios and sin_senal_comentarios(soup, ld_json_content):
+        # Si el periódico cambia el marcado de los comentarios, aquí se perderían sin avisar
+        print(f"Aviso: la noticia {url_noticia} no tiene comentarios, commentCount ni widget "
+              "de comentarios en el HTML servido. Revisa el selector .comment y SELECTOR_WIDGET_COMENTARIOS si no es esperado.")
+
+    datos_noticia = datos_desde_html(html, ld_json_content)
+    if PROFUNDIDAD_RELACIONADAS:
+        datos_noticia['noticias_relacionadas'] = relacionadas_desde_soup(soup, url_noticia)
+    return analizar_noticia(datos_noticia, comentarios_api if comentarios_api is not None else lista_comentarios)
+
+
+def extraer_datos_noticia(url_noticia, pool=None, fecha_anterior=None):
+    """
+    Extrae los datos de una noticia según MODO_EXTRACCION: 'estatico' (petición HTTP y
+    Selenium solo cuando hace falta) o 'selenium' (siempre con navegador).
+    Si la noticia ya se procesó con `fecha_anterior` y no ha cambiado, devuelve el
+    resultado de `noticia_sin_cambios`.
+    """
+    if MODO_EXTRACCION == "selenium":
+        sin_cambios_noticia = comprobar_cambios(url_noticia, fecha_anterior) if fecha_anterior is not None else None
+        if sin_cambios_noticia is not None:
+            return sin_cambios_noticia
+        return extraer_datos_selenium(url_noticia, pool)
+    return extraer_datos_estaticos(url_noticia, pool, fecha_anterior)
+
+
+def completar_articulo(articulo_data, detalles_noticia):
+    """
+    Añade al artículo de la portada los detalles de su noticia. Las noticias relacionadas
+    de la propia noticia se suman a las que ya aparecían en la portada.
+    """
+    relacionadas = unir_relacionadas(articulo_data.get('noticias_relacionadas'), detalles_noticia.pop('noticias_relacionadas', None))
+    articulo_data.update(detalles_noticia)
+    if relacionadas or 'noticias_relacionadas' in articulo_data:
+        articulo_data['noticias_relacionadas'] = relacionadas
+    return articulo_data
+
+
+def procesar_articulo(articulo_data, pool=None, registro=None):
+    """
+    Completa un artículo de la portada con los datos de su noticia.
+
+    Parámetros:
+    articulo_data (dict): Artículo con 'titular' y 'url_noticia'.
+    pool (PoolNavegadores): Pool de navegadores compartido.
+    registro (RegistroNoticias): Noticias ya procesadas en exploraciones anteriores.
+
+    Retorna:
+    dict: El mismo artículo con los detalles de la noticia añadidos. Si la noticia ya se
+    procesó y su dateModified no ha cambiado, solo se le añaden sus noticias relacionadas
+    y queda marcado con 'sin_cambios'.
+    """
+    url_noticia = articulo_data.get('url_noticia')
+    if es_noticia(articulo_data):
+        try:
+            fecha_anterior = registro.fecha_guardada(url_noticia) if registro is not None else None
+            detalles_noticia = extraer_datos_noticia(url_noticia, pool, fecha_anterior)
+            if detalles_noticia.get('sin_cambios'):
+                print(f"La noticia no ha cambiado desde que se procesó: {url_noticia}")
+            completar_articulo(articulo_data, detalles_noticia)
+        except Exception as e:
+            # Un fallo en una noticia no detiene el resto de la exploración
+            print(f"Error al procesar la noticia {url_noticia}: {e}")
+    return articulo_data
+
+
+def descargar_portadas(urls):
+    """
+    Descarga la portada de cada periódico y devuelve sus artículos candidatos, hasta
+    MAX_SECCIONES secciones y MAX_ARTICULOS_POR_SECCION artículos por sección.
+
+    Retorna:
+    dict: Artículos de cada portada que se ha podido descargar, por URL de la portada.
+    """
+    articulos_por_sitio = {}
+    for url in urls:
+        try:
+            response = sesion_http.get(url, endpoint="portada")
+        except Exception as e:
+            print(f"Error al acceder a la página {url}: {e}")
+            continue
+        if response.status_code != 200:
+            print(f"Error al acceder a la página {url}. Código de estado: {response.status_code}")
+            continue
+        articulos_por_sitio[url] = articulos_portada(response.text, max_secciones=MAX_SECCIONES, max_articulos=MAX_ARTICULOS_POR_SECCION)
+    return articulos_por_sitio
+
+
+def mostrar_resumen(start_time):
+    """Muestra las esperas, las peticiones externas y la duración de la exploración."""
+    end_time = time.time()
+    print(resumen_esperas())
+    print(sesion_http.resumen_contadores())
+    print(resumen_cache())
+    print(resumen_triaje())
+    print(f"Tiempo total de extracción: {end_time - start_time:.2f} segundos")
+
+
+def tiene_pendientes(articulo_data):
+    """True si algún análisis de la noticia se omitió porque su proveedor no estaba disponible."""
+    return es_pendiente(articulo_data.get('analisis_nlu')) or any(
+        es_pendiente(comentario) for comentario in articulo_data.get('comentarios') or []
+    )
+
+
+def registrar_procesada(registro, articulo_data):
+    """
+    Anota en el registro una noticia que ya está escrita en todos los sumideros (se llama
+    desde `Sumideros` al escribir su lote, no al entregársela). Las que tienen análisis
+    pendientes no se anotan: se vuelven a procesar en la siguiente exploración y sustituyen
+    a la versión guardada (los análisis ya hechos se toman de la caché).
+    """
+    if es_noticia(articulo_data) and articulo_data.get('headline') and not tiene_pendientes(articulo_data):
+        registro.registrar(articulo_data['url_noticia'], articulo_data.get('date_modified'))
+
+
+def noticias_de_sitios(urls, pool, registro=None):
+    """
+    Generador que produce cada noticia de las portadas en cuanto está completa. Las noticias
+    se procesan por orden de prioridad y dentro del presupuesto de la exploración (ver
+    planificacion.py). Como mucho hay 2 * NUM_TRABAJADORES noticias en curso (ver `procesar_en_orden`).
+
+    Con PROFUNDIDAD_RELACIONADAS > 0, después de las noticias de la portada se exploran sus
+    noticias relacionadas, nivel a nivel. Cada noticia se procesa una sola vez por exploración,
+    y las que ya están en `registro` solo se vuelven a procesar si ha cambiado su dateModified
+    (aunque no haya cambiado, se siguen sus noticias relacionadas). Los comentarios nuevos no
+    cambian el dateModified, así que no se recogen hasta que la noticia cambia; las noticias
+    sin dateModified se reprocesan cada HORAS_REPROCESAR_SIN_FECHA horas.
+
+    Parámetros:
+    urls (list): URLs de las portadas.
+    pool (PoolNavegadores): Pool de navegadores compartido.
+    registro (RegistroNoticias): Noticias procesadas en exploraciones anteriores.
+
+    Retorna:
+    generator: Tuplas (url_portada, articulo_data).
+    """
+    articulos_por_sitio = descargar_portadas(urls)
+    presupuesto = Presupuesto()
+    vistas = set()
+
+    def procesar(tarea):
+        url, articulo_data = tarea
+        return url, procesar_articulo(articulo_data, pool, registro)
+
+    for profundidad in range(PROFUNDIDAD_RELACIONADAS + 1):
+        siguientes = {}
+        for url, articulo_data in procesar_en_orden(procesar, planificar(articulos_por_sitio, presupuesto, vistas), NUM_TRABAJADORES):
+            # Las noticias sin cambios no se vuelven a guardar, pero se siguen sus relacionadas
+            if not articulo_data.get('sin_cambios'):
+                yield url, articulo_data
+            if profundidad < PROFUNDIDAD_RELACIONADAS:
+                siguientes.setdefault(url, []).extend(articulos_relacionados(url, articulo_data, profundidad + 1))
+        articulos_por_sitio = siguientes
+        if not articulos_por_sitio:
+            break
+
+
+def explorar_sitios(urls):
+    """
+    Explora varios periódicos en un único proceso. Todos comparten el pool de navegadores,
+    la sesión HTTP, los clientes de análisis y la conexión a Cosmos DB, y sus noticias se
+    sirven por turnos para repartir los trabajadores de forma equitativa entre periódicos.
+    Cada noticia se envía a los sumideros (ver sumideros.py) en cuanto está lista, así que
+    la memoria no crece con la exploración y un fallo no pierde lo ya guardado. Las noticias
+    se anotan en el registro solo cuando los sumideros las han escrito: si el proceso falla
+    antes o la escritura de un lote falla, se vuelven a procesar en la siguiente exploración.
+
+    Parámetros:
+    urls (list): URLs de las portadas que se desean explorar.
+    """
+    start_time = time.time()
+
+    # Los navegadores se mantienen abiertos durante toda la exploración
+    # El registro se abre antes que los sumideros para que siga abierto cuando se vacían los últimos lotes
+    with PoolNavegadores(NUM_NAVEGADORES) as pool, abrir_registro() as registro, \
+            crear_sumideros(al_escribir=lambda articulo_data: registrar_procesada(registro, articulo_data)) as sumideros:
+        for url, articulo_data in noticias_de_sitios(urls, pool, registro):
+            sumideros.guardar(url, articulo_data)
+
+    mostrar_resumen(start_time)
 
 
 # Ajustar `explorar_pagina` para limitar el número de noticias procesadas
@@ -268,60 +479,113 @@ def explorar_pagina(url):
     Parámetros:
     url (str): URL de la página web que se desea explorar.
     """
-    start_time = time.time()
-    domain = urlparse(url).netloc.replace('www.', '')
-    datos_noticias = []
+    explorar_sitios([url])
 
-    response = requests.get(url)
 
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        secciones = soup.find_all(['section', 'div'], class_=['module', 'mosaic', 'mosaic-wrapper', 'module recirculation'])
-
-        titulo_seccion_actual = "OTRO"
-        for i, seccion in enumerate(secciones[:3], 1):  # Procesa solo las 3 primeras noticias
-            span_titulo = seccion.find('span', class_='title-text-title')
-            if span_titulo:
-                titulo_seccion_actual = span_titulo.text.strip()
+async def procesar_articulo_async(cliente, articulo_data, pool=None, registro=None):
+    """
+    Versión asíncrona de `procesar_articulo`: la noticia se descarga con el cliente compartido
+    y el trabajo bloqueante (análisis del HTML, Selenium, IBM NLU y Gemini) se hace en el pool
+    de hilos del motor.
+    """
+    url_noticia = articulo_data.get('url_noticia')
+    if not es_noticia(articulo_data):
+        return articulo_data
 
-            articles = seccion.find_all('article', class_=['module-text-below-atom', 'module-text-side-atom', 'module-text-over-atom', 'swiper-slide'])
-            if not articles:
-                continue
+    try:
+        fecha_anterior = registro.fecha_guardada(url_noticia) if registro is not None else None
+        if MODO_EXTRACCION == "selenium":
+            detalles_noticia = await en_hilo(extraer_datos_noticia, url_noticia, pool, fecha_anterior)
+        else:
+            try:
+                # Misma cortesía por host que con hilos (ver concurrencia.py)
+                async with turno_host_async(url_noticia):
+                    html = await obtener_texto(cliente, url_noticia)
+            except Exception as e:
+                print(f"Error al descargar la noticia sin navegador ({e}). Se usa Selenium.")
+                detalles_noticia = await en_hilo(extraer_datos_selenium, url_noticia, pool)
+            else:
+                detalles_noticia = await en_hilo(datos_desde_html_servido, url_noticia, html, pool, fecha_anterior)
+        if detalles_noticia.get('sin_cambios'):
+            print(f"La noticia no ha cambiado desde que se procesó: {url_noticia}")
+        completar_articulo(articulo_data, detalles_noticia)
+    except Exception as e:
+        print(f"Error al procesar la noticia {url_noticia}: {e}")
+    return articulo_data
 
-            for article in articles[:3]:  # Limita el procesamiento de noticias individuales
-                articulo_data = {}
-                titular_tag = article.find('a', class_='media') or article.find('a', class_='image')
-                if titular_tag:
-                    titular = titular_tag.get('title')
-                    url_noticia = titular_tag.get('href')
 
-                    articulo_data['titular'] = titular
-                    articulo_data['url_noticia'] = url_noticia
+async def noticias_de_sitios_async(cliente, urls, pool, registro=None):
+    """
+    Versión asíncrona de `noticias_de_sitios`: produce cada noticia en cuanto está completa,
+    con como mucho LIMITE_NOTICIAS_ASYNC noticias en curso.
+    """
+    async def descargar_portada(url):
+        try:
+            async with turno_host_async(url):
+                html = await obtener_texto(cliente, url)
+        except Exception as e:
+            print(f"Error al acceder a la página {url}: {e}")
+            return None
+        return await en_hilo(articulos_portada, html, max_secciones=MAX_SECCIONES, max_articulos=MAX_ARTICULOS_POR_SECCION)
+
+    portadas = await asyncio.gather(*(descargar_portada(url) for url in urls))
+    articulos_por_sitio = {url: articulos for url, articulos in zip(urls, portadas) if articulos is not None}
+
+    presupuesto = Presupuesto()
+    vistas = set()
+
+    async def procesar(tarea):
+        url, articulo_data = tarea
+        return url, await procesar_articulo_async(cliente, articulo_data, pool, registro)
+
+    for profundidad in range(PROFUNDIDAD_RELACIONADAS + 1):
+        siguientes = {}
+        async for url, articulo_data in procesar_en_orden_async(procesar, planificar(articulos_por_sitio, presupuesto, vistas)):
+            # Las noticias sin cambios no se vuelven a guardar, pero se siguen sus relacionadas
+            if not articulo_data.get('sin_cambios'):
+                yield url, articulo_data
+            if profundidad < PROFUNDIDAD_RELACIONADAS:
+                siguientes.setdefault(url, []).extend(articulos_relacionados(url, articulo_data, profundidad + 1))
+        articulos_por_sitio = siguientes
+        if not articulos_por_sitio:
+            break
+
+
+async def explorar_sitios_async(urls):
+    """
+    Igual que `explorar_sitios`, pero todas las descargas (portadas y noticias) comparten
+    un único cliente HTTP asíncrono y se hacen desde un solo bucle de eventos.
 
-                    if url_noticia and url_noticia.endswith('.html'):
-                        detalles_noticia = extraer_datos_selenium(url_noticia)
-                        articulo_data.update(detalles_noticia)
-                datos_noticias.append(articulo_data)
+    Parámetros:
+    urls (list): URLs de las portadas que se desean explorar.
+    """
+    start_time = time.time()
 
-    else:
-        print(f"Error al acceder a la página. Código de estado: {response.status_code}")
+    async with crear_cliente() as cliente:
+        with PoolNavegadores(NUM_NAVEGADORES) as pool, abrir_registro() as registro, \
+                crear_sumideros(al_escribir=lambda articulo_data: registrar_procesada(registro, articulo_data)) as sumideros:
+            async for url, articulo_data in noticias_de_sitios_async(cliente, urls, pool, registro):
+                # Los sumideros hacen E/S bloqueante: se llaman desde el pool de hilos
+                await en_hilo(sumideros.guardar, url, articulo_data)
 
-    collection_name = extraer_nombre_de_coleccion(url)
-    collection = conectar_a_cosmos(CONNECTION_STRING, DATABASE_NAME, collection_name)
-    if collection is not None:  # Comparación explícita con None
-        insertar_datos(collection, datos_noticias)
+    mostrar_resumen(start_time)
 
-    end_time = time.time()
-    print(f"Tiempo total de extracción: {end_time - start_time:.2f} segundos")
 
+async def explorar_pagina_async(url):
+    """Versión asíncrona de `explorar_pagina` (ver `explorar_sitios_async`)."""
+    await explorar_sitios_async([url])
 
 
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) > 1:
-        url_to_explore = sys.argv[1]
-    else:
-        url_to_explore = "https://www.diariodecadiz.es/"
+    # Se pueden indicar varias portadas para explorarlas en el mismo proceso.
+    # --async usa el motor asíncrono (motor_async.py) en lugar de hilos
+    urls_to_explore = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not urls_to_explore:
+        urls_to_explore = ["https://www.diariodecadiz.es/"]
 
-    explorar_pagina(url_to_explore)
+    if '--async' in sys.argv:
+        ejecutar(explorar_sitios_async(urls_to_explore))
+    else:
+        explorar_sitios(urls_to_explore)
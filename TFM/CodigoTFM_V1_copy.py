@@ -1,11 +1,4 @@
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-import json
 import time
-from datetime import datetime
 from urllib.parse import urlparse
 import google.generativeai as genai
 from ibm_watson import NaturalLanguageUnderstandingV1
@@ -14,7 +7,16 @@ from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from pymongo import MongoClient  # Importación para la conexión con Azure Cosmos DB
 from dotenv import load_dotenv
 import os
-from azure.servicebus import ServiceBusClient, ServiceBusMessage
+import sesion_http
+from limites_proveedores import ProveedorNoDisponible, resultado_pendiente
+from cache_enriquecimiento import en_cache, varios_en_cache, resumen_cache
+from imagenes import analizar_imagen, resumen_imagenes
+from sentimiento_local import triaje, resumen_triaje
+from navegador import PoolNavegadores, NUM_NAVEGADORES, preparar_pagina, extraer_comentarios, resumen_esperas
+from extraccion import ld_json_noticia, articulos_portada
+from planificacion import MAX_SECCIONES, MAX_ARTICULOS_POR_SECCION, es_noticia, planificar
+from concurrencia import NUM_TRABAJADORES, procesar_en_orden
+from sumideros import Sumideros, SumideroServiceBus
 
 # Cargar las variables de entorno desde el archivo .env
 load_dotenv()
@@ -27,6 +29,8 @@ AZURE_ANALYZE_URL = f"{AZURE_ENDPOINT}vision/v3.2/analyze"
 API_KEY = os.getenv("AZURE_TEXT_ANALYTICS_KEY")
 ENDPOINT = os.getenv("AZURE_TEXT_ANALYTICS_ENDPOINT")
 SENTIMENT_URL = f"{ENDPOINT}text/analytics/v3.1/sentiment"
+# Documentos por petición que admite la API de sentimiento (v3.1)
+DOCUMENTOS_POR_LOTE_AZURE = int(os.getenv("DOCUMENTOS_POR_LOTE_AZURE", "10"))
 
 GENAI_API_KEY = os.getenv("GENAI_API_KEY")
 
@@ -36,6 +40,9 @@ IBM_URL = os.getenv("IBM_URL")
 CONNECTION_STRING = os.getenv("COSMOS_CONNECTION_STRING")
 DATABASE_NAME = os.getenv("COSMOS_DATABASE_NAME")
 
+# ChromeDriver local para las pruebas en Windows
+CHROME_DRIVER_PATH = "chromedriver.exe"
+
 # Configurar modelo de análisis de sentimientos
 generation_config = {
     "temperature": 1,
@@ -52,68 +59,119 @@ model = genai.GenerativeModel(
     system_instruction="Tu tarea será categorizar comentarios en Positivo, Negativo o Neutral, añadiendo un porcentaje de confianza. No hace falta que digas nada más. Ejemplo: NEGATIVO Confianza: 95%",
 )
 
+# Versiones de las APIs, que forman parte de la clave de la caché de análisis
+VERSION_NLU = '2021-08-01'
+VERSION_VISION = 'v3.2/es'
+VERSION_TEXT_ANALYTICS = 'v3.1/es'
+
 authenticator = IAMAuthenticator(IBM_API_KEY)
 nlu = NaturalLanguageUnderstandingV1(
-    version='2021-08-01',
+    version=VERSION_NLU,
     authenticator=authenticator
 )
 nlu.set_service_url(IBM_URL)
+# IBM NLU usa la sesión HTTP compartida (conexiones reutilizadas, reintentos y timeout)
+sesion_http.configurar_servicio_ibm(nlu)
 
 connection_str = os.getenv("SERVICEBUS_CONNECTION_STR")
 queue_name = os.getenv("QUEUE_NAME")
 
-def enviar_a_servicebus(mensaje):
-    with ServiceBusClient.from_connection_string(connection_str) as client:
-        sender = client.get_queue_sender(queue_name)
-        with sender:
-            sender.send_messages(ServiceBusMessage(mensaje))
-            print("Mensaje enviado a Service Bus.")
-
-def analizar_sentimiento_azure(texto):
-    """
-    Analiza el sentimiento de un texto usando Azure Text Analytics.
+def analizar_sentimientos_azure(textos):
     """
-    try:
-        headers = {
-            "Ocp-Apim-Subscription-Key": API_KEY,
-            "Content-Type": "application/json"
-        }
+    Analiza el sentimiento de varios textos usando Azure Text Analytics. Se envían
+    DOCUMENTOS_POR_LOTE_AZURE documentos por petición y cada resultado se asigna a su
+    texto por el id del documento, así que un documento con error no afecta a los demás.
+    Los textos claros se clasifican en local (ver sentimiento_local.py) y, de los demás,
+    solo se envían los que no están en la caché.
 
-        # El cuerpo de la solicitud debe incluir los textos a analizar
-        body = {
-            "documents": [
-                {"id": "1", "language": "es", "text": texto}
-            ]
-        }
+    Parámetros:
+    textos (list): Textos que se quieren analizar.
 
-        # Realizar la solicitud a la API
-        response = requests.post(SENTIMENT_URL, headers=headers, json=body)
-        response.raise_for_status()  # Lanza una excepción si la solicitud falla
-        result = response.json()
+    Retorna:
+    list: Un diccionario con 'sentimiento' y 'confianza' por cada texto, en el mismo orden.
+    """
+    return triaje(textos, _analizar_sentimientos_azure_en_cache, _formato_local_azure)
+
+def _formato_local_azure(etiqueta, confianza):
+    """Clasificación local con el formato de Azure: etiqueta en inglés y puntuación por sentimiento."""
+    sentimiento = {"POSITIVO": "positive", "NEUTRAL": "neutral", "NEGATIVO": "negative"}[etiqueta]
+    puntuaciones = {s: (1 - confianza) / 2 for s in ("positive", "neutral", "negative")}
+    puntuaciones[sentimiento] = confianza
+    return {"sentimiento": sentimiento, "confianza": puntuaciones}
+
+def _analizar_sentimientos_azure_en_cache(textos):
+    return varios_en_cache(
+        "azure_texto", VERSION_TEXT_ANALYTICS, textos, _analizar_sentimientos_azure,
+        valido=lambda resultado: resultado["sentimiento"] not in ("error", "indeterminado"),
+    )
+
+def _analizar_sentimientos_azure(textos):
+    """
+    Llamadas a Azure Text Analytics, sin caché.
+    """
+    resultados = [{"sentimiento": "indeterminado", "confianza": {}} for _ in textos]
+
+    # Los textos vacíos no se envían: la API los rechaza
+    documentos = [
+        {"id": str(i), "language": "es", "text": texto}
+        for i, texto in enumerate(textos) if texto and texto.strip()
+    ]
+    headers = {
+        "Ocp-Apim-Subscription-Key": API_KEY,
+        "Content-Type": "application/json"
+    }
+
+    for inicio in range(0, len(documentos), DOCUMENTOS_POR_LOTE_AZURE):
+        lote = documentos[inicio:inicio + DOCUMENTOS_POR_LOTE_AZURE]
+        try:
+            # Realizar la solicitud a la API con todo el lote
+            response = sesion_http.post(SENTIMENT_URL, endpoint="azure_texto", headers=headers, json={"documents": lote})
+            response.raise_for_status()  # Lanza una excepción si la solicitud falla
+            result = response.json()
+        except ProveedorNoDisponible:
+            # Azure no responde: los comentarios se analizarán en otra exploración
+            for documento in lote:
+                resultados[int(documento["id"])] = resultado_pendiente({"sentimiento": "pendiente", "confianza": {}})
+            continue
+        except Exception as e:
+            print(f"Error al analizar el sentimiento: {e}")
+            for documento in lote:
+                resultados[int(documento["id"])] = {"sentimiento": "error", "confianza": {}}
+            continue
 
-        # Procesar los resultados
-        if "documents" in result and len(result["documents"]) > 0:
-            sentiment_data = result["documents"][0]
-            return {
+        # Procesar los resultados de cada documento
+        for sentiment_data in result.get("documents", []):
+            resultados[int(sentiment_data["id"])] = {
                 "sentimiento": sentiment_data["sentiment"],  # "positive", "neutral", o "negative"
                 "confianza": sentiment_data["confidenceScores"]  # Scores para cada sentimiento
             }
-        else:
-            return {
-                "sentimiento": "indeterminado",
-                "confianza": {}
-            }
-    except Exception as e:
-        print(f"Error al analizar el sentimiento: {e}")
-        return {
-            "sentimiento": "error",
-            "confianza": {}
-        }
+        for error in result.get("errors", []):
+            print(f"Error al analizar el sentimiento del documento {error['id']}: {error.get('error', {}).get('message')}")
+            resultados[int(error["id"])] = {"sentimiento": "error", "confianza": {}}
+
+    return resultados
+
+def analizar_sentimiento_azure(texto):
+    """
+    Analiza el sentimiento de un texto usando Azure Text Analytics.
+    """
+    return analizar_sentimientos_azure([texto])[0]
 
 def analizar_imagen_azure(image_url):
     """
     Realiza una solicitud a la API de Azure Computer Vision para analizar una imagen.
     Devuelve una descripción y las 5 etiquetas principales de la imagen.
+    Una foto ya analizada, con esta URL o con otra (otro tamaño, otro periódico), no se vuelve a enviar.
+    """
+    return analizar_imagen(
+        image_url, "azure_vision", VERSION_VISION, _analizar_imagen_azure,
+        valido=lambda analisis: analisis["descripcion"] != "Error",
+    )
+
+def _analizar_imagen_azure(image_url, contenido=None):
+    """
+    Llamada a Azure Computer Vision, sin caché. Si se da el contenido (la imagen ya descargada
+    y reducida), se envía en la petición y Azure no tiene que descargar el original.
     """
     try:
         # Parámetros para la API de Azure
@@ -123,14 +181,15 @@ def analizar_imagen_azure(image_url):
         }
         headers = {
             "Ocp-Apim-Subscription-Key": AZURE_SUBSCRIPTION_KEY,
-            "Content-Type": "application/json"
-        }
-        data = {
-            "url": image_url
         }
 
         # Realizar solicitud a Azure
-        response = requests.post(AZURE_ANALYZE_URL, headers=headers, params=params, json=data)
+        if contenido:
+            headers["Content-Type"] = "application/octet-stream"
+            response = sesion_http.post(AZURE_ANALYZE_URL, endpoint="azure_vision", headers=headers, params=params, data=contenido)
+        else:
+            headers["Content-Type"] = "application/json"
+            response = sesion_http.post(AZURE_ANALYZE_URL, endpoint="azure_vision", headers=headers, params=params, json={"url": image_url})
         response.raise_for_status()
         analysis = response.json()
 
@@ -150,6 +209,8 @@ def analizar_imagen_azure(image_url):
             "confianza_descripcion": confianza_descripcion,
             "etiquetas": etiquetas
         }
+    except ProveedorNoDisponible:
+        return resultado_pendiente({"descripcion": "pendiente", "confianza_descripcion": 0, "etiquetas": []})
     except Exception as e:
         print(f"Error al analizar la imagen con Azure: {e}")
         return {
@@ -193,7 +254,8 @@ def extraer_nombre_de_coleccion(url):
 def analizar_sentimiento(comentario):
     try:
         chat_session = model.start_chat(history=[])
-        response = chat_session.send_message(comentario)
+        with sesion_http.medir("gemini"):
+            response = chat_session.send_message(comentario, request_options={"timeout": sesion_http.timeout("gemini")[1]})
         texto_respuesta = response.text
 
         if "NEGATIVO" in texto_respuesta:
@@ -210,53 +272,53 @@ def analizar_sentimiento(comentario):
         return {"sentimiento": "Indeterminado", "confianza": 0}
 
 def analizar_con_ibm_nlu(texto):
+    """Análisis de IBM Watson NLU de un texto. Un texto ya analizado se toma de la caché."""
+    return en_cache("ibm_nlu", VERSION_NLU, texto, lambda: _analizar_con_ibm_nlu(texto))
+
+def _analizar_con_ibm_nlu(texto):
     try:
-        response = nlu.analyze(
-            text=texto,
-            features=Features(
-                entities=EntitiesOptions(sentiment=True, limit=5),
-                keywords=KeywordsOptions(sentiment=True, limit=5),
-                concepts=ConceptsOptions(limit=5),
-                sentiment=SentimentOptions()
-            )
-        ).get_result()
+        with sesion_http.medir("ibm_nlu"):
+            response = nlu.analyze(
+                text=texto,
+                features=Features(
+                    entities=EntitiesOptions(sentiment=True, limit=5),
+                    keywords=KeywordsOptions(sentiment=True, limit=5),
+                    concepts=ConceptsOptions(limit=5),
+                    sentiment=SentimentOptions()
+                )
+            ).get_result()
 
         return response
+    except ProveedorNoDisponible:
+        return resultado_pendiente({})
     except Exception as e:
         print(f"Error al analizar el texto con IBM NLU: {e}")
         return {}
 
-def extraer_datos_selenium(url_noticia):
-    CHROME_DRIVER_PATH = "chromedriver.exe"
-    service = Service(CHROME_DRIVER_PATH)
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
+def extraer_datos_selenium(url_noticia, pool=None):
+    if pool is None:
+        with PoolNavegadores(1, driver_path=CHROME_DRIVER_PATH, binary_location=None) as pool_temporal:
+            return extraer_datos_selenium(url_noticia, pool_temporal)
 
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.get(url_noticia)
-    time.sleep(0.7)
+    # El navegador se devuelve al pool en cuanto se ha leído la página
+    with pool.prestar() as driver:
+        # Abrir la página y esperar solo hasta que estén listos cookies, JSON-LD y comentarios
+        preparar_pagina(driver, url_noticia)
 
-    try:
-        aceptar_boton = driver.find_element(By.CSS_SELECTOR, 'a.mrf-button[data-mrf-role="userAgreeToAll"]')
-        aceptar_boton.click()
-        print("Botón 'Aceptar y continuar' clicado.")
-    except Exception as e:
-        print("No se encontró el botón 'Aceptar y continuar':", e)
+        page_source = driver.page_source
 
-    time.sleep(0.7)
-    for i in range(3):
-        driver.execute_script("window.scrollBy(0, document.body.scrollHeight);")
-        time.sleep(0.5)
+        try:
+            # Todos los comentarios en una sola llamada al navegador
+            lista_comentarios = extraer_comentarios(driver)
+        except Exception as e:
+            lista_comentarios = None
+            print(f"Error al intentar obtener los comentarios: {e}")
 
-    page_source = driver.page_source
-    soup = BeautifulSoup(page_source, 'html.parser')
     datos_noticia = {}
 
-    ld_json_script = soup.find('script', {'type': 'application/ld+json'})
-    if ld_json_script:
-        ld_json_content = json.loads(ld_json_script.string)
+    # El JSON-LD de la noticia se lee directamente del HTML, sin construir el árbol de la página
+    ld_json_content = ld_json_noticia(page_source)
+    if ld_json_content:
         datos_noticia = {
             'headline': ld_json_content.get('headline'),
             'url': ld_json_content.get('url'),
@@ -296,34 +358,13 @@ def extraer_datos_selenium(url_noticia):
     else:
         print("El campo 'image_url' no está presente o está vacío.")
 
-    try:
-        comentarios = driver.find_elements(By.CLASS_NAME, 'comment')
-        lista_comentarios = []
-        if comentarios:
-            for comentario in comentarios:
-                comentario_data = {}
-                # Nombre del usuario
-                comentario_data['nombre'] = comentario.find_element(By.CLASS_NAME, 'comment-info-name').text
-                # Tiempo de publicación
-                comentario_data['tiempo'] = comentario.find_element(By.CLASS_NAME, 'comment-info-date').text
-                # Texto del comentario
-                comentario_data['texto_comentario'] = comentario.find_element(By.CLASS_NAME, 'comment-info-text').text
-
-                # Análisis de sentimiento usando Azure Text Analytics
-                analisis_sentimiento = analizar_sentimiento_azure(comentario_data['texto_comentario'])
-                comentario_data.update(analisis_sentimiento)
-
-                # Agregar comentario al listado
-                lista_comentarios.append(comentario_data)
-            datos_noticia['comentarios'] = lista_comentarios
-        else:
-            datos_noticia['comentarios'] = []
-    except Exception as e:
-        print(f"Error al intentar obtener los comentarios: {e}")
+    if lista_comentarios is not None:
+        # Análisis de sentimiento de todos los comentarios usando Azure Text Analytics, por lotes
+        analisis = analizar_sentimientos_azure([comentario_data['texto_comentario'] for comentario_data in lista_comentarios])
+        for comentario_data, analisis_sentimiento in zip(lista_comentarios, analisis):
+            comentario_data.update(analisis_sentimiento)
+        datos_noticia['comentarios'] = lista_comentarios
 
-
-    # Cerrar el navegador
-    driver.quit()
     return datos_noticia
 
 # Ajustar `explorar_pagina` para limitar el número de noticias procesadas
@@ -337,41 +378,45 @@ def explorar_pagina(url):
     domain = urlparse(url).netloc.replace('www.', '')
     
     # Realiza la solicitud a la página principal
-    response = requests.get(url)
+    response = sesion_http.get(url, endpoint="portada")
     if response.status_code != 200:
         print(f"Error al acceder a la página. Código de estado: {response.status_code}")
         return
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    secciones = soup.find_all(['section', 'div'], class_=['module', 'mosaic', 'mosaic-wrapper', 'module recirculation'])
-
-    for i, seccion in enumerate(secciones[:3], 1):  # Procesa solo las 3 primeras secciones
-        span_titulo = seccion.find('span', class_='title-text-title')
-        titulo_seccion_actual = span_titulo.text.strip() if span_titulo else "OTRO"
-
-        articles = seccion.find_all('article', class_=['module-text-below-atom', 'module-text-side-atom', 'module-text-over-atom', 'swiper-slide'])
-        if not articles:
-            continue
-
-        for article in articles[:3]:  # Procesa solo las 3 primeras noticias por sección
-            articulo_data = {}
-
-            # Extraer URL y título de la noticia
-            titular_tag = article.find('a', class_='media') or article.find('a', class_='image')
-            if titular_tag:
-                articulo_data['titular'] = titular_tag.get('title')
-                articulo_data['url_noticia'] = titular_tag.get('href')
-
-                if articulo_data['url_noticia'] and articulo_data['url_noticia'].endswith('.html'):
-                    # Extraer detalles de la noticia
-                    detalles_noticia = extraer_datos_selenium(articulo_data['url_noticia'])
-                    articulo_data.update(detalles_noticia)
-
-                    # Enviar cada noticia como un JSON único a Service Bus
-                    enviar_a_servicebus(json.dumps(articulo_data))  # Enviamos directamente a Service Bus
-                    print(f"Noticia enviada a Service Bus: {articulo_data['titular']}")
+    # Primero se indexa la portada en una sola pasada y después se procesan las noticias en paralelo.
+    # En esta versión las secciones sin título siempre han sido "OTRO"
+    articulos_indexados = articulos_portada(
+        response.text, max_secciones=MAX_SECCIONES, max_articulos=MAX_ARTICULOS_POR_SECCION, heredar_titulo=False
+    )
+    articulos = [articulo_data for articulo_data in articulos_indexados if es_noticia(articulo_data)]
+
+    # Los navegadores y el emisor de Service Bus se mantienen abiertos durante toda la exploración
+    with PoolNavegadores(NUM_NAVEGADORES, driver_path=CHROME_DRIVER_PATH, binary_location=None) as pool, \
+            Sumideros([SumideroServiceBus(connection_str, queue_name)]) as sumideros:
+        def procesar(articulo_data):
+            # Extraer detalles de la noticia. Un fallo en una noticia no debe parar la exploración
+            try:
+                articulo_data.update(extraer_datos_selenium(articulo_data['url_noticia'], pool))
+            except Exception as e:
+                print(f"Error al procesar la noticia {articulo_data['url_noticia']}: {e}")
+                return None
+            return articulo_data
+
+        # Las noticias se envían a medida que están listas; las más valiosas se procesan primero (ver planificacion.py)
+        noticias = (articulo_data for _, articulo_data in planificar({url: articulos}))
+        for articulo_data in procesar_en_orden(procesar, noticias, NUM_TRABAJADORES):
+            if articulo_data is None:
+                continue
+            # Cada noticia se envía como un JSON único a Service Bus, por lotes
+            sumideros.guardar(url, articulo_data)
+            print(f"Noticia lista para Service Bus: {articulo_data['titular']}")
 
     end_time = time.time()
+    print(resumen_esperas())
+    print(sesion_http.resumen_contadores())
+    print(resumen_cache())
+    print(resumen_imagenes())
+    print(resumen_triaje())
     print(f"Tiempo total de extracción: {end_time - start_time:.2f} segundos")
 
 
@@ -1,19 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-import json
 import time
-from datetime import datetime
 from urllib.parse import urlparse
-import google.generativeai as genai
 from ibm_watson import NaturalLanguageUnderstandingV1
 from ibm_watson.natural_language_understanding_v1 import Features, EntitiesOptions, KeywordsOptions, ConceptsOptions, SentimentOptions
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from pymongo import MongoClient  # Importación para la conexión con Azure Cosmos DB
 from dotenv import load_dotenv
 import os
+import sesion_http
+from limites_proveedores import ProveedorNoDisponible, resultado_pendiente
+from cache_enriquecimiento import en_cache, resumen_cache
+from imagenes import analizar_imagen, resumen_imagenes
+from sentimiento_gemini import analizar_sentimientos
+from sentimiento_local import resumen_triaje
+from navegador import PoolNavegadores, NUM_NAVEGADORES, preparar_pagina, extraer_comentarios, resumen_esperas
+from extraccion import ld_json_noticia, articulos_portada
+from planificacion import MAX_ARTICULOS_POR_SECCION, planificar
 
 # Cargar las variables de entorno desde el archivo .env
 load_dotenv()
@@ -35,33 +36,40 @@ IBM_URL = os.getenv("IBM_URL")
 CONNECTION_STRING = os.getenv("COSMOS_CONNECTION_STRING")
 DATABASE_NAME = os.getenv("COSMOS_DATABASE_NAME")
 
-# Configurar modelo de análisis de sentimientos
-generation_config = {
-    "temperature": 1,
-    "top_p": 0.95,
-    "top_k": 64,
-    "max_output_tokens": 8192,
-    "response_mime_type": "text/plain",
-}
-
-# Crear modelo para análisis de sentimientos
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=generation_config,
-    system_instruction="Tu tarea será categorizar comentarios en Positivo, Negativo o Neutral, añadiendo un porcentaje de confianza. No hace falta que digas nada más. Ejemplo: NEGATIVO Confianza: 95%",
-)
+# Esta versión explora 2 secciones de la portada; MAX_SECCIONES cambia la amplitud
+MAX_SECCIONES = int(os.getenv("MAX_SECCIONES", "2"))
+
+# ChromeDriver local para las pruebas en Windows
+CHROME_DRIVER_PATH = "chromedriver.exe"
+
+# Versiones de las APIs, que forman parte de la clave de la caché de análisis
+VERSION_NLU = '2021-08-01'
+VERSION_VISION = 'v3.2/es'
 
 authenticator = IAMAuthenticator(IBM_API_KEY)
 nlu = NaturalLanguageUnderstandingV1(
-    version='2021-08-01',
+    version=VERSION_NLU,
     authenticator=authenticator
 )
 nlu.set_service_url(IBM_URL)
+# IBM NLU usa la sesión HTTP compartida (conexiones reutilizadas, reintentos y timeout)
+sesion_http.configurar_servicio_ibm(nlu)
 
 def analizar_imagen_azure(image_url):
     """
     Realiza una solicitud a la API de Azure Computer Vision para analizar una imagen.
     Devuelve una descripción y las 5 etiquetas principales de la imagen.
+    Una foto ya analizada, con esta URL o con otra (otro tamaño, otro periódico), no se vuelve a enviar.
+    """
+    return analizar_imagen(
+        image_url, "azure_vision", VERSION_VISION, _analizar_imagen_azure,
+        valido=lambda analisis: analisis["descripcion"] != "Error",
+    )
+
+def _analizar_imagen_azure(image_url, contenido=None):
+    """
+    Llamada a Azure Computer Vision, sin caché. Si se da el contenido (la imagen ya descargada
+    y reducida), se envía en la petición y Azure no tiene que descargar el original.
     """
     try:
         # Parámetros para la API de Azure
@@ -71,14 +79,15 @@ def analizar_imagen_azure(image_url):
         }
         headers = {
             "Ocp-Apim-Subscription-Key": AZURE_SUBSCRIPTION_KEY,
-            "Content-Type": "application/json"
-        }
-        data = {
-            "url": image_url
         }
 
         # Realizar solicitud a Azure
-        response = requests.post(AZURE_ANALYZE_URL, headers=headers, params=params, json=data)
+        if contenido:
+            headers["Content-Type"] = "application/octet-stream"
+            response = sesion_http.post(AZURE_ANALYZE_URL, endpoint="azure_vision", headers=headers, params=params, data=contenido)
+        else:
+            headers["Content-Type"] = "application/json"
+            response = sesion_http.post(AZURE_ANALYZE_URL, endpoint="azure_vision", headers=headers, params=params, json={"url": image_url})
         response.raise_for_status()
         analysis = response.json()
 
@@ -98,6 +107,8 @@ def analizar_imagen_azure(image_url):
             "confianza_descripcion": confianza_descripcion,
             "etiquetas": etiquetas
         }
+    except ProveedorNoDisponible:
+        return resultado_pendiente({"descripcion": "pendiente", "confianza_descripcion": 0, "etiquetas": []})
     except Exception as e:
         print(f"Error al analizar la imagen con Azure: {e}")
         return {
@@ -139,72 +150,57 @@ def extraer_nombre_de_coleccion(url):
     return domain
 
 def analizar_sentimiento(comentario):
-    try:
-        chat_session = model.start_chat(history=[])
-        response = chat_session.send_message(comentario)
-        texto_respuesta = response.text
-
-        if "NEGATIVO" in texto_respuesta:
-            sentimiento = "NEGATIVO"
-        elif "POSITIVO" in texto_respuesta:
-            sentimiento = "POSITIVO"
-        else:
-            sentimiento = "NEUTRAL"
-
-        confianza = int(texto_respuesta.split("Confianza:")[1].strip().replace("%", ""))
-        return {"sentimiento": sentimiento, "confianza": confianza}
-    except Exception as e:
-        print(f"Error al analizar el comentario: {e}")
-        return {"sentimiento": "Indeterminado", "confianza": 0}
+    """Sentimiento de un solo comentario. Para varios, usar analizar_sentimientos (una petición por lote)."""
+    return analizar_sentimientos([comentario])[0]
 
 def analizar_con_ibm_nlu(texto):
+    """Análisis de IBM Watson NLU de un texto. Un texto ya analizado se toma de la caché."""
+    return en_cache("ibm_nlu", VERSION_NLU, texto, lambda: _analizar_con_ibm_nlu(texto))
+
+def _analizar_con_ibm_nlu(texto):
     try:
-        response = nlu.analyze(
-            text=texto,
-            features=Features(
-                entities=EntitiesOptions(sentiment=True, limit=5),
-                keywords=KeywordsOptions(sentiment=True, limit=5),
-                concepts=ConceptsOptions(limit=5),
-                sentiment=SentimentOptions()
-            )
-        ).get_result()
+        with sesion_http.medir("ibm_nlu"):
+            response = nlu.analyze(
+                text=texto,
+                features=Features(
+                    entities=EntitiesOptions(sentiment=True, limit=5),
+                    keywords=KeywordsOptions(sentiment=True, limit=5),
+                    concepts=ConceptsOptions(limit=5),
+                    sentiment=SentimentOptions()
+                )
+            ).get_result()
 
         return response
+    except ProveedorNoDisponible:
+        return resultado_pendiente({})
     except Exception as e:
         print(f"Error al analizar el texto con IBM NLU: {e}")
         return {}
 
-def extraer_datos_selenium(url_noticia):
-    CHROME_DRIVER_PATH = "chromedriver.exe"
-    service = Service(CHROME_DRIVER_PATH)
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
+def extraer_datos_selenium(url_noticia, pool=None):
+    if pool is None:
+        with PoolNavegadores(1, driver_path=CHROME_DRIVER_PATH, binary_location=None) as pool_temporal:
+            return extraer_datos_selenium(url_noticia, pool_temporal)
 
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.get(url_noticia)
-    time.sleep(0.7)
+    # El navegador se devuelve al pool en cuanto se ha leído la página
+    with pool.prestar() as driver:
+        # Abrir la página y esperar solo hasta que estén listos cookies, JSON-LD y comentarios
+        preparar_pagina(driver, url_noticia)
 
-    try:
-        aceptar_boton = driver.find_element(By.CSS_SELECTOR, 'a.mrf-button[data-mrf-role="userAgreeToAll"]')
-        aceptar_boton.click()
-        print("Botón 'Aceptar y continuar' clicado.")
-    except Exception as e:
-        print("No se encontró el botón 'Aceptar y continuar':", e)
+        page_source = driver.page_source
 
-    time.sleep(0.7)
-    for i in range(3):
-        driver.execute_script("window.scrollBy(0, document.body.scrollHeight);")
-        time.sleep(0.5)
+        try:
+            # Todos los comentarios en una sola llamada al navegador
+            lista_comentarios = extraer_comentarios(driver)
+        except Exception as e:
+            lista_comentarios = None
+            print(f"Error al intentar obtener los comentarios: {e}")
 
-    page_source = driver.page_source
-    soup = BeautifulSoup(page_source, 'html.parser')
     datos_noticia = {}
 
-    ld_json_script = soup.find('script', {'type': 'application/ld+json'})
-    if ld_json_script:
-        ld_json_content = json.loads(ld_json_script.string)
+    # El JSON-LD de la noticia se lee directamente del HTML, sin construir el árbol de la página
+    ld_json_content = ld_json_noticia(page_source)
+    if ld_json_content:
         datos_noticia = {
             'headline': ld_json_content.get('headline'),
             'url': ld_json_content.get('url'),
@@ -223,34 +219,14 @@ def extraer_datos_selenium(url_noticia):
         # Si hay una imagen asociada, analiza la imagen con Azure
         if datos_noticia.get('image_url'):
             datos_noticia['image_analysis'] = analizar_imagen_azure(ld_json_content.get('image', {}).get('url') if isinstance(ld_json_content.get('image'), dict) else ld_json_content.get('image'))
-        # Intentar obtener los comentarios y agregar la información
-    try:
-        comentarios = driver.find_elements(By.CLASS_NAME, 'comment')
-        lista_comentarios = []
-        if comentarios:
-            for comentario in comentarios:
-                comentario_data = {}
-                # Nombre del usuario
-                comentario_data['nombre'] = comentario.find_element(By.CLASS_NAME, 'comment-info-name').text
-                # Tiempo de publicación
-                comentario_data['tiempo'] = comentario.find_element(By.CLASS_NAME, 'comment-info-date').text
-                # Texto del comentario
-                comentario_data['texto_comentario'] = comentario.find_element(By.CLASS_NAME, 'comment-info-text').text
-
-                # Análisis de sentimiento usando Gemini
-                analisis_sentimiento = analizar_sentimiento(comentario_data['texto_comentario'])
-                comentario_data.update(analisis_sentimiento)
-
-                # Agregar comentario al listado
-                lista_comentarios.append(comentario_data)
-            datos_noticia['comentarios'] = lista_comentarios
-        else:
-            datos_noticia['comentarios'] = []
-    except Exception as e:
-        print(f"Error al intentar obtener los comentarios: {e}")
 
-    # Cerrar el navegador
-    driver.quit()
+    if lista_comentarios is not None:
+        # Análisis de sentimiento usando Gemini: todos los comentarios en unas pocas peticiones
+        analisis = analizar_sentimientos([c['texto_comentario'] for c in lista_comentarios])
+        for comentario_data, analisis_sentimiento in zip(lista_comentarios, analisis):
+            comentario_data.update(analisis_sentimiento)
+        datos_noticia['comentarios'] = lista_comentarios
+
     return datos_noticia
 
 # Ajustar `explorar_pagina` para limitar el número de noticias procesadas
@@ -268,35 +244,20 @@ def explorar_pagina(url):
     domain = urlparse(url).netloc.replace('www.', '')
     datos_noticias = []
 
-    response = requests.get(url)
+    response = sesion_http.get(url, endpoint="portada")
 
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        secciones = soup.find_all(['section', 'div'], class_=['module', 'mosaic', 'mosaic-wrapper', 'module recirculation'])
-
-        titulo_seccion_actual = "OTRO"
-        for i, seccion in enumerate(secciones[:2], 1):  # Procesa solo las 3 primeras noticias
-            span_titulo = seccion.find('span', class_='title-text-title')
-            if span_titulo:
-                titulo_seccion_actual = span_titulo.text.strip()
-
-            articles = seccion.find_all('article', class_=['module-text-below-atom', 'module-text-side-atom', 'module-text-over-atom', 'swiper-slide'])
-            if not articles:
-                continue
-
-            for article in articles[:3]:  # Limita el procesamiento de noticias individuales
-                articulo_data = {}
-                titular_tag = article.find('a', class_='media') or article.find('a', class_='image')
-                if titular_tag:
-                    titular = titular_tag.get('title')
-                    url_noticia = titular_tag.get('href')
-
-                    articulo_data['titular'] = titular
-                    articulo_data['url_noticia'] = url_noticia
-
-                    if url_noticia and url_noticia.endswith('.html'):
-                        detalles_noticia = extraer_datos_selenium(url_noticia)
-                        articulo_data.update(detalles_noticia)
+        # La portada se indexa en una sola pasada y después se procesan sus noticias
+        articulos = articulos_portada(response.text, max_secciones=MAX_SECCIONES, max_articulos=MAX_ARTICULOS_POR_SECCION)
+
+        # Los navegadores se mantienen abiertos durante toda la exploración
+        with PoolNavegadores(NUM_NAVEGADORES, driver_path=CHROME_DRIVER_PATH, binary_location=None) as pool:
+            # Las noticias más valiosas se procesan primero (ver planificacion.py)
+            for _, articulo_data in planificar({url: articulos}):
+                url_noticia = articulo_data.get('url_noticia')
+                if url_noticia and url_noticia.endswith('.html'):
+                    detalles_noticia = extraer_datos_selenium(url_noticia, pool)
+                    articulo_data.update(detalles_noticia)
                 datos_noticias.append(articulo_data)
 
     else:
@@ -308,6 +269,11 @@ def explorar_pagina(url):
         insertar_datos(collection, datos_noticias)
 
     end_time = time.time()
+    print(resumen_esperas())
+    print(sesion_http.resumen_contadores())
+    print(resumen_cache())
+    print(resumen_imagenes())
+    print(resumen_triaje())
     print(f"Tiempo total de extracción: {end_time - start_time:.2f} segundos")
 
 
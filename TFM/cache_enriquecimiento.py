@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from limites_proveedores import es_pendiente
+
+# Fichero SQLite de la caché. Vacío para no usar la caché y llamar siempre a los proveedores.
+RUTA_CACHE_ENRIQUECIMIENTO = os.getenv("RUTA_CACHE_ENRIQUECIMIENTO", "cache_enriquecimiento.sqlite")
+
+# Días que se reutiliza un resultado (0 = sin caducidad) y tamaño máximo de la caché
+TTL_CACHE_DIAS = float(os.getenv("TTL_CACHE_DIAS", "30"))
+MAX_CACHE_MB = float(os.getenv("MAX_CACHE_MB", "512"))
+
+# Al superar el tamaño máximo se borran los resultados usados hace más tiempo hasta dejar este margen
+FRACCION_TRAS_LIMPIEZA = 0.9
+
+
+def clave_cache(proveedor, version, entrada):
+    """
+    Clave de un resultado: el proveedor, la versión del modelo o de la API y un
+    hash de la entrada. Cambiar de versión invalida los resultados anteriores.
+    """
+    contenido = json.dumps([proveedor, version, entrada], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+class CacheEnriquecimiento:
+    """
+    Caché persistente de los resultados de los análisis (Gemini, Azure, IBM NLU), para
+    no volver a pagar por el mismo texto o la misma imagen en cada exploración. Los
+    resultados caducan a los `ttl` segundos y, si la caché supera `max_bytes`, se
+    borran primero los que se usaron hace más tiempo (LRU).
+    """
+
+    def __init__(self, ruta, ttl=TTL_CACHE_DIAS * 86400, max_bytes=MAX_CACHE_MB * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        # WAL: las lecturas no esperan a las escrituras y cada escritura no fuerza un fsync
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "clave TEXT PRIMARY KEY, proveedor TEXT, valor TEXT, creada REAL, usada REAL, tamano INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_usada ON cache (usada)")
+        if self.ttl:
+            self._db.execute("DELETE FROM cache WHERE creada < ?", (time.time() - self.ttl,))
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(tamano), 0) FROM cache").fetchone()[0]
+
+        # Aciertos y fallos por proveedor
+        self.contadores = {}
+
+    def _contar(self, proveedor, acierto):
+        contador = self.contadores.setdefault(proveedor, {"aciertos": 0, "fallos": 0})
+        contador["aciertos" if acierto else "fallos"] += 1
+
+    def obtener(self, proveedor, version, entrada):
+        """Resultado guardado para esta entrada, o None si no está o ha caducado."""
+        clave = clave_cache(proveedor, version, entrada)
+        ahora = time.time()
+        with self._lock:
+            fila = self._db.execute("SELECT valor, creada FROM cache WHERE clave = ?", (clave,)).fetchone()
+            if fila is not None and self.ttl and fila[1] < ahora - self.ttl:
+                self._borrar([clave])
+                fila = None
+            if fila is not None:
+                self._db.execute("UPDATE cache SET usada = ? WHERE clave = ?", (ahora, clave))
+                self._db.commit()
+            self._contar(proveedor, fila is not None)
+        return None if fila is None else json.loads(fila[0])
+
+    def guardar(self, proveedor, version, entrada, valor):
+        """Guarda el resultado de analizar `entrada`."""
+        clave = clave_cache(proveedor, version, entrada)
+        texto = json.dumps(valor, ensure_ascii=False, default=str)
+        ahora = time.time()
+        with self._lock:
+            anterior = self._db.execute("SELECT tamano FROM cache WHERE clave = ?", (clave,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (clave, proveedor, valor, creada, usada, tamano) VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, proveedor, texto, ahora, ahora, len(texto)),
+            )
+            self._bytes += len(texto) - (anterior[0] if anterior else 0)
+            if self.max_bytes and self._bytes > self.max_bytes:
+                self._limpiar()
+            self._db.commit()
+
+    def _borrar(self, claves):
+        for clave in claves:
+            fila = self._db.execute("SELECT tamano FROM cache WHERE clave = ?", (clave,)).fetchone()
+            if fila is not None:
+                self._db.execute("DELETE FROM cache WHERE clave = ?", (clave,))
+                self._bytes -= fila[0]
+
+    def _limpiar(self):
+        """Borra los resultados usados hace más tiempo hasta bajar del tamaño máximo."""
+        objetivo = self.max_bytes * FRACCION_TRAS_LIMPIEZA
+        borradas = []
+        for clave, tamano in self._db.execute("SELECT clave, tamano FROM cache ORDER BY usada"):
+            if self._bytes <= objetivo:
+                break
+            borradas.append(clave)
+            self._bytes -= tamano
+        self._db.executemany("DELETE FROM cache WHERE clave = ?", [(clave,) for clave in borradas])
+
+    def resumen(self):
+        """Texto con los aciertos y fallos de la caché por proveedor."""
+        with self._lock:
+            copia = {proveedor: dict(contador) for proveedor, contador in self.contadores.items()}
+        if not copia:
+            return "No se ha consultado la caché de análisis."
+        lineas = [f"Caché de análisis ({self._bytes / (1024 * 1024):.1f} MB):"]
+        for proveedor, contador in sorted(copia.items()):
+            total = contador["aciertos"] + contador["fallos"]
+            lineas.append(
+                f"  {proveedor}: {contador['aciertos']} aciertos, {contador['fallos']} fallos "
+                f"({100 * contador['aciertos'] / total:.0f} % de aciertos)"
+            )
+        return "\n".join(lineas)
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+
+class SinCache:
+    """Caché vacía que se usa cuando RUTA_CACHE_ENRIQUECIMIENTO está vacío: todo se vuelve a analizar."""
+
+    def obtener(self, proveedor, version, entrada):
+        return None
+
+    def guardar(self, proveedor, version, entrada, valor):
+        pass
+
+    def resumen(self):
+        return "Caché de análisis desactivada."
+
+    def cerrar(self):
+        pass
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def obtener_cache():
+    """Devuelve la caché compartida por todos los módulos, abriéndola la primera vez."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            ruta = RUTA_CACHE_ENRIQUECIMIENTO
+            if not ruta:
+                _cache = SinCache()
+            else:
+                directorio = os.path.dirname(ruta)
+                if directorio:
+                    os.makedirs(directorio, exist_ok=True)
+                _cache = CacheEnriquecimiento(ruta)
+        return _cache
+
+
+def en_cache(proveedor, version, entrada, calcular, valido=bool):
+    """
+    Devuelve el resultado guardado para `entrada` o, si no lo hay, lo calcula y lo guarda.
+
+    Parámetros:
+    proveedor (str): Servicio que hace el análisis ('ibm_nlu', 'azure_vision'...).
+    version (str): Versión del modelo o de la API; forma parte de la clave.
+    entrada: Texto, URL o parámetros que se analizan (serializable a JSON).
+    calcular (callable): Función sin argumentos que hace la llamada al proveedor.
+    valido (callable): Indica si un resultado se puede guardar. Los resultados de error
+        (y los pendientes, ver limites_proveedores.py) no se guardan, para volver a
+        intentarlo en la siguiente exploración.
+    """
+    cache = obtener_cache()
+    valor = cache.obtener(proveedor, version, entrada)
+    if valor is None:
+        valor = calcular()
+        if valido(valor) and not es_pendiente(valor):
+            cache.guardar(proveedor, version, entrada, valor)
+    return valor
+
+
+def varios_en_cache(proveedor, version, entradas, calcular_varios, valido=bool):
+    """
+    Como `en_cache`, para los proveedores que analizan varias entradas en una petición:
+    solo se envían a `calcular_varios` las que no están en la caché.
+
+    Parámetros:
+    calcular_varios (callable): Recibe la lista de entradas pendientes y devuelve un
+        resultado por entrada, en el mismo orden.
+
+    Retorna:
+    list: Un resultado por entrada, en el mismo orden.
+    """
+    cache = obtener_cache()
+    resultados = [cache.obtener(proveedor, version, entrada) for entrada in entradas]
+    pendientes = [i for i, valor in enumerate(resultados) if valor is None]
+    if pendientes:
+        calculados = calcular_varios([entradas[i] for i in pendientes])
+        for i, valor in zip(pendientes, calculados):
+            resultados[i] = valor
+            if valido(valor) and not es_pendiente(valor):
+                cache.guardar(proveedor, version, entradas[i], valor)
+    return resultados
+
+
+def resumen_cache():
+    """Atajo para `obtener_cache().resumen()`."""
+    return obtener_cache().resumen()
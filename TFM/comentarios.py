@@ -0,0 +1,156 @@
+import os
+import re
+from urllib.parse import quote, urlparse
+
+import sesion_http
+from concurrencia import turno_host
+
+# Endpoint de datos que consulta el widget de comentarios. Es una plantilla que debe usar
+# {pagina} y puede usar {id} (identificador de la noticia), {url} (URL de la noticia
+# codificada) y {tamano}. Sin configurar, los comentarios se leen del HTML o con el navegador.
+# Ejemplo: https://comentarios.ejemplo.com/api/threads/{id}/comments?page={pagina}&size={tamano}
+COMENTARIOS_API_URL = os.getenv("COMENTARIOS_API_URL")
+COMENTARIOS_POR_PAGINA = int(os.getenv("COMENTARIOS_POR_PAGINA", "50"))
+MAX_PAGINAS_COMENTARIOS = int(os.getenv("MAX_PAGINAS_COMENTARIOS", "20"))
+
+# Ruta de cada campo en la respuesta JSON del endpoint (admite rutas como 'author.name').
+# Tienen que coincidir con las del widget configurado en COMENTARIOS_API_URL: si un comentario
+# no tiene texto en CAMPO_TEXTO, la respuesta se descarta y se usa el navegador.
+CAMPO_LISTA = os.getenv("COMENTARIOS_CAMPO_LISTA", "comments")
+CAMPO_TOTAL = os.getenv("COMENTARIOS_CAMPO_TOTAL", "total")
+CAMPO_ID = os.getenv("COMENTARIOS_CAMPO_ID", "id")
+CAMPO_NOMBRE = os.getenv("COMENTARIOS_CAMPO_NOMBRE", "author.name")
+CAMPO_TIEMPO = os.getenv("COMENTARIOS_CAMPO_TIEMPO", "date")
+CAMPO_TEXTO = os.getenv("COMENTARIOS_CAMPO_TEXTO", "text")
+CAMPO_RESPUESTAS = os.getenv("COMENTARIOS_CAMPO_RESPUESTAS", "replies")
+
+
+class FormatoComentariosInvalido(Exception):
+    """La respuesta del endpoint no tiene los campos configurados."""
+
+
+def validar_plantilla(plantilla):
+    """
+    Comprueba la plantilla del endpoint. Sin {pagina} se pediría siempre la misma página
+    y los comentarios se repetirían.
+
+    Retorna:
+    str: La misma plantilla (o None si no está configurada).
+    """
+    if plantilla and '{pagina}' not in plantilla:
+        raise ValueError(f"La plantilla de COMENTARIOS_API_URL debe incluir {{pagina}}: {plantilla}")
+    return plantilla
+
+
+validar_plantilla(COMENTARIOS_API_URL)
+
+
+def id_noticia(url_noticia, soup=None):
+    """
+    Obtiene el identificador de la noticia que usa el widget de comentarios.
+    Las URLs de Grupo Joly terminan en el identificador: .../titular_0_2001234567.html
+
+    Retorna:
+    str: Identificador de la noticia, o None si no se encuentra.
+    """
+    coincidencia = re.search(r'_(\d+)\.html$', urlparse(url_noticia).path)
+    if coincidencia:
+        return coincidencia.group(1)
+    if soup is not None:
+        elemento = soup.select_one('[data-content-id]')
+        if elemento:
+            return elemento['data-content-id']
+    return None
+
+
+def _valor(dato, ruta):
+    """Valor de `ruta` ('author.name') dentro de `dato`, o None si no está."""
+    for parte in ruta.split('.'):
+        dato = dato.get(parte) if isinstance(dato, dict) else None
+    return dato
+
+
+def _texto(dato, ruta):
+    valor = _valor(dato, ruta)
+    return str(valor) if isinstance(valor, (str, int, float)) else ''
+
+
+def _registros(elementos):
+    """Convierte los comentarios (y sus respuestas) al formato que guarda el scraper."""
+    registros = []
+    for elemento in elementos:
+        if not isinstance(elemento, dict) or not isinstance(_valor(elemento, CAMPO_TEXTO), str):
+            raise FormatoComentariosInvalido(f"comentario sin el campo '{CAMPO_TEXTO}'")
+        registros.append({
+            'nombre': _texto(elemento, CAMPO_NOMBRE),
+            'tiempo': _texto(elemento, CAMPO_TIEMPO),
+            'texto_comentario': _texto(elemento, CAMPO_TEXTO),
+        })
+        respuestas = _valor(elemento, CAMPO_RESPUESTAS)
+        if isinstance(respuestas, list):
+            registros.extend(_registros(respuestas))
+    return registros
+
+
+def obtener_comentarios(url_noticia, soup=None):
+    """
+    Descarga los comentarios de una noticia desde el endpoint JSON del widget, página a página,
+    sin renderizar la noticia. Se piden páginas hasta que llega una vacía, se han leído los
+    `total` comentarios o el servidor repite la página anterior (mismo id en el primer comentario).
+
+    Parámetros:
+    url_noticia (str): URL de la noticia.
+    soup (BeautifulSoup): HTML de la noticia, para buscar el identificador si no está en la URL.
+
+    Retorna:
+    list: Lista de diccionarios con 'nombre', 'tiempo' y 'texto_comentario', o None si el
+    endpoint no está configurado, falla o no tiene el formato esperado (en ese caso se usa
+    el navegador).
+    """
+    if not COMENTARIOS_API_URL:
+        return None
+
+    identificador = id_noticia(url_noticia, soup)
+    if identificador is None and '{id}' in COMENTARIOS_API_URL:
+        print(f"No se encontró el identificador de la noticia para pedir sus comentarios: {url_noticia}")
+        return None
+
+    comentarios = []
+    leidos = 0
+    anteriores, primero_anterior = None, None
+    for pagina in range(1, MAX_PAGINAS_COMENTARIOS + 1):
+        url_api = COMENTARIOS_API_URL.format(
+            id=identificador,
+            url=quote(url_noticia, safe=''),
+            pagina=pagina,
+            tamano=COMENTARIOS_POR_PAGINA,
+        )
+        try:
+            with turno_host(url_api):
+                response = sesion_http.get(url_api, endpoint="comentarios")
+            response.raise_for_status()
+            respuesta = response.json()
+            elementos = respuesta if isinstance(respuesta, list) else _valor(respuesta, CAMPO_LISTA)
+            if not isinstance(elementos, list):
+                raise FormatoComentariosInvalido(f"la respuesta no tiene la lista '{CAMPO_LISTA}'")
+            if not elementos:
+                break
+            primero = _valor(elementos[0], CAMPO_ID)
+            if elementos == anteriores or (primero is not None and primero == primero_anterior):
+                # El servidor ignora la página pedida y devuelve otra vez la misma
+                break
+            comentarios.extend(_registros(elementos))
+        except FormatoComentariosInvalido as e:
+            print(f"Los comentarios de la API no tienen el formato esperado ({e}). Se usa el navegador.")
+            return None
+        except Exception as e:
+            print(f"Error al obtener los comentarios desde la API: {e}")
+            return None
+
+        anteriores, primero_anterior = elementos, primero
+        leidos += len(elementos)
+        total = _valor(respuesta, CAMPO_TOTAL)
+        if isinstance(total, int) and leidos >= total:
+            break
+
+    return comentarios
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlparse
+
+# Número de noticias que se procesan a la vez
+NUM_TRABAJADORES = int(os.getenv("NUM_TRABAJADORES", "1"))
+
+# Cortesía con los periódicos: peticiones simultáneas por host y separación mínima entre ellas
+MAX_PETICIONES_POR_HOST = int(os.getenv("MAX_PETICIONES_POR_HOST", "2"))
+INTERVALO_MINIMO_HOST = float(os.getenv("INTERVALO_MINIMO_HOST", "0.25"))
+
+
+class CortesiaHosts:
+    """
+    Limita cuántas peticiones se hacen a la vez a un mismo host y cuánto tiempo
+    pasa como mínimo entre el inicio de dos peticiones consecutivas.
+
+    Los hilos usan `turno` y el motor asíncrono `turno_async`. Los dos comparten los
+    turnos de cada host, así que la separación mínima se respeta aunque se mezclen.
+    """
+
+    def __init__(self, max_simultaneas=MAX_PETICIONES_POR_HOST, intervalo_minimo=INTERVALO_MINIMO_HOST):
+        self.max_simultaneas = max(1, max_simultaneas)
+        self.intervalo_minimo = intervalo_minimo
+        self._lock = threading.Lock()
+        self._semaforos = {}
+        self._siguiente_turno = {}
+        # Semáforos de asyncio por bucle de eventos: cada uno solo sirve en el bucle en que se crea
+        self._semaforos_async = weakref.WeakKeyDictionary()
+
+    def _semaforo(self, host):
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.max_simultaneas)
+            return self._semaforos[host]
+
+    def _reservar(self, host):
+        """Reserva el siguiente turno del host y devuelve los segundos que faltan para él."""
+        with self._lock:
+            ahora = time.monotonic()
+            inicio = max(ahora, self._siguiente_turno.get(host, 0.0))
+            self._siguiente_turno[host] = inicio + self.intervalo_minimo
+        return inicio - ahora
+
+    @contextmanager
+    def turno(self, url):
+        """Bloquea hasta que se puede hacer una petición a `url` sin saturar su host."""
+        host = urlparse(url).netloc
+        with self._semaforo(host):
+            espera = self._reservar(host)
+            if espera > 0:
+                time.sleep(espera)
+            yield
+
+    @asynccontextmanager
+    async def turno_async(self, url):
+        """Como `turno`, pero espera sin bloquear el bucle de eventos."""
+        host = urlparse(url).netloc
+        semaforos = self._semaforos_async.setdefault(asyncio.get_running_loop(), {})
+        if host not in semaforos:
+            semaforos[host] = asyncio.BoundedSemaphore(self.max_simultaneas)
+        async with semaforos[host]:
+            espera = self._reservar(host)
+            if espera > 0:
+                await asyncio.sleep(espera)
+            yield
+
+
+# Instancia compartida por todos los módulos del scraper
+cortesia = CortesiaHosts()
+
+
+def turno_host(url):
+    """Atajo para `cortesia.turno(url)`."""
+    return cortesia.turno(url)
+
+
+def turno_host_async(url):
+    """Atajo para `cortesia.turno_async(url)`."""
+    return cortesia.turno_async(url)
+
+
+def procesar_en_orden(funcion, elementos, trabajadores=NUM_TRABAJADORES):
+    """
+    Aplica `funcion` a cada elemento usando varios hilos y devuelve los resultados
+    en el mismo orden que los elementos, a medida que están listos.
+
+    Como mucho hay 2 * `trabajadores` elementos en curso, así que los resultados
+    no se acumulan en memoria si quien los consume es más lento.
+
+    Parámetros:
+    funcion (callable): Función que procesa un elemento.
+    elementos (iterable): Elementos a procesar.
+    trabajadores (int): Número de hilos. Con 1 se procesa en el hilo actual.
+    """
+    if trabajadores <= 1:
+        for elemento in elementos:
+            yield funcion(elemento)
+        return
+
+    with ThreadPoolExecutor(max_workers=trabajadores) as executor:
+        pendientes = deque()
+        for elemento in elementos:
+            pendientes.append(executor.submit(funcion, elemento))
+            if len(pendientes) >= 2 * trabajadores:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
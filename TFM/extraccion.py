@@ -0,0 +1,464 @@
+import json
+import os
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# Backend con el que BeautifulSoup analiza el HTML: 'lxml' (escrito en C, varias veces más
+# rápido en portadas grandes) o 'html.parser' (incluido en Python, sin dependencias)
+PARSER_HTML = os.getenv("PARSER_HTML", "lxml")
+
+# Elementos que indican que la noticia tiene un widget de comentarios que se rellena con JavaScript
+SELECTOR_WIDGET_COMENTARIOS = os.getenv("SELECTOR_WIDGET_COMENTARIOS", "#comments, .comments, [data-comments]")
+
+# Scripts JSON-LD de la página y comentarios HTML/CDATA con los que a veces se envuelven
+PATRON_LD_JSON = re.compile(
+    r'<script\b[^>]*\stype\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+PATRON_ENVOLTORIO = re.compile(r'^\s*(?://\s*)?(?:<!--|<!\[CDATA\[)|(?://\s*)?(?:-->|\]\]>)\s*$')
+
+# Tipos de schema.org que describen la noticia, de más a menos preferido
+TIPOS_NOTICIA = (
+    'NewsArticle',
+    'ReportageNewsArticle',
+    'AnalysisNewsArticle',
+    'OpinionNewsArticle',
+    'BackgroundNewsArticle',
+    'ReviewNewsArticle',
+    'Article',
+    'BlogPosting',
+    'Report',
+)
+
+# Clases de las secciones y artículos de la portada, y etiquetas HTML sin cierre
+CLASES_SECCION = frozenset(['module', 'mosaic', 'mosaic-wrapper'])
+CLASES_ARTICULO = frozenset(['module-text-below-atom', 'module-text-side-atom', 'module-text-over-atom', 'swiper-slide'])
+ETIQUETAS_VACIAS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'])
+
+# Tamaño de los bloques en los que se lee la portada
+TAMANO_BLOQUE_PORTADA = 64 * 1024
+
+_parser_elegido = None
+
+
+def parser_html():
+    """
+    Devuelve el backend configurado en PARSER_HTML, o 'html.parser' si no está instalado.
+    """
+    global _parser_elegido
+    if _parser_elegido is None:
+        try:
+            BeautifulSoup('', PARSER_HTML)
+            _parser_elegido = PARSER_HTML
+        except FeatureNotFound:
+            print(f"El parser '{PARSER_HTML}' no está instalado. Se usa 'html.parser'.")
+            _parser_elegido = 'html.parser'
+    return _parser_elegido
+
+
+def crear_soup(html, parser=None):
+    """
+    Analiza el HTML de una página con BeautifulSoup.
+
+    Parámetros:
+    html (str): HTML de la página.
+    parser (str): Backend que se quiere usar. Por defecto, el de `parser_html()`.
+
+    Retorna:
+    BeautifulSoup: Página analizada.
+    """
+    return BeautifulSoup(html, parser or parser_html())
+
+
+def _bloques_ld_json(html):
+    """Genera el contenido de cada script application/ld+json del HTML, en orden."""
+    for coincidencia in PATRON_LD_JSON.finditer(html):
+        contenido = PATRON_ENVOLTORIO.sub('', coincidencia.group(1)).strip()
+        if not contenido:
+            continue
+        try:
+            # strict=False admite saltos de línea sin escapar dentro de articleBody
+            yield json.loads(contenido, strict=False)
+        except json.JSONDecodeError as e:
+            print(f"JSON-LD no válido: {e}")
+
+
+def _nodos_ld_json(dato):
+    """Recorre un bloque JSON-LD y devuelve todos sus nodos, incluidos los de @graph."""
+    if isinstance(dato, list):
+        for elemento in dato:
+            yield from _nodos_ld_json(elemento)
+    elif isinstance(dato, dict):
+        yield dato
+        if '@graph' in dato:
+            yield from _nodos_ld_json(dato['@graph'])
+
+
+def _prioridad(nodo):
+    """Posición del tipo del nodo en TIPOS_NOTICIA (menor es mejor), o None si no es una noticia."""
+    tipos = nodo.get('@type')
+    if isinstance(tipos, str):
+        tipos = [tipos]
+    if not isinstance(tipos, list):
+        return None
+    posiciones = [TIPOS_NOTICIA.index(tipo) for tipo in tipos if tipo in TIPOS_NOTICIA]
+    return min(posiciones) if posiciones else None
+
+
+def ld_json_noticia(html):
+    """
+    Busca el nodo JSON-LD de la noticia recorriendo el HTML con una expresión regular,
+    sin construir el árbol de la página. Se revisan todos los bloques application/ld+json
+    (también los que usan @graph) y se elige el nodo NewsArticle; si no hay ninguno, el
+    de otro tipo de artículo, y si tampoco, el primer nodo de la página.
+
+    Parámetros:
+    html (str): Código fuente de la noticia.
+
+    Retorna:
+    dict: JSON-LD de la noticia, o None si no se encuentra o no es válido.
+    """
+    primer_nodo = None
+    mejor_nodo, mejor_prioridad = None, None
+    for bloque in _bloques_ld_json(html):
+        for nodo in _nodos_ld_json(bloque):
+            if primer_nodo is None and '@graph' not in nodo:
+                primer_nodo = nodo
+            prioridad = _prioridad(nodo)
+            if prioridad == 0:
+                # Un NewsArticle no se puede mejorar: se deja de leer el HTML
+                return nodo
+            if prioridad is not None and (mejor_prioridad is None or prioridad < mejor_prioridad):
+                mejor_nodo, mejor_prioridad = nodo, prioridad
+    return mejor_nodo if mejor_nodo is not None else primer_nodo
+
+
+def campos_noticia(ld_json_content):
+    """
+    Extrae del JSON-LD los campos de la noticia que se guardan en la base de datos.
+
+    Parámetros:
+    ld_json_content (dict): JSON-LD de la noticia.
+
+    Retorna:
+    dict: Diccionario con los datos de la noticia.
+    """
+    datos_noticia = {}
+
+    # Acceder a la información dentro del JSON
+    datos_noticia['headline'] = ld_json_content.get('headline')
+    datos_noticia['url'] = ld_json_content.get('url')
+
+    # Manejar si 'image' es un string o un objeto
+    image = ld_json_content.get('image')
+    if isinstance(image, str):
+        datos_noticia['image_url'] = image
+        datos_noticia['image_name'] = ''
+    elif isinstance(image, dict):
+        datos_noticia['image_url'] = image.get('url')
+        datos_noticia['image_name'] = image.get('name')
+
+    datos_noticia['author'] = ld_json_content.get('author', [{}])[0].get('name')
+    datos_noticia['date_published'] = ld_json_content.get('datePublished')
+    datos_noticia['date_modified'] = ld_json_content.get('dateModified')
+    datos_noticia['publisher'] = ld_json_content.get('publisher', {}).get('name')
+    datos_noticia['article_section'] = ld_json_content.get('articleSection', [])
+    datos_noticia['description'] = ld_json_content.get('description')
+    datos_noticia['article_body'] = ld_json_content.get('articleBody')
+    datos_noticia['keywords'] = ld_json_content.get('keywords', [])
+    datos_noticia['content_location'] = ld_json_content.get('contentLocation', [{}])[0].get('name')
+
+    return datos_noticia
+
+
+def comentarios_desde_soup(soup):
+    """
+    Lee los comentarios que ya vienen en el HTML (mismos campos que en Selenium).
+
+    Retorna:
+    list: Lista de diccionarios con 'nombre', 'tiempo' y 'texto_comentario'.
+    """
+    def texto(comentario, clase):
+        elemento = comentario.find(class_=clase)
+        return elemento.get_text(" ", strip=True) if elemento else ''
+
+    return [
+        {
+            'nombre': texto(comentario, 'comment-info-name'),
+            'tiempo': texto(comentario, 'comment-info-date'),
+            'texto_comentario': texto(comentario, 'comment-info-text'),
+        }
+        for comentario in soup.find_all(class_='comment')
+    ]
+
+
+def relacionadas_desde_soup(soup, url_base=None):
+    """
+    Lee las noticias relacionadas (aside.related-content) de una noticia, con el mismo
+    formato que las de la portada.
+
+    Parámetros:
+    soup (BeautifulSoup): Página de la noticia.
+    url_base (str): URL de la noticia, para convertir los enlaces relativos en absolutos.
+
+    Retorna:
+    list: Lista de diccionarios con 'titulo_relacionado' y 'url_relacionada'.
+    """
+    relacionadas = []
+    for enlace in soup.select('aside.related-content a[href]'):
+        subtitulo = enlace.find('h2', class_='subtitle-atom')
+        relacionadas.append({
+            'titulo_relacionado': subtitulo.get_text().strip() if subtitulo else "Sin título",
+            'url_relacionada': urljoin(url_base, enlace['href']) if url_base else enlace['href'],
+        })
+    return relacionadas
+
+
+def necesita_navegador(soup, ld_json_content, comentarios):
+    """
+    Decide si la noticia tiene que abrirse con Selenium porque sus comentarios
+    solo aparecen después de ejecutar JavaScript.
+
+    Parámetros:
+    soup (BeautifulSoup): HTML servido sin renderizar.
+    ld_json_content (dict): JSON-LD de la noticia, o None.
+    comentarios (list): Comentarios encontrados en el HTML sin renderizar.
+
+    Retorna:
+    bool: True si hay que renderizar la página.
+    """
+    if ld_json_content is None:
+        # Sin JSON-LD en el HTML servido no podemos extraer nada sin el navegador
+        return True
+    if comentarios:
+        # Los comentarios ya vienen en el HTML
+        return False
+
+    # schema.org permite indicar el número de comentarios en el propio JSON-LD
+    num_comentarios = ld_json_content.get('commentCount')
+    if num_comentarios is not None:
+        try:
+            return int(num_comentarios) > 0
+        except (TypeError, ValueError):
+            pass
+
+    # Si hay un widget de comentarios sin rellenar no sabemos si está vacío
+    return bool(soup.select(SELECTOR_WIDGET_COMENTARIOS))
+
+
+def sin_senal_comentarios(soup, ld_json_content):
+    """
+    Indica si el HTML servido no da ninguna pista sobre los comentarios: ni comentarios,
+    ni commentCount en el JSON-LD, ni widget de comentarios. En ese caso el modo estático
+    da la noticia por no comentada sin haberlo comprobado.
+
+    Parámetros:
+    soup (BeautifulSoup): HTML servido sin renderizar.
+    ld_json_content (dict): JSON-LD de la noticia, o None.
+
+    Retorna:
+    bool: True si no hay ninguna señal de comentarios.
+    """
+    if ld_json_content is not None and ld_json_content.get('commentCount') is not None:
+        return False
+    return not soup.select(SELECTOR_WIDGET_COMENTARIOS)
+
+
+class IndicePortada:
+    """
+    Indexa la portada en una sola pasada sobre el HTML. Recibe los eventos del parser
+    (inicio y fin de etiqueta y texto) con la interfaz de los "target parsers" de lxml,
+    sin construir el árbol, y al cerrar devuelve los artículos en el orden del documento.
+
+    Reproduce el recorrido con find_all de las versiones anteriores: las secciones se cuentan
+    en el orden en que empiezan, también las anidadas (div.mosaic-wrapper > section.module), y
+    cada sección tiene los artículos de todo su contenido, así que un artículo de una sección
+    anidada aparece también en las que la contienen (la planificación descarta los repetidos).
+    El título de una sección es el de su primer span.title-text-title, aunque esté en una
+    sección anidada; si no tiene, se mantiene el de la sección anterior (empezando por
+    "OTRO"), o es "OTRO" si `heredar_titulo` es False.
+    """
+
+    def __init__(self, max_secciones=3, max_articulos=3, heredar_titulo=True):
+        self.max_secciones = max_secciones
+        self.max_articulos = max_articulos
+        self.heredar_titulo = heredar_titulo
+        self.secciones = []       # Secciones indexadas, en el orden en que empiezan
+        self.terminado = False    # True cuando ya no puede aparecer nada que indexar
+        self._pila = []           # (etiqueta, papeles que abre) de cada elemento abierto
+        self._abiertas = []       # Secciones abiertas (None si superan max_secciones)
+        self._articulo = None     # Artículo abierto
+        self._texto = None        # Texto que se está capturando (título o subtítulo)
+
+    def start(self, tag, attrib):
+        tag = tag.lower()
+        if tag in ETIQUETAS_VACIAS:
+            return
+        clases = set((attrib.get('class') or '').split())
+        papeles = []
+        # Secciones indexadas que contienen este elemento
+        indexadas = [seccion for seccion in self._abiertas if seccion is not None]
+        articulo = self._articulo
+
+        if tag in ('section', 'div') and clases & CLASES_SECCION:
+            if len(self.secciones) < self.max_secciones:
+                seccion = {'titulo': None, 'articulos': []}
+                self.secciones.append(seccion)
+            else:
+                seccion = None
+            self._abiertas.append(seccion)
+            papeles.append('seccion')
+        elif tag == 'article' and clases & CLASES_ARTICULO and articulo is None and indexadas:
+            self._articulo = {'media': None, 'image': None, 'relacionados': None, 'en_relacionados': False}
+            papeles.append('articulo')
+        elif tag == 'span' and 'title-text-title' in clases and self._texto is None \
+                and any(seccion['titulo'] is None for seccion in indexadas):
+            self._texto = []
+            papeles.append('titulo')
+        elif articulo is not None:
+            if tag == 'a':
+                if articulo['en_relacionados']:
+                    articulo['relacionados'].append({'titulo_relacionado': None, 'url_relacionada': attrib.get('href')})
+                    papeles.append('relacionado')
+                else:
+                    for clase in ('media', 'image'):
+                        if clase in clases and articulo[clase] is None:
+                            articulo[clase] = {'titular': attrib.get('title'), 'url_noticia': attrib.get('href')}
+            elif tag == 'aside' and 'related-content' in clases and articulo['relacionados'] is None:
+                articulo['relacionados'] = []
+                articulo['en_relacionados'] = True
+                papeles.append('relacionados')
+            elif tag == 'h2' and 'subtitle-atom' in clases and articulo['en_relacionados'] \
+                    and articulo['relacionados'] and articulo['relacionados'][-1]['titulo_relacionado'] is None \
+                    and self._texto is None:
+                self._texto = []
+                papeles.append('subtitulo')
+
+        self._pila.append((tag, papeles))
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in ETIQUETAS_VACIAS or not any(abierta == tag for abierta, _ in self._pila):
+            return
+        # Las etiquetas que no se cerraron en el HTML se cierran junto con su padre
+        while self._pila:
+            abierta, papeles = self._pila.pop()
+            for papel in reversed(papeles):
+                self._cerrar(papel)
+            if abierta == tag:
+                break
+
+    def _cerrar(self, papel):
+        if papel == 'seccion':
+            self._abiertas.pop()
+            if not self._abiertas and len(self.secciones) >= self.max_secciones:
+                self.terminado = True
+        elif papel == 'articulo':
+            articulo, self._articulo = self._articulo, None
+            enlace = articulo['media'] or articulo['image']
+            for seccion in self._abiertas:
+                if seccion is not None and len(seccion['articulos']) < self.max_articulos:
+                    # Cada sección tiene su propia copia: el artículo recibe el título de su sección
+                    registro = {}
+                    if enlace:
+                        registro = dict(enlace, noticias_relacionadas=[dict(r) for r in articulo['relacionados'] or []])
+                    seccion['articulos'].append(registro)
+        elif papel == 'titulo':
+            titulo = ''.join(self._texto).strip()
+            for seccion in self._abiertas:
+                if seccion is not None and seccion['titulo'] is None:
+                    seccion['titulo'] = titulo
+            self._texto = None
+        elif papel == 'subtitulo':
+            self._articulo['relacionados'][-1]['titulo_relacionado'] = ''.join(self._texto).strip()
+            self._texto = None
+        elif papel == 'relacionado':
+            relacionado = self._articulo['relacionados'][-1]
+            if relacionado['titulo_relacionado'] is None:
+                relacionado['titulo_relacionado'] = "Sin título"
+        elif papel == 'relacionados':
+            self._articulo['en_relacionados'] = False
+
+    def data(self, texto):
+        if self._texto is not None:
+            self._texto.append(texto)
+
+    def close(self):
+        """Asigna a cada artículo el título de su sección y devuelve la lista de artículos."""
+        articulos = []
+        titulo_seccion_actual = "OTRO"
+        for seccion in self.secciones:
+            if seccion['titulo'] is not None:
+                titulo_seccion_actual = seccion['titulo']
+            elif not self.heredar_titulo:
+                titulo_seccion_actual = "OTRO"
+            for articulo_data in seccion['articulos']:
+                if articulo_data:
+                    articulo_data['seccion'] = titulo_seccion_actual
+                articulos.append(articulo_data)
+        return articulos
+
+
+class _AdaptadorHTMLParser(HTMLParser):
+    """Envía los eventos del parser de la biblioteca estándar a un receptor con la interfaz de lxml."""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {nombre: valor or '' for nombre, valor in attrs})
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def close(self):
+        super().close()
+        return self.target.close()
+
+
+def _analizador_eventos(target, parser=None):
+    """Parser por eventos para `target`: el de lxml si está disponible, o el de la biblioteca estándar."""
+    if (parser or parser_html()) == 'lxml':
+        try:
+            from lxml import etree
+            return etree.HTMLParser(target=target)
+        except ImportError:
+            pass
+    return _AdaptadorHTMLParser(target)
+
+
+def articulos_portada(html, parser=None, max_secciones=3, max_articulos=3, heredar_titulo=True):
+    """
+    Recorre las secciones de la portada y devuelve sus artículos en orden, en una sola
+    pasada sobre el HTML (ver `IndicePortada`). El HTML se lee por bloques y se deja de
+    leer en cuanto se han cerrado las secciones que se van a procesar.
+
+    Parámetros:
+    html (str): HTML de la portada.
+    parser (str): Backend de análisis (ver `crear_soup`).
+    max_secciones (int): Secciones de la portada que se procesan.
+    max_articulos (int): Artículos que se procesan de cada sección.
+    heredar_titulo (bool): Si es False, las secciones sin título son "OTRO" en lugar de
+        tomar el título de la sección anterior.
+
+    Retorna:
+    list: Lista de diccionarios con 'titular', 'url_noticia', 'seccion' y 'noticias_relacionadas'
+    (vacíos para los artículos sin enlace).
+    """
+    indice = IndicePortada(max_secciones, max_articulos, heredar_titulo)
+    if not html:
+        return indice.close()
+
+    analizador = _analizador_eventos(indice, parser)
+    for inicio in range(0, len(html), TAMANO_BLOQUE_PORTADA):
+        analizador.feed(html[inicio:inicio + TAMANO_BLOQUE_PORTADA])
+        if indice.terminado:
+            break
+    return analizador.close()
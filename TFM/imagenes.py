@@ -0,0 +1,265 @@
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import sesion_http
+from cache_enriquecimiento import en_cache
+from concurrencia import turno_host
+from limites_proveedores import es_pendiente
+
+# Índice de huellas perceptuales de las imágenes ya analizadas. Vacío para no usarlo.
+RUTA_INDICE_IMAGENES = os.getenv("RUTA_INDICE_IMAGENES", "indice_imagenes.sqlite")
+
+# Lado mayor (en píxeles) de la imagen que se envía al proveedor. 0 para enviar la URL original.
+LADO_MAXIMO_VISION = int(os.getenv("LADO_MAXIMO_VISION", "640"))
+CALIDAD_VISION = 85
+
+# Bits distintos (de 64) que puede haber entre las huellas de dos versiones de la misma foto.
+# Con más de 2, fotos distintas de la misma serie (otra pose, otro encuadre) pueden confundirse
+DISTANCIA_MAXIMA_HUELLA = int(os.getenv("DISTANCIA_MAXIMA_HUELLA", "2"))
+# Lado mínimo de la decodificación de la que sale la huella. Es fijo para que la huella de una
+# foto no cambie al cambiar LADO_MAXIMO_VISION y el índice siga sirviendo
+LADO_DECODIFICACION_HUELLA = 64
+
+# Las imágenes de los periódicos del grupo se sirven desde el mismo CDN, con una versión por
+# recorte y tamaño: .../clip/<uuid>_source-aspect-ratio_1600w_0.jpg. El uuid identifica la foto.
+PATRON_CLIP_GRUPOJOLY = re.compile(r'^/clip/([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})[_.]', re.I)
+# En otras URLs solo se quita el ancho de la versión (_1600w_, _800w_...)
+PATRON_ANCHO = re.compile(r'_\d+w(?=[_.])')
+# y los parámetros que solo cambian el tamaño o la calidad. Los demás se conservan:
+# pueden identificar la imagen (getimage.php?id=101)
+PARAMETROS_TAMANO = {'w', 'width', 'h', 'height', 'quality'}
+
+
+def url_canonica_imagen(url):
+    """
+    Devuelve la misma URL para todas las versiones (tamaños y recortes) de una foto, para
+    que se analice una sola vez. En el CDN del grupo basta con el uuid de la foto; en otras
+    URLs se quitan el ancho de la ruta, los parámetros de tamaño y el fragmento.
+    """
+    partes = urlsplit(url.strip())
+    host = partes.netloc.lower()
+    coincidencia = PATRON_CLIP_GRUPOJOLY.match(partes.path)
+    if host.endswith('grupojoly.com') and coincidencia:
+        return urlunsplit(('https', host, f"/clip/{coincidencia.group(1).lower()}", '', ''))
+    parametros = sorted(
+        (nombre, valor) for nombre, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if nombre.lower() not in PARAMETROS_TAMANO
+    )
+    return urlunsplit((partes.scheme.lower(), host, PATRON_ANCHO.sub('', partes.path), urlencode(parametros), ''))
+
+
+def _huella(imagen, filtro, lado=8):
+    """
+    Huella perceptual (dHash) de una imagen de Pillow: compara el brillo de cada píxel con el
+    de su vecino en una miniatura en escala de grises de (lado + 1) x lado. Dos versiones de la
+    misma foto (otro tamaño, otra compresión) tienen huellas iguales o que difieren en pocos bits.
+    """
+    pixeles = imagen.convert('L').resize((lado + 1, lado), filtro).tobytes()
+    huella = 0
+    for fila in range(lado):
+        for columna in range(lado):
+            izquierda = pixeles[fila * (lado + 1) + columna]
+            derecha = pixeles[fila * (lado + 1) + columna + 1]
+            huella = (huella << 1) | (izquierda > derecha)
+    return huella
+
+
+def _reducir(imagen, contenido, tamano_original, lado_maximo, filtro):
+    """JPEG con el lado mayor reducido a `lado_maximo`, o el contenido original si ya es pequeña."""
+    if not lado_maximo or (max(tamano_original) <= lado_maximo and imagen.format == 'JPEG'):
+        return contenido
+    reducida = imagen.convert('RGB')
+    reducida.thumbnail((lado_maximo, lado_maximo), filtro)
+    salida = io.BytesIO()
+    reducida.save(salida, format='JPEG', quality=CALIDAD_VISION)
+    return salida.getvalue()
+
+
+def preparar_imagen(contenido, lado_maximo=LADO_MAXIMO_VISION):
+    """
+    Obtiene la huella de una imagen descargada y la versión que se envía al proveedor: un JPEG
+    de `lado_maximo` píxeles basta para la descripción y las etiquetas. La huella sale de una
+    decodificación a escala fija (LADO_DECODIFICACION_HUELLA), que en los JPEG es muy barata.
+
+    Retorna:
+    tuple: (huella, contenido reducido), o (None, None) si Pillow no está instalado o la
+        imagen no se puede leer.
+    """
+    try:
+        # Pillow solo es necesario para reconocer la misma foto en URLs distintas y reducirla
+        from PIL import Image
+    except ImportError:
+        return None, None
+    try:
+        # Los JPEG se decodifican ya a escala, sin pasar por el tamaño completo
+        with Image.open(io.BytesIO(contenido)) as imagen:
+            imagen.draft('L', (LADO_DECODIFICACION_HUELLA, LADO_DECODIFICACION_HUELLA))
+            huella = _huella(imagen, Image.LANCZOS)
+        with Image.open(io.BytesIO(contenido)) as imagen:
+            tamano_original = imagen.size
+            if lado_maximo:
+                imagen.draft('RGB', (lado_maximo, lado_maximo))
+            return huella, _reducir(imagen, contenido, tamano_original, lado_maximo, Image.LANCZOS)
+    except Exception as e:
+        print(f"No se pudo preparar la imagen: {e}")
+        return None, None
+
+
+def distancia(huella_a, huella_b):
+    """Número de bits distintos entre dos huellas."""
+    return bin(huella_a ^ huella_b).count('1')
+
+
+class IndiceImagenes:
+    """
+    Huellas de las imágenes ya analizadas, con su análisis. Se guardan en SQLite y se
+    mantienen en memoria para buscar también huellas parecidas, no solo iguales.
+    """
+
+    def __init__(self, ruta, distancia_maxima=DISTANCIA_MAXIMA_HUELLA):
+        self.distancia_maxima = distancia_maxima
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS imagenes ("
+            "proveedor TEXT, version TEXT, huella TEXT, url TEXT, analisis TEXT, "
+            "PRIMARY KEY (proveedor, version, huella))"
+        )
+        self._db.commit()
+        # Huellas cargadas por (proveedor, version): {huella: análisis}
+        self._huellas = {}
+        self.reutilizadas = 0
+
+    def _cargar(self, proveedor, version):
+        clave = (proveedor, version)
+        if clave not in self._huellas:
+            filas = self._db.execute(
+                "SELECT huella, analisis FROM imagenes WHERE proveedor = ? AND version = ?", (proveedor, version)
+            )
+            self._huellas[clave] = {int(huella, 16): json.loads(analisis) for huella, analisis in filas}
+        return self._huellas[clave]
+
+    def buscar(self, proveedor, version, huella):
+        """Análisis de una imagen con la misma huella o una parecida, o None si no hay ninguna."""
+        with self._lock:
+            huellas = self._cargar(proveedor, version)
+            analisis = huellas.get(huella)
+            if analisis is None and self.distancia_maxima:
+                mejor = min(((distancia(huella, otra), otra) for otra in huellas), default=None)
+                if mejor is not None and mejor[0] <= self.distancia_maxima:
+                    analisis = huellas[mejor[1]]
+            if analisis is not None:
+                self.reutilizadas += 1
+            return analisis
+
+    def agregar(self, proveedor, version, huella, url, analisis):
+        with self._lock:
+            self._cargar(proveedor, version)[huella] = analisis
+            self._db.execute(
+                "INSERT OR REPLACE INTO imagenes (proveedor, version, huella, url, analisis) VALUES (?, ?, ?, ?, ?)",
+                (proveedor, version, format(huella, 'x'), url, json.dumps(analisis, ensure_ascii=False)),
+            )
+            self._db.commit()
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+
+class SinIndice:
+    """Índice vacío que se usa cuando RUTA_INDICE_IMAGENES está vacío: solo se reconoce la misma URL."""
+
+    reutilizadas = 0
+
+    def buscar(self, proveedor, version, huella):
+        return None
+
+    def agregar(self, proveedor, version, huella, url, analisis):
+        pass
+
+    def cerrar(self):
+        pass
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def obtener_indice():
+    """Devuelve el índice de imágenes compartido, abriéndolo la primera vez."""
+    global _indice
+    with _lock:
+        if _indice is None:
+            ruta = RUTA_INDICE_IMAGENES
+            if not ruta:
+                _indice = SinIndice()
+            else:
+                directorio = os.path.dirname(ruta)
+                if directorio:
+                    os.makedirs(directorio, exist_ok=True)
+                _indice = IndiceImagenes(ruta)
+        return _indice
+
+
+def descargar_imagen(url):
+    """Contenido de la imagen, o None si no se puede descargar."""
+    try:
+        with turno_host(url):
+            response = sesion_http.get(url, endpoint="imagen")
+        response.raise_for_status()
+        return response.content
+    except Exception as e:
+        print(f"No se pudo descargar la imagen {url}: {e}")
+        return None
+
+
+def analizar_imagen(image_url, proveedor, version, analizar, valido=bool):
+    """
+    Analiza una imagen evitando repetir el análisis de una foto ya conocida:
+    1. Todas las versiones de una foto comparten URL canónica, y el análisis de esa URL
+       se guarda en la caché de análisis.
+    2. Si la URL es nueva, se descarga la imagen y se busca su huella perceptual entre las
+       de las imágenes ya analizadas (la misma foto publicada con otra URL).
+    3. Solo si tampoco se reconoce la huella se llama al proveedor, enviándole la imagen
+       ya descargada y reducida a LADO_MAXIMO_VISION píxeles.
+
+    Parámetros:
+    image_url (str): URL de la imagen en la noticia.
+    proveedor (str): Nombre del proveedor en la caché ('azure_vision').
+    version (str): Versión del modelo o de la API del proveedor.
+    analizar (callable): Función que analiza la imagen. Recibe la URL y, si se ha podido
+        preparar, el contenido reducido que se debe enviar en su lugar.
+    valido (callable): Indica si un análisis se puede guardar (no es un resultado de error).
+
+    Retorna:
+    dict: Análisis de la imagen.
+    """
+    def por_huella():
+        contenido = descargar_imagen(image_url)
+        huella, reducida = preparar_imagen(contenido) if contenido else (None, None)
+        if huella is None:
+            return analizar(image_url)
+
+        indice = obtener_indice()
+        analisis = indice.buscar(proveedor, version, huella)
+        if analisis is not None:
+            print(f"Imagen ya analizada con otra URL: {image_url}")
+            return analisis
+
+        # La imagen ya está descargada: se envía reducida en vez de la URL del original
+        analisis = analizar(image_url, reducida if LADO_MAXIMO_VISION else None)
+        if valido(analisis) and not es_pendiente(analisis):
+            indice.agregar(proveedor, version, huella, image_url, analisis)
+        return analisis
+
+    return en_cache(proveedor, version, url_canonica_imagen(image_url), por_huella, valido=valido)
+
+
+def resumen_imagenes():
+    """Texto con las imágenes cuyo análisis se ha reutilizado por su huella."""
+    return f"Imágenes reconocidas por su huella: {obtener_indice().reutilizadas}"
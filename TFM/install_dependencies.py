@@ -5,10 +5,14 @@ import sys
 required_packages = [
     'requests',
     'beautifulsoup4',
+    'lxml',
     'selenium',
     'google-generativeai',
     'ibm-watson',
-    'pymongo'
+    'pymongo',
+    'aiohttp',
+    'Pillow',
+    'numpy'
 ]
 
 def install(package):
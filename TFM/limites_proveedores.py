@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Cuota de cada proveedor de análisis: peticiones por minuto y peticiones simultáneas.
+# Los valores por defecto son conservadores; se ajustan al plan contratado con las variables de entorno.
+LIMITES = {
+    "gemini": (int(os.getenv("RPM_GEMINI", "60")), int(os.getenv("SIMULTANEAS_GEMINI", "4"))),
+    "azure_texto": (int(os.getenv("RPM_AZURE_TEXTO", "300")), int(os.getenv("SIMULTANEAS_AZURE_TEXTO", "4"))),
+    "azure_vision": (int(os.getenv("RPM_AZURE_VISION", "20")), int(os.getenv("SIMULTANEAS_AZURE_VISION", "2"))),
+    "ibm_nlu": (int(os.getenv("RPM_IBM_NLU", "120")), int(os.getenv("SIMULTANEAS_IBM_NLU", "4"))),
+}
+
+# Adaptación a los 429: la tasa se reduce a la mitad y se recupera poco a poco con cada éxito
+FACTOR_REDUCCION = 0.5
+FRACCION_RECUPERACION = 0.05
+# Pausa tras un 429 sin cabecera Retry-After, en segundos
+PAUSA_POR_DEFECTO = 5.0
+
+# Circuito de cada proveedor: fallos seguidos que lo abren y segundos que se deja de llamar
+# al proveedor antes de probar de nuevo con una sola petición
+FALLOS_PARA_ABRIR_CIRCUITO = int(os.getenv("FALLOS_PARA_ABRIR_CIRCUITO", "5"))
+SEGUNDOS_CIRCUITO_ABIERTO = float(os.getenv("SEGUNDOS_CIRCUITO_ABIERTO", "30"))
+
+
+class ProveedorNoDisponible(Exception):
+    """El circuito del proveedor está abierto: la llamada no se hace."""
+
+
+def resultado_pendiente(resultado):
+    """Marca un resultado como pendiente: no se guarda en la caché y se completa en otra exploración."""
+    return dict(resultado, pendiente=True)
+
+
+def es_pendiente(resultado):
+    return isinstance(resultado, dict) and bool(resultado.get("pendiente"))
+
+
+class LimiteProveedor:
+    """
+    Cubo de fichas (token bucket) y semáforo para las llamadas a un proveedor: como mucho
+    `simultaneas` peticiones en curso y, de media, `por_minuto` peticiones por minuto, con
+    ráfagas de hasta `simultaneas` peticiones. Cuando el proveedor responde 429 se para
+    hasta que lo indica Retry-After y se reduce la tasa; cada éxito la recupera un poco.
+    """
+
+    def __init__(self, nombre, por_minuto, simultaneas):
+        self.nombre = nombre
+        self.tasa_maxima = por_minuto / 60.0
+        self.tasa = self.tasa_maxima
+        self.tasa_minima = self.tasa_maxima / 16
+        self.capacidad = float(max(1, simultaneas))
+        self._semaforo = threading.BoundedSemaphore(max(1, simultaneas))
+        self._lock = threading.Lock()
+        self._fichas = self.capacidad
+        self._actualizado = time.monotonic()
+        self._pausa_hasta = 0.0
+
+        # Métricas de espera en cola
+        self.peticiones = 0
+        self.esperadas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.limitadas = 0
+
+    def _reservar(self):
+        """Toma una ficha y devuelve cuántos segundos hay que esperar para usarla."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.capacidad, self._fichas + (ahora - self._actualizado) * self.tasa)
+            self._actualizado = ahora
+            # Las fichas negativas son peticiones ya en cola que esperan a que se repongan
+            self._fichas -= 1
+            espera = -self._fichas / self.tasa if self._fichas < 0 else 0.0
+            return max(espera, self._pausa_hasta - ahora)
+
+    @contextmanager
+    def turno(self):
+        """Bloquea hasta que se puede hacer una petición al proveedor sin superar su cuota."""
+        inicio = time.monotonic()
+        with self._semaforo:
+            espera = self._reservar()
+            if espera > 0:
+                time.sleep(espera)
+            self._registrar_espera(time.monotonic() - inicio)
+            yield
+
+    def _registrar_espera(self, segundos):
+        with self._lock:
+            self.peticiones += 1
+            if segundos > 0.001:
+                self.esperadas += 1
+                self.espera_total += segundos
+                self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def limitado(self, pausa=None):
+        """
+        El proveedor ha respondido 429: se reduce la tasa y no se hacen más peticiones durante
+        `pausa` segundos (los de Retry-After; PAUSA_POR_DEFECTO si no se conocen).
+        """
+        if pausa is None:
+            pausa = PAUSA_POR_DEFECTO
+        with self._lock:
+            self.limitadas += 1
+            self.tasa = max(self.tasa_minima, self.tasa * FACTOR_REDUCCION)
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + pausa)
+            self._fichas = min(self._fichas, 0.0)
+        print(f"{self.nombre}: cuota superada (429). Pausa de {pausa:g} s y {self.tasa * 60:.0f} peticiones por minuto.")
+
+    def exito(self):
+        """Respuesta sin 429: la tasa vuelve poco a poco a la configurada."""
+        if self.tasa < self.tasa_maxima:
+            with self._lock:
+                self.tasa = min(self.tasa_maxima, self.tasa + self.tasa_maxima * FRACCION_RECUPERACION)
+
+
+class Circuito:
+    """
+    Interruptor de un proveedor. Cerrado, las llamadas se hacen con normalidad; tras
+    `fallos_para_abrir` fallos seguidos se abre y durante `segundos_abierto` las llamadas
+    no se hacen (ProveedorNoDisponible), así que una caída del proveedor no cuesta un timeout
+    por comentario. Pasado ese tiempo queda semiabierto: se deja pasar una única petición de
+    prueba, que lo cierra si funciona o lo vuelve a abrir si falla.
+    """
+
+    def __init__(self, nombre, fallos_para_abrir=FALLOS_PARA_ABRIR_CIRCUITO, segundos_abierto=SEGUNDOS_CIRCUITO_ABIERTO):
+        self.nombre = nombre
+        self.fallos_para_abrir = fallos_para_abrir
+        self.segundos_abierto = segundos_abierto
+        self._lock = threading.Lock()
+        self.estado = "cerrado"
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+
+        self.aperturas = 0
+        self.omitidas = 0
+
+    def permitir(self):
+        """
+        Comprueba si se puede llamar al proveedor; lanza ProveedorNoDisponible si no.
+
+        Retorna:
+        bool: True si la llamada es la prueba del circuito semiabierto. Hay que pasarlo a
+            `exito`, `fallo` o `liberar` al terminar.
+        """
+        with self._lock:
+            if self.estado == "abierto" and time.monotonic() >= self._abierto_hasta:
+                self.estado = "semiabierto"
+            if self.estado == "cerrado":
+                return False
+            if self.estado == "semiabierto" and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            self.omitidas += 1
+        raise ProveedorNoDisponible(f"{self.nombre} no está disponible (circuito abierto)")
+
+    def _cuenta(self, prueba):
+        # Con el circuito abierto o semiabierto solo cuenta la prueba: el resto son llamadas que
+        # empezaron antes de abrirlo y no deben alargar el tiempo abierto ni contar otra apertura
+        return self.estado == "cerrado" or prueba
+
+    def exito(self, prueba=False):
+        with self._lock:
+            if not self._cuenta(prueba):
+                return
+            recuperado = self.estado != "cerrado"
+            self.estado = "cerrado"
+            self._fallos = 0
+            self._prueba_en_curso = False
+        if recuperado:
+            print(f"{self.nombre}: el proveedor vuelve a responder. Circuito cerrado.")
+
+    def fallo(self, prueba=False):
+        with self._lock:
+            if not self._cuenta(prueba):
+                return
+            self._fallos += 1
+            if self.estado == "cerrado" and self._fallos < self.fallos_para_abrir:
+                return
+            self.estado = "abierto"
+            self._abierto_hasta = time.monotonic() + self.segundos_abierto
+            self._prueba_en_curso = False
+            self.aperturas += 1
+            fallos = self._fallos
+        print(f"{self.nombre}: {fallos} fallos seguidos. Circuito abierto durante {self.segundos_abierto:g} s.")
+
+    def liberar(self, prueba=False):
+        """La petición terminó sin indicar si el proveedor funciona (por ejemplo, un 429)."""
+        if prueba:
+            with self._lock:
+                self._prueba_en_curso = False
+
+
+_limites = {nombre: LimiteProveedor(nombre, *limite) for nombre, limite in LIMITES.items() if limite[0] > 0}
+_circuitos = {nombre: Circuito(nombre) for nombre in LIMITES} if FALLOS_PARA_ABRIR_CIRCUITO > 0 else {}
+
+
+def limite(endpoint):
+    """Limitador del proveedor `endpoint`, o None si no tiene cuota configurada."""
+    return _limites.get(endpoint)
+
+
+def circuito(endpoint):
+    """Circuito del proveedor `endpoint`, o None si no es un proveedor de análisis."""
+    return _circuitos.get(endpoint)
+
+
+def turno(endpoint):
+    """Atajo para `limite(endpoint).turno()`; no espera en los endpoints sin cuota."""
+    limitador = _limites.get(endpoint)
+    return limitador.turno() if limitador else nullcontext()
+
+
+def resumen_limites():
+    """Texto con las esperas en cola, los 429 y las aperturas del circuito de cada proveedor."""
+    lineas = ["Cuotas de los proveedores:"]
+    for nombre, limitador in sorted(_limites.items()):
+        if not limitador.peticiones:
+            continue
+        media = limitador.espera_total / limitador.peticiones
+        lineas.append(
+            f"  {nombre}: {limitador.peticiones} peticiones, {limitador.esperadas} esperaron "
+            f"(media {media:.2f} s, máxima {limitador.espera_maxima:.2f} s), {limitador.limitadas} respuestas 429, "
+            f"tasa actual {limitador.tasa * 60:.0f}/min"
+        )
+    for nombre, circuito_proveedor in sorted(_circuitos.items()):
+        if circuito_proveedor.aperturas:
+            lineas.append(
+                f"  {nombre}: circuito abierto {circuito_proveedor.aperturas} veces, "
+                f"{circuito_proveedor.omitidas} llamadas omitidas (quedan pendientes), estado {circuito_proveedor.estado}"
+            )
+    if len(lineas) == 1:
+        return "No se ha llamado a ningún proveedor con cuota."
+    return "\n".join(lineas)
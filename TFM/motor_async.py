@@ -0,0 +1,84 @@
+import asyncio
+import functools
+from collections import deque
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+# Conexiones abiertas como máximo en total y por host. Las conexiones se reutilizan (keep-alive)
+LIMITE_CONEXIONES = int(os.getenv("LIMITE_CONEXIONES", "100"))
+LIMITE_CONEXIONES_POR_HOST = int(os.getenv("LIMITE_CONEXIONES_POR_HOST", "4"))
+KEEPALIVE_SEGUNDOS = float(os.getenv("KEEPALIVE_SEGUNDOS", "30"))
+TIMEOUT_ASYNC = float(os.getenv("TIMEOUT_ASYNC", "30"))
+
+# Noticias en curso a la vez y hilos para el trabajo bloqueante (SDKs, Selenium, análisis del HTML)
+LIMITE_NOTICIAS_ASYNC = int(os.getenv("LIMITE_NOTICIAS_ASYNC", "50"))
+HILOS_BLOQUEANTES = int(os.getenv("HILOS_BLOQUEANTES", "8"))
+
+
+def crear_cliente():
+    """
+    Crea el cliente HTTP compartido por todo el motor: reutiliza conexiones,
+    pide las respuestas comprimidas y limita las conexiones por host.
+
+    Retorna:
+    aiohttp.ClientSession: Cliente que debe usarse con `async with`.
+    """
+    conector = aiohttp.TCPConnector(
+        limit=LIMITE_CONEXIONES,
+        limit_per_host=LIMITE_CONEXIONES_POR_HOST,
+        keepalive_timeout=KEEPALIVE_SEGUNDOS,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=conector,
+        timeout=aiohttp.ClientTimeout(total=TIMEOUT_ASYNC),
+        headers={"Accept-Encoding": "gzip, deflate"},
+    )
+
+
+async def obtener_texto(cliente, url, **kwargs):
+    """Descarga `url` y devuelve el cuerpo como texto. Lanza una excepción si la respuesta no es 2xx."""
+    async with cliente.get(url, **kwargs) as response:
+        response.raise_for_status()
+        return await response.text()
+
+
+async def en_hilo(funcion, *args, **kwargs):
+    """Ejecuta una función bloqueante en el pool de hilos del motor sin parar el bucle de eventos."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(funcion, *args, **kwargs))
+
+
+async def procesar_en_orden_async(funcion, elementos, limite=LIMITE_NOTICIAS_ASYNC):
+    """
+    Generador asíncrono que ejecuta la corrutina `funcion` sobre los elementos y produce
+    los resultados en el orden de los elementos a medida que están listos. Como mucho hay
+    `limite` elementos en curso, así que los resultados no se acumulan en memoria.
+    """
+    pendientes = deque()
+    try:
+        for elemento in elementos:
+            pendientes.append(asyncio.ensure_future(funcion(elemento)))
+            if len(pendientes) >= limite:
+                yield await pendientes.popleft()
+        while pendientes:
+            yield await pendientes.popleft()
+    finally:
+        # Si quien consume los resultados se detiene, se cancela lo que quede en curso
+        for tarea in pendientes:
+            tarea.cancel()
+
+
+def ejecutar(corrutina, hilos=HILOS_BLOQUEANTES):
+    """
+    Ejecuta `corrutina` en un bucle de eventos nuevo cuyo pool de hilos para
+    trabajo bloqueante tiene `hilos` hilos.
+    """
+    async def principal():
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            asyncio.get_running_loop().set_default_executor(executor)
+            return await corrutina
+
+    return asyncio.run(principal())
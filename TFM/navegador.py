@@ -0,0 +1,429 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from urllib.parse import urljoin
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from concurrencia import turno_host
+from extraccion import SELECTOR_WIDGET_COMENTARIOS
+
+# Rutas por defecto dentro del contenedor (ver Dockerfile)
+CHROME_DRIVER_PATH = os.getenv("CHROME_DRIVER", "/usr/bin/chromedriver")
+CHROME_BIN = os.getenv("CHROME_BIN", "/usr/bin/chromium")
+
+# Número de navegadores que se mantienen abiertos durante toda la ejecución
+NUM_NAVEGADORES = int(os.getenv("NUM_NAVEGADORES", "1"))
+
+# Perfil ligero: no se descargan imágenes, fuentes, vídeo ni publicidad/analítica
+PERFIL_LIGERO = os.getenv("PERFIL_LIGERO", "1") == "1"
+
+# Patrones de URL que el navegador no llega a pedir (sintaxis de Network.setBlockedURLs)
+URLS_BLOQUEADAS = [
+    # Imágenes, fuentes y vídeo
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m3u8", "*.ts", "*.mp3",
+    # Publicidad y analítica de terceros
+    "*doubleclick.net*", "*googlesyndication.com*", "*googletagservices.com*",
+    "*googletagmanager.com*", "*google-analytics.com*", "*adservice.google.*",
+    "*amazon-adsystem.com*", "*criteo.com*", "*criteo.net*", "*smartadserver.com*",
+    "*taboola.com*", "*outbrain.com*", "*teads.tv*", "*seedtag.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*scorecardresearch.com*",
+    "*chartbeat.com*", "*chartbeat.net*", "*hotjar.com*", "*newrelic.com*",
+]
+
+# Elementos que se esperan en cada noticia
+SELECTOR_BOTON_COOKIES = 'a.mrf-button[data-mrf-role="userAgreeToAll"]'
+SELECTOR_LD_JSON = 'script[type="application/ld+json"]'
+SELECTOR_COMENTARIOS = '.comment'
+
+# Lee todos los comentarios con una sola llamada a chromedriver en lugar de
+# varias llamadas a find_element y .text por cada comentario
+SCRIPT_COMENTARIOS = """
+var texto = function (comentario, clase) {
+    var elemento = comentario.querySelector('.' + clase);
+    return elemento ? elemento.innerText.trim() : '';
+};
+return Array.prototype.map.call(document.querySelectorAll('.comment'), function (comentario) {
+    return {
+        nombre: texto(comentario, 'comment-info-name'),
+        tiempo: texto(comentario, 'comment-info-date'),
+        texto_comentario: texto(comentario, 'comment-info-text')
+    };
+});
+"""
+
+# Lee las noticias relacionadas igual que `relacionadas_desde_soup`, sin analizar el HTML de la página
+SCRIPT_RELACIONADAS = """
+return Array.prototype.map.call(document.querySelectorAll('aside.related-content a[href]'), function (enlace) {
+    var subtitulo = enlace.querySelector('h2.subtitle-atom');
+    return {
+        titulo_relacionado: subtitulo ? subtitulo.textContent.trim() : 'Sin título',
+        url_relacionada: enlace.getAttribute('href')
+    };
+});
+"""
+
+# Indica si merece la pena esperar a los comentarios: el JSON-LD dice cuántos hay (commentCount)
+# o, si no lo dice, hay un widget de comentarios. Es el mismo criterio que `necesita_navegador`
+SCRIPT_SENAL_COMENTARIOS = """
+var numero = null;
+Array.prototype.forEach.call(document.querySelectorAll('script[type="application/ld+json"]'), function (script) {
+    try {
+        var datos = JSON.parse(script.textContent);
+        var lista = Array.isArray(datos) ? datos : (datos['@graph'] || [datos]);
+        lista.forEach(function (dato) {
+            if (numero === null && dato && dato.commentCount !== undefined && dato.commentCount !== null) {
+                numero = parseInt(dato.commentCount, 10);
+            }
+        });
+    } catch (e) {}
+});
+if (numero !== null && !isNaN(numero)) {
+    return numero > 0;
+}
+return document.querySelector(arguments[0]) !== null;
+"""
+
+# Tiempos máximos de espera (segundos). Las esperas terminan en cuanto se cumple la condición
+TIMEOUT_COOKIES = float(os.getenv("TIMEOUT_COOKIES", "2"))
+TIMEOUT_LD_JSON = float(os.getenv("TIMEOUT_LD_JSON", "3"))
+TIMEOUT_COMENTARIOS = float(os.getenv("TIMEOUT_COMENTARIOS", "1"))
+TIMEOUT_SCROLL = float(os.getenv("TIMEOUT_SCROLL", "0.5"))
+MAX_SCROLLS = int(os.getenv("MAX_SCROLLS", "3"))
+# Tiempo máximo de carga de una página: una que no termina de cargar no retiene el navegador
+TIMEOUT_CARGA_PAGINA = float(os.getenv("TIMEOUT_CARGA_PAGINA", "30"))
+INTERVALO_SONDEO = 0.1
+
+# Esperas fijas de la versión anterior: 0.7 s + 0.7 s + 3 scrolls de 0.5 s
+TIEMPO_ESPERAS_FIJAS = 0.7 + 0.7 + 3 * 0.5
+
+# Navegadores que ya han esperado al banner de cookies. El banner aparece con la primera página;
+# en las siguientes solo se pulsa si ya está, para no pagar TIMEOUT_COOKIES en cada noticia
+_esperaron_cookies = weakref.WeakSet()
+
+# Tiempo acumulado en esperas para calcular el ahorro frente a las esperas fijas
+estadisticas_esperas = {"noticias": 0, "segundos": 0.0}
+_lock_estadisticas = threading.Lock()
+
+
+def crear_navegador(driver_path=CHROME_DRIVER_PATH, binary_location=CHROME_BIN, perfil_ligero=PERFIL_LIGERO):
+    """
+    Arranca una instancia de Chrome/Chromium en modo headless.
+
+    Parámetros:
+    driver_path (str): Ruta al ejecutable de ChromeDriver.
+    binary_location (str): Ruta al navegador. Si es None se usa el que encuentre Selenium.
+    perfil_ligero (bool): Si es True se bloquean imágenes, fuentes, vídeo y publicidad.
+
+    Retorna:
+    webdriver.Chrome: Navegador listo para usarse.
+    """
+    service = Service(driver_path)
+
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument("--headless")  # Ejecutar en modo sin interfaz gráfica
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    if binary_location:
+        chrome_options.binary_location = binary_location
+    if perfil_ligero:
+        configurar_perfil_ligero(chrome_options)
+
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.set_page_load_timeout(TIMEOUT_CARGA_PAGINA)
+    if perfil_ligero:
+        bloquear_urls(driver)
+    return driver
+
+
+def configurar_perfil_ligero(chrome_options):
+    """
+    Ajusta las opciones de Chrome para cargar solo lo que necesita el scraper:
+    sin imágenes, sin fuentes remotas, sin extensiones y sin esperar a que
+    terminen de cargar los recursos secundarios (estrategia 'eager').
+    """
+    chrome_options.page_load_strategy = "eager"  # get() vuelve en cuanto el DOM está listo
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--disable-remote-fonts")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.default_content_setting_values.geolocation": 2,
+    })
+
+
+def bloquear_urls(driver, patrones=URLS_BLOQUEADAS):
+    """Impide que el navegador descargue las URLs que coinciden con `patrones`."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patrones})
+    except WebDriverException as e:
+        print(f"No se pudieron bloquear los recursos innecesarios: {e}")
+
+
+def _esperar(driver, condicion, timeout):
+    """Espera a que se cumpla `condicion`. Devuelve el resultado o None si se agota el tiempo."""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=INTERVALO_SONDEO).until(condicion)
+    except TimeoutException:
+        return None
+
+
+def aceptar_cookies(driver, timeout=TIMEOUT_COOKIES):
+    """
+    Pulsa el botón "Aceptar y continuar" en cuanto se puede hacer clic en él.
+    Con `timeout` 0 solo se pulsa si ya está en la página.
+
+    Retorna:
+    bool: True si se ha pulsado el botón.
+    """
+    boton = _esperar(driver, EC.element_to_be_clickable((By.CSS_SELECTOR, SELECTOR_BOTON_COOKIES)), timeout)
+    if boton is None:
+        if timeout:
+            print("No se encontró el botón 'Aceptar y continuar'.")
+        return False
+    try:
+        boton.click()
+    except WebDriverException as e:
+        print(f"No se pudo pulsar el botón 'Aceptar y continuar': {e}")
+        return False
+    print("Botón 'Aceptar y continuar' clicado.")
+    return True
+
+
+def hacer_scroll(driver, max_scrolls=MAX_SCROLLS, timeout=TIMEOUT_SCROLL):
+    """
+    Baja hasta el final de la página hasta `max_scrolls` veces, parando en cuanto
+    `document.body.scrollHeight` deja de crecer (ya no se carga más contenido).
+    """
+    def altura_si_crece(d):
+        nueva = d.execute_script("return document.body.scrollHeight;")
+        return nueva if nueva > altura else False
+
+    altura = driver.execute_script("return document.body.scrollHeight;")
+    for _ in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        nueva_altura = _esperar(driver, altura_si_crece, timeout)
+        if not nueva_altura:
+            break
+        altura = nueva_altura
+
+
+def preparar_pagina(driver, url_noticia):
+    """
+    Abre la noticia y espera lo justo para poder extraer sus datos: acepta las cookies
+    (solo se espera al banner la primera vez en cada navegador), espera al script JSON-LD,
+    hace scroll mientras la página crezca y, si la noticia tiene comentarios, los espera.
+
+    Retorna:
+    float: Segundos empleados en esperas tras la carga de la página.
+    """
+    with turno_host(url_noticia):
+        driver.get(url_noticia)
+    inicio = time.perf_counter()
+
+    if driver in _esperaron_cookies:
+        aceptar_cookies(driver, timeout=0)
+    else:
+        _esperaron_cookies.add(driver)
+        aceptar_cookies(driver)
+    _esperar(driver, EC.presence_of_element_located((By.CSS_SELECTOR, SELECTOR_LD_JSON)), TIMEOUT_LD_JSON)
+    hacer_scroll(driver)
+    # Sin commentCount ni widget no hay comentarios que esperar: la mayoría de noticias no tienen
+    if driver.execute_script(SCRIPT_SENAL_COMENTARIOS, SELECTOR_WIDGET_COMENTARIOS):
+        _esperar(driver, EC.presence_of_element_located((By.CSS_SELECTOR, SELECTOR_COMENTARIOS)), TIMEOUT_COMENTARIOS)
+
+    espera = time.perf_counter() - inicio
+    with _lock_estadisticas:
+        estadisticas_esperas["noticias"] += 1
+        estadisticas_esperas["segundos"] += espera
+    print(f"Esperas: {espera:.2f} s (ahorro de {TIEMPO_ESPERAS_FIJAS - espera:.2f} s frente a las esperas fijas)")
+    return espera
+
+
+def extraer_comentarios(driver):
+    """
+    Extrae los comentarios de la página abierta en el navegador.
+
+    Retorna:
+    list: Lista de diccionarios con 'nombre', 'tiempo' y 'texto_comentario'.
+    """
+    return driver.execute_script(SCRIPT_COMENTARIOS) or []
+
+
+def extraer_relacionadas(driver, url_base=None):
+    """
+    Extrae las noticias relacionadas de la página abierta en el navegador, con el mismo
+    formato que `relacionadas_desde_soup`.
+
+    Retorna:
+    list: Lista de diccionarios con 'titulo_relacionado' y 'url_relacionada'.
+    """
+    relacionadas = driver.execute_script(SCRIPT_RELACIONADAS) or []
+    if url_base:
+        for relacionada in relacionadas:
+            relacionada['url_relacionada'] = urljoin(url_base, relacionada['url_relacionada'])
+    return relacionadas
+
+
+def resumen_esperas():
+    """Texto con el ahorro total de las esperas por condición frente a las esperas fijas."""
+    with _lock_estadisticas:
+        noticias = estadisticas_esperas["noticias"]
+        segundos = estadisticas_esperas["segundos"]
+    if not noticias:
+        return "No se ha abierto ninguna noticia con el navegador."
+    ahorro = noticias * TIEMPO_ESPERAS_FIJAS - segundos
+    return (f"Esperas en {noticias} noticias: {segundos:.2f} s "
+            f"(media {segundos / noticias:.2f} s). Ahorro frente a esperas fijas: "
+            f"{ahorro:.2f} s ({ahorro / noticias:.2f} s por noticia)")
+
+
+def limpiar_navegador(driver):
+    """
+    Deja el navegador como recién abierto para la siguiente noticia:
+    sin cookies, sin almacenamiento local y en una página en blanco.
+    """
+    try:
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except WebDriverException:
+        # Páginas como about:blank no permiten acceder al almacenamiento
+        pass
+    driver.delete_all_cookies()
+    driver.get("about:blank")
+
+
+class PoolNavegadores:
+    """
+    Mantiene abiertos hasta `tamano` navegadores durante toda la exploración
+    para no pagar el arranque de Chromium en cada noticia.
+
+    Los navegadores se crean bajo demanda y se prestan con `prestar()`:
+
+        with PoolNavegadores(2) as pool:
+            with pool.prestar() as driver:
+                driver.get(url)
+    """
+
+    def __init__(self, tamano=NUM_NAVEGADORES, driver_path=CHROME_DRIVER_PATH, binary_location=CHROME_BIN):
+        self.tamano = max(1, tamano)
+        self.driver_path = driver_path
+        self.binary_location = binary_location
+        # Una sola condición protege los navegadores libres y la lista de todos: quien espera
+        # un navegador se despierta tanto si se devuelve uno como si se descarta (y queda hueco)
+        self._condicion = threading.Condition()
+        self._libres = []
+        self._todos = []
+        self._cerrado = False
+
+    def _obtener(self):
+        with self._condicion:
+            while True:
+                if self._cerrado:
+                    raise RuntimeError("El pool de navegadores está cerrado.")
+                if self._libres:
+                    return self._libres.pop()
+                if len(self._todos) < self.tamano:
+                    # Reservamos el hueco antes de arrancar Chromium, que tarda
+                    self._todos.append(None)
+                    break
+                # Todos los navegadores están prestados: esperar a que se devuelva o se descarte uno
+                self._condicion.wait()
+
+        try:
+            driver = crear_navegador(self.driver_path, self.binary_location)
+        except Exception:
+            with self._condicion:
+                if None in self._todos:
+                    self._todos.remove(None)
+                self._condicion.notify()
+            raise
+
+        with self._condicion:
+            cerrado = self._cerrado
+            if not cerrado:
+                self._todos[self._todos.index(None)] = driver
+                creados = len(self._todos)
+        if cerrado:
+            # `cerrar` ya vació el pool mientras arrancaba Chromium: nadie más lo cerraría
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            raise RuntimeError("El pool de navegadores está cerrado.")
+        print(f"Navegador {creados}/{self.tamano} iniciado.")
+        return driver
+
+    def _descartar(self, driver):
+        with self._condicion:
+            if driver in self._todos:
+                self._todos.remove(driver)
+            # Queda un hueco libre: quien esté esperando crea el navegador que lo sustituye
+            self._condicion.notify()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def prestar(self):
+        """
+        Presta un navegador del pool y lo devuelve limpio al terminar.
+        Si el navegador ha fallado se cierra y se sustituye por uno nuevo
+        la próxima vez que haga falta.
+        """
+        driver = self._obtener()
+        sano = True
+        try:
+            yield driver
+        except WebDriverException:
+            sano = False
+            raise
+        finally:
+            self._devolver(driver, sano)
+
+    def _devolver(self, driver, sano):
+        if sano and not self._cerrado:
+            try:
+                limpiar_navegador(driver)
+                with self._condicion:
+                    if not self._cerrado:
+                        self._libres.append(driver)
+                        self._condicion.notify()
+                        return
+            except WebDriverException as e:
+                print(f"Navegador descartado al limpiarlo: {e}")
+        self._descartar(driver)
+
+    def cerrar(self):
+        """Cierra todos los navegadores del pool."""
+        with self._condicion:
+            self._cerrado = True
+            drivers = [d for d in self._todos if d is not None]
+            self._todos = []
+            self._libres = []
+            self._condicion.notify_all()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
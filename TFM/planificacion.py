@@ -0,0 +1,237 @@
+import heapq
+import itertools
+import os
+import time
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from comentarios import id_noticia
+
+# Amplitud de la exploración: secciones de cada portada y artículos de cada sección
+MAX_SECCIONES = int(os.getenv("MAX_SECCIONES", "3"))
+MAX_ARTICULOS_POR_SECCION = int(os.getenv("MAX_ARTICULOS_POR_SECCION", "3"))
+
+# Presupuesto de la exploración: noticias procesadas en total y segundos (0 = sin límite)
+MAX_NOTICIAS = int(os.getenv("MAX_NOTICIAS", "0"))
+TIEMPO_MAXIMO = float(os.getenv("TIEMPO_MAXIMO", "0"))
+
+# Pesos de la prioridad de cada noticia: posición en la portada, sección y frescura
+PESO_POSICION = float(os.getenv("PESO_POSICION", "1.0"))
+PESO_SECCION = float(os.getenv("PESO_SECCION", "0.5"))
+PESO_FRESCURA = float(os.getenv("PESO_FRESCURA", "0.5"))
+
+# Niveles de noticias relacionadas que se exploran a partir de las de la portada (0 = ninguno)
+PROFUNDIDAD_RELACIONADAS = int(os.getenv("PROFUNDIDAD_RELACIONADAS", "0"))
+
+# Parámetros de las URLs que no cambian la noticia (seguimiento de campañas)
+PARAMETROS_IGNORADOS = ('utm_', 'fbclid', 'gclid', 'mc_', 'ref')
+
+# Secciones que se procesan antes (separadas por comas, sin distinguir mayúsculas)
+SECCIONES_PRIORITARIAS = [
+    seccion.strip().lower() for seccion in os.getenv("SECCIONES_PRIORITARIAS", "").split(',') if seccion.strip()
+]
+
+
+def normalizar_url(url, base=None):
+    """
+    Devuelve la forma canónica de una URL para reconocer la misma noticia aunque se enlace
+    de formas distintas: absoluta, sin fragmento, sin "www.", con https, sin parámetros de
+    seguimiento y con el resto de parámetros ordenados.
+
+    Parámetros:
+    url (str): URL tal y como aparece en la página.
+    base (str): URL de la página en la que aparece, para resolver enlaces relativos.
+    """
+    if base:
+        url = urljoin(base, url)
+    partes = urlsplit(url.strip())
+    host = partes.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    esquema = 'https' if partes.scheme in ('http', 'https') else partes.scheme
+    parametros = sorted(
+        (clave, valor) for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not clave.lower().startswith(PARAMETROS_IGNORADOS)
+    )
+    return urlunsplit((esquema, host, partes.path or '/', urlencode(parametros), ''))
+
+
+def es_noticia(articulo_data):
+    """True si el artículo enlaza a una noticia que se va a procesar."""
+    url_noticia = articulo_data.get('url_noticia')
+    return bool(url_noticia and urlsplit(url_noticia).path.endswith('.html'))
+
+
+def puntuar(articulos):
+    """
+    Calcula la prioridad de cada artículo de una portada (mayor es más prioritario):
+    - Posición: los primeros artículos de la portada son los más destacados.
+    - Sección: los de SECCIONES_PRIORITARIAS suman PESO_SECCION.
+    - Frescura: el identificador de las URLs de Grupo Joly crece con el tiempo, así que
+      las noticias con identificador más alto son las más recientes.
+
+    Parámetros:
+    articulos (list): Artículos de la portada en el orden en que aparecen.
+
+    Retorna:
+    list: Puntuación de cada artículo, en el mismo orden.
+    """
+    total = len(articulos)
+    identificadores = [id_noticia(a['url_noticia']) if es_noticia(a) else None for a in articulos]
+    recientes = sorted({int(i) for i in identificadores if i is not None})
+    frescura = {i: (n + 1) / len(recientes) for n, i in enumerate(recientes)}
+
+    puntuaciones = []
+    for posicion, (articulo_data, identificador) in enumerate(zip(articulos, identificadores)):
+        if not es_noticia(articulo_data):
+            puntuaciones.append(0.0)
+            continue
+        puntuacion = PESO_POSICION * (1 - posicion / total)
+        if (articulo_data.get('seccion') or '').lower() in SECCIONES_PRIORITARIAS:
+            puntuacion += PESO_SECCION
+        if identificador is not None:
+            puntuacion += PESO_FRESCURA * frescura[int(identificador)]
+        puntuaciones.append(puntuacion)
+    return puntuaciones
+
+
+class Frontera:
+    """
+    Cola de prioridad con los artículos pendientes de todas las portadas. Se sirven por
+    turnos entre periódicos (el mejor de cada uno, después el segundo mejor...) y, dentro
+    de cada turno, de mayor a menor prioridad.
+    """
+
+    def __init__(self):
+        self._cola = []
+        self._contador = itertools.count()
+
+    def agregar(self, url_portada, articulos, por_prioridad=True):
+        """
+        Añade los artículos de una portada. Con `por_prioridad` a False se sirven en el orden
+        de la portada (sigue habiendo turnos entre periódicos).
+        """
+        if por_prioridad:
+            puntuaciones = puntuar(articulos)
+            orden = sorted(range(len(articulos)), key=lambda i: -puntuaciones[i])
+        else:
+            puntuaciones = [0.0] * len(articulos)
+            orden = range(len(articulos))
+        for turno, i in enumerate(orden):
+            heapq.heappush(self._cola, (turno, -puntuaciones[i], next(self._contador), url_portada, articulos[i]))
+
+    def siguiente(self):
+        """Devuelve el siguiente (url_portada, articulo_data), o None si no quedan."""
+        if not self._cola:
+            return None
+        _, _, _, url_portada, articulo_data = heapq.heappop(self._cola)
+        return url_portada, articulo_data
+
+    def __len__(self):
+        return len(self._cola)
+
+
+class Presupuesto:
+    """Noticias y tiempo que le quedan a la exploración, compartidos entre todos los niveles."""
+
+    def __init__(self, max_noticias=MAX_NOTICIAS, tiempo_maximo=TIEMPO_MAXIMO):
+        self.max_noticias = max_noticias
+        self.tiempo_maximo = tiempo_maximo
+        self.inicio = time.monotonic()
+        self.noticias = 0
+
+    def limitado(self):
+        """True si hay límite de noticias o de tiempo; sin límite se procesan todas las noticias."""
+        return bool(self.max_noticias or self.tiempo_maximo)
+
+    def agotado(self):
+        """Motivo por el que no se pueden empezar más noticias, o None si quedan."""
+        if self.max_noticias and self.noticias >= self.max_noticias:
+            return f"Se ha alcanzado el límite de {self.max_noticias} noticias."
+        if self.tiempo_maximo and time.monotonic() - self.inicio >= self.tiempo_maximo:
+            return f"Se ha alcanzado el tiempo máximo de {self.tiempo_maximo:g} s."
+        return None
+
+
+def planificar(articulos_por_sitio, presupuesto=None, vistas=None):
+    """
+    Generador que entrega a los trabajadores los artículos por orden de prioridad hasta
+    agotar el presupuesto. Como los trabajadores piden artículos a medida que quedan libres,
+    una exploración limitada por tiempo o por número de noticias procesa primero las más valiosas.
+    Sin límites se procesan todas, así que se mantiene el orden de la portada.
+    Cada noticia se entrega una sola vez aunque aparezca en varias secciones o portadas.
+
+    Parámetros:
+    articulos_por_sitio (dict): Artículos de cada portada, por URL de la portada.
+    presupuesto (Presupuesto): Presupuesto de la exploración. Por defecto, MAX_NOTICIAS y TIEMPO_MAXIMO.
+    vistas (set): URLs normalizadas ya entregadas en esta exploración; se amplía con las nuevas.
+
+    Retorna:
+    generator: Tuplas (url_portada, articulo_data).
+    """
+    presupuesto = presupuesto or Presupuesto()
+    vistas = set() if vistas is None else vistas
+
+    frontera = Frontera()
+    for url_portada, articulos in articulos_por_sitio.items():
+        frontera.agregar(url_portada, articulos, por_prioridad=presupuesto.limitado())
+
+    while len(frontera):
+        motivo = presupuesto.agotado()
+        if motivo:
+            print(f"{motivo} Quedan {len(frontera)} noticias sin procesar.")
+            return
+
+        url_portada, articulo_data = frontera.siguiente()
+        if es_noticia(articulo_data):
+            clave = normalizar_url(articulo_data['url_noticia'], url_portada)
+            if clave in vistas:
+                continue
+            vistas.add(clave)
+            presupuesto.noticias += 1
+        yield url_portada, articulo_data
+
+
+def unir_relacionadas(*listas):
+    """Une listas de noticias relacionadas sin repetir las que tienen la misma URL."""
+    unidas = []
+    vistas = set()
+    for lista in listas:
+        for relacionada in lista or []:
+            clave = normalizar_url(relacionada.get('url_relacionada') or '')
+            if clave not in vistas:
+                vistas.add(clave)
+                unidas.append(relacionada)
+    return unidas
+
+
+def articulos_relacionados(url_portada, articulo_data, profundidad):
+    """
+    Convierte las noticias relacionadas de un artículo en artículos que se pueden añadir
+    a la frontera. Solo se siguen los enlaces a noticias del mismo periódico.
+
+    Parámetros:
+    url_portada (str): Portada desde la que se llegó al artículo.
+    articulo_data (dict): Artículo ya procesado, con 'noticias_relacionadas'.
+    profundidad (int): Nivel de los nuevos artículos (1 para los enlazados desde la portada).
+
+    Retorna:
+    list: Artículos con 'titular', 'url_noticia', 'seccion', 'relacionada_de' y 'profundidad'.
+    """
+    host_portada = urlsplit(normalizar_url(url_portada)).netloc
+    base = articulo_data.get('url_noticia') or url_portada
+    articulos = []
+    for relacionada in articulo_data.get('noticias_relacionadas') or []:
+        href = relacionada.get('url_relacionada')
+        if not href:
+            continue
+        url_noticia = urljoin(urljoin(url_portada, base), href)
+        nuevo = {
+            'titular': relacionada.get('titulo_relacionado'),
+            'url_noticia': url_noticia,
+            'seccion': articulo_data.get('seccion'),
+            'relacionada_de': articulo_data.get('url_noticia'),
+            'profundidad': profundidad,
+        }
+        if es_noticia(nuevo) and urlsplit(normalizar_url(url_noticia)).netloc == host_portada:
+            articulos.append(nuevo)
+    return articulos
@@ -0,0 +1,150 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+
+from planificacion import normalizar_url
+
+# Ficheros del registro: <RUTA_REGISTRO>.bloom (filtro de Bloom) y <RUTA_REGISTRO>.sqlite (registro exacto).
+# Vacío para no usar el registro y procesar siempre todas las noticias.
+RUTA_REGISTRO = os.getenv("RUTA_REGISTRO", "registro_noticias")
+
+# 16 MB de filtro (unos 134 millones de bits): menos de un 1 % de falsos positivos con 10 millones de URLs
+TAMANO_BLOOM_MB = int(os.getenv("TAMANO_BLOOM_MB", "16"))
+NUM_HASHES_BLOOM = 7
+
+# Las noticias sin dateModified no se pueden comparar: se vuelven a procesar cuando han pasado
+# estas horas desde la última vez (0 para procesarlas en todas las exploraciones)
+HORAS_REPROCESAR_SIN_FECHA = float(os.getenv("HORAS_REPROCESAR_SIN_FECHA", "24"))
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom guardado en un fichero y mapeado en memoria: comprobar una URL son
+    unos pocos accesos a memoria, sin leer el fichero entero ni consultar la base de datos.
+    Puede dar falsos positivos, pero nunca falsos negativos.
+    """
+
+    def __init__(self, ruta, tamano_bytes=TAMANO_BLOOM_MB * 1024 * 1024, num_hashes=NUM_HASHES_BLOOM):
+        self.nuevo = not os.path.exists(ruta)
+        if self.nuevo:
+            # El fichero se crea disperso: solo ocupa disco lo que se escribe
+            with open(ruta, 'wb') as f:
+                f.truncate(tamano_bytes)
+        self._fichero = open(ruta, 'r+b')
+        # Si el fichero ya existía se respeta su tamaño
+        self.num_bits = os.path.getsize(ruta) * 8
+        self.num_hashes = num_hashes
+        self._mapa = mmap.mmap(self._fichero.fileno(), 0)
+
+    def _posiciones(self, clave):
+        resumen = hashlib.blake2b(clave.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(resumen[:8], 'little')
+        h2 = int.from_bytes(resumen[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, clave):
+        return all(self._mapa[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(clave))
+
+    def agregar(self, clave):
+        for posicion in self._posiciones(clave):
+            self._mapa[posicion >> 3] |= 1 << (posicion & 7)
+
+    def cerrar(self):
+        self._mapa.flush()
+        self._mapa.close()
+        self._fichero.close()
+
+
+class RegistroNoticias:
+    """
+    Registro persistente de las noticias ya procesadas, por URL normalizada, con su
+    dateModified. El filtro de Bloom responde al instante para las noticias nuevas (la
+    mayoría de las consultas); solo las que probablemente ya se vieron se buscan en SQLite.
+    """
+
+    def __init__(self, ruta=RUTA_REGISTRO, horas_sin_fecha=HORAS_REPROCESAR_SIN_FECHA):
+        self.horas_sin_fecha = horas_sin_fecha
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta + '.sqlite', check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS noticias (url TEXT PRIMARY KEY, date_modified TEXT, procesada REAL)"
+        )
+        self._db.commit()
+
+        self.bloom = FiltroBloom(ruta + '.bloom')
+        if self.bloom.nuevo:
+            # Si se ha borrado el filtro se reconstruye a partir del registro exacto
+            for (url,) in self._db.execute("SELECT url FROM noticias"):
+                self.bloom.agregar(url)
+
+    def fecha_guardada(self, url_noticia):
+        """
+        Devuelve el dateModified con el que se procesó la noticia ('' si no lo tenía),
+        o None si la noticia no se ha procesado nunca. Las noticias sin dateModified
+        procesadas hace más de `horas_sin_fecha` horas también devuelven None.
+        """
+        clave = normalizar_url(url_noticia)
+        with self._lock:
+            if clave not in self.bloom:
+                return None
+            fila = self._db.execute("SELECT date_modified, procesada FROM noticias WHERE url = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        date_modified, procesada = fila
+        if not date_modified and time.time() - procesada >= self.horas_sin_fecha * 3600:
+            return None
+        return date_modified
+
+    def registrar(self, url_noticia, date_modified):
+        """Anota que la noticia se ha procesado con este dateModified."""
+        clave = normalizar_url(url_noticia)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO noticias (url, date_modified, procesada) VALUES (?, ?, ?)",
+                (clave, date_modified or '', time.time()),
+            )
+            self._db.commit()
+            self.bloom.agregar(clave)
+
+    def cerrar(self):
+        with self._lock:
+            self.bloom.cerrar()
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class SinRegistro:
+    """Registro vacío que se usa cuando RUTA_REGISTRO está vacío: todas las noticias son nuevas."""
+
+    def fecha_guardada(self, url_noticia):
+        return None
+
+    def registrar(self, url_noticia, date_modified):
+        pass
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def abrir_registro(ruta=RUTA_REGISTRO):
+    """Abre el registro de noticias procesadas, o uno vacío si no se ha configurado una ruta."""
+    if not ruta:
+        return SinRegistro()
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    return RegistroNoticias(ruta)
@@ -0,0 +1,234 @@
+import json
+import os
+
+import google.generativeai as genai
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted
+
+import sesion_http
+from limites_proveedores import ProveedorNoDisponible, resultado_pendiente
+from cache_enriquecimiento import varios_en_cache
+from sentimiento_local import triaje
+
+# Tamaño de cada petición a Gemini: comentarios y caracteres como máximo (unos 4 caracteres por token)
+COMENTARIOS_POR_LOTE_GEMINI = int(os.getenv("COMENTARIOS_POR_LOTE_GEMINI", "50"))
+CARACTERES_POR_LOTE_GEMINI = int(os.getenv("CARACTERES_POR_LOTE_GEMINI", "24000"))
+# Los comentarios más largos se recortan: el sentimiento se decide con el principio
+MAX_CARACTERES_COMENTARIO = 2000
+
+SENTIMIENTOS = ("POSITIVO", "NEGATIVO", "NEUTRAL")
+# Motivos de fin de la respuesta con los que Gemini no devuelve el texto
+MOTIVOS_BLOQUEO = ("SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII")
+INDETERMINADO = {"sentimiento": "Indeterminado", "confianza": 0}
+# Resultado de los comentarios que no se analizan porque Gemini no está disponible
+PENDIENTE = resultado_pendiente({"sentimiento": "pendiente", "confianza": 0})
+
+# La respuesta es una lista con un elemento por comentario, identificado por su posición en el lote
+ESQUEMA_RESPUESTA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "sentimiento": {"type": "string", "format": "enum", "enum": list(SENTIMIENTOS)},
+            "confianza": {"type": "integer"},
+        },
+        "required": ["id", "sentimiento", "confianza"],
+    },
+}
+
+generation_config = {
+    "temperature": 0,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+    "response_schema": ESQUEMA_RESPUESTA,
+}
+
+MODELO_GEMINI = "gemini-1.5-flash"
+# Forma parte de la clave de la caché: cambiar el sufijo al modificar las instrucciones o el esquema
+VERSION_CLASIFICACION = f"{MODELO_GEMINI}/lotes-json-1"
+
+model = genai.GenerativeModel(
+    model_name=MODELO_GEMINI,
+    generation_config=generation_config,
+    system_instruction=(
+        "Recibirás una lista JSON de comentarios, cada uno con un 'id' y un 'texto'. "
+        "Categoriza cada comentario en POSITIVO, NEGATIVO o NEUTRAL y añade la confianza "
+        "como un porcentaje entero entre 0 y 100. Devuelve un elemento por comentario con su mismo 'id'."
+    ),
+)
+
+
+class RespuestaInvalida(Exception):
+    """La respuesta de Gemini no se puede usar: JSON mal formado, cortado o incompleto."""
+
+
+def lotes(textos):
+    """
+    Reparte los comentarios en lotes que no superan COMENTARIOS_POR_LOTE_GEMINI
+    comentarios ni CARACTERES_POR_LOTE_GEMINI caracteres.
+
+    Parámetros:
+    textos (list): Pares (posición, texto) de los comentarios.
+
+    Retorna:
+    generator: Listas de pares (posición, texto).
+    """
+    lote, caracteres = [], 0
+    for posicion, texto in textos:
+        if lote and (len(lote) >= COMENTARIOS_POR_LOTE_GEMINI or caracteres + len(texto) > CARACTERES_POR_LOTE_GEMINI):
+            yield lote
+            lote, caracteres = [], 0
+        lote.append((posicion, texto))
+        caracteres += len(texto)
+    if lote:
+        yield lote
+
+
+def validar_respuesta(texto_respuesta, num_comentarios):
+    """
+    Comprueba la respuesta de Gemini a un lote y la convierte en un resultado por comentario.
+
+    Retorna:
+    dict: Resultado ({"sentimiento", "confianza"}) por id. Los comentarios que falten en la
+        respuesta no aparecen.
+    """
+    try:
+        elementos = json.loads(texto_respuesta)
+    except ValueError as e:
+        raise RespuestaInvalida(f"JSON no válido ({e})")
+    if not isinstance(elementos, list):
+        raise RespuestaInvalida("se esperaba una lista")
+
+    resultados = {}
+    for elemento in elementos:
+        if not isinstance(elemento, dict):
+            continue
+        identificador = elemento.get("id")
+        sentimiento = str(elemento.get("sentimiento", "")).strip().upper()
+        confianza = elemento.get("confianza")
+        if (
+            isinstance(identificador, int) and 0 <= identificador < num_comentarios
+            and identificador not in resultados
+            and sentimiento in SENTIMIENTOS
+            and isinstance(confianza, (int, float)) and 0 <= confianza <= 100
+        ):
+            resultados[identificador] = {"sentimiento": sentimiento, "confianza": int(round(confianza))}
+    return resultados
+
+
+def _clasificar_lote(lote):
+    """Una petición a Gemini con todo el lote. Devuelve el resultado por id de los comentarios válidos."""
+    contenido = json.dumps([{"id": i, "texto": texto} for i, (_, texto) in enumerate(lote)], ensure_ascii=False)
+    with sesion_http.medir("gemini"):
+        response = model.generate_content(contenido, request_options={"timeout": sesion_http.timeout("gemini")[1]})
+
+    # Si Gemini bloquea el lote por seguridad (comentarios ofensivos), response.text lanza
+    # ValueError. Se trata como una respuesta no válida para dividir el lote y aislar el comentario
+    bloqueo = getattr(response.prompt_feedback, "block_reason", None)
+    if bloqueo:
+        raise RespuestaInvalida(f"Gemini ha bloqueado el lote ({bloqueo.name})")
+    candidato = response.candidates[0] if response.candidates else None
+    if candidato is None:
+        raise RespuestaInvalida("respuesta sin candidatos")
+    motivo = candidato.finish_reason.name
+    if motivo == "MAX_TOKENS":
+        raise RespuestaInvalida("la respuesta se ha cortado por el límite de tokens")
+    if motivo in MOTIVOS_BLOQUEO:
+        raise RespuestaInvalida(f"Gemini ha bloqueado la respuesta ({motivo})")
+    try:
+        texto_respuesta = response.text
+    except ValueError as e:
+        raise RespuestaInvalida(f"respuesta sin texto ({e})")
+    return validar_respuesta(texto_respuesta, len(lote))
+
+
+def _clasificar(lote, resultados, intento=0):
+    """
+    Clasifica un lote y guarda cada resultado en `resultados` por la posición del comentario.
+    Si el lote es demasiado grande o la respuesta no es válida (por ejemplo, porque se ha
+    cortado por el límite de tokens o Gemini la ha bloqueado por seguridad), el lote se
+    divide en dos y se reintenta cada mitad, hasta aislar el comentario que falla.
+    Los comentarios que falten en una respuesta válida se vuelven a pedir aparte. Si se ha
+    superado la cuota, se reintenta el mismo lote. Otros errores (red, credenciales) no se
+    arreglan dividiendo el lote: se marca entero, como pendiente si el circuito de Gemini está abierto.
+    """
+    try:
+        validos = _clasificar_lote(lote)
+        error = "respuesta sin ningún resultado válido"
+    except (RespuestaInvalida, InvalidArgument) as e:
+        validos, error = {}, e
+    except ProveedorNoDisponible:
+        for posicion, _ in lote:
+            resultados[posicion] = dict(PENDIENTE)
+        return
+    except Exception as e:
+        if isinstance(e, ResourceExhausted) and intento < sesion_http.REINTENTOS:
+            # Cuota superada: el limitador ya ha reducido la tasa y espera antes de la siguiente petición
+            _clasificar(lote, resultados, intento + 1)
+            return
+        print(f"Error al analizar un lote de {len(lote)} comentarios: {e}")
+        for posicion, _ in lote:
+            resultados[posicion] = dict(INDETERMINADO)
+        return
+
+    if not validos:
+        if len(lote) == 1:
+            print(f"Error al analizar el comentario: {error}")
+            resultados[lote[0][0]] = dict(INDETERMINADO)
+            return
+        print(f"Error al analizar un lote de {len(lote)} comentarios ({error}); se divide en dos.")
+        mitad = len(lote) // 2
+        _clasificar(lote[:mitad], resultados)
+        _clasificar(lote[mitad:], resultados)
+        return
+
+    for i, (posicion, _) in enumerate(lote):
+        if i in validos:
+            resultados[posicion] = validos[i]
+    faltan = [(posicion, texto) for i, (posicion, texto) in enumerate(lote) if i not in validos]
+    if faltan:
+        _clasificar(faltan, resultados)
+
+
+def analizar_sentimientos(textos):
+    """
+    Analiza el sentimiento de varios comentarios con Gemini usando pocas peticiones: los
+    comentarios se envían por lotes y la respuesta sigue un esquema JSON que se valida.
+    Los comentarios claros se clasifican en local (ver sentimiento_local.py) y, de los
+    demás, solo se envían los que no están en la caché.
+
+    Parámetros:
+    textos (list): Textos de los comentarios.
+
+    Retorna:
+    list: Un diccionario {"sentimiento", "confianza"} por texto, en el mismo orden.
+    """
+    return triaje(textos, _analizar_en_cache, _formato_local)
+
+
+def _formato_local(etiqueta, confianza):
+    return {"sentimiento": etiqueta, "confianza": int(round(100 * confianza))}
+
+
+def _analizar_en_cache(textos):
+    return varios_en_cache(
+        "gemini", VERSION_CLASIFICACION, textos, _analizar_sentimientos,
+        valido=lambda resultado: resultado["sentimiento"] != INDETERMINADO["sentimiento"],
+    )
+
+
+def _analizar_sentimientos(textos):
+    """Clasificación por lotes con Gemini, sin caché."""
+    resultados = {}
+    pendientes = []
+    for posicion, texto in enumerate(textos):
+        texto = (texto or "").strip()
+        if texto:
+            pendientes.append((posicion, texto[:MAX_CARACTERES_COMENTARIO]))
+        else:
+            resultados[posicion] = dict(INDETERMINADO)
+
+    for lote in lotes(pendientes):
+        _clasificar(lote, resultados)
+
+    return [resultados[posicion] for posicion in range(len(textos))]
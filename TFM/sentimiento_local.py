@@ -0,0 +1,358 @@
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+
+try:
+    # NumPy solo es necesario para el modelo lineal; sin él se usa el léxico
+    import numpy as np
+except ImportError:
+    np = None
+
+# Clasificación local de los comentarios antes de llamar a Gemini o a Azure: los que se
+# pueden clasificar con seguridad no salen del proceso. Poner a 0 para enviarlos todos.
+SENTIMIENTO_LOCAL = os.getenv("SENTIMIENTO_LOCAL", "1") == "1"
+# Confianza mínima (0-1) para quedarse con la clasificación local
+UMBRAL_CONFIANZA_LOCAL = float(os.getenv("UMBRAL_CONFIANZA_LOCAL", "0.85"))
+# Modelo lineal entrenado con comentarios ya etiquetados (ver `entrenar`). Si no existe, se usa el léxico.
+RUTA_MODELO_SENTIMIENTO = os.getenv("RUTA_MODELO_SENTIMIENTO", "modelo_sentimiento.npz")
+
+ETIQUETAS = ("POSITIVO", "NEUTRAL", "NEGATIVO")
+# Etiquetas de Gemini y de Azure (en mayúsculas) con las que se entrena el modelo
+ETIQUETAS_PROVEEDORES = {
+    'POSITIVO': 'POSITIVO', 'NEUTRAL': 'NEUTRAL', 'NEGATIVO': 'NEGATIVO',
+    'POSITIVE': 'POSITIVO', 'NEGATIVE': 'NEGATIVO',
+}
+
+# Léxico de polaridad (palabras sin tildes y en minúsculas) con su peso
+LEXICO_POSITIVO = {
+    'bien': 1, 'bueno': 1, 'buena': 1, 'buenos': 1, 'buenas': 1, 'mejor': 1, 'mejores': 1,
+    'genial': 2, 'excelente': 2, 'estupendo': 2, 'estupenda': 2, 'fantastico': 2, 'fantastica': 2,
+    'magnifico': 2, 'magnifica': 2, 'maravilla': 2, 'maravilloso': 2, 'maravillosa': 2, 'perfecto': 2,
+    'perfecta': 2, 'enhorabuena': 2, 'felicidades': 2, 'felicitaciones': 2, 'gracias': 1, 'bravo': 2,
+    'acierto': 2, 'orgullo': 2, 'orgulloso': 2, 'orgullosa': 2, 'precioso': 2, 'preciosa': 2,
+    'bonito': 1, 'bonita': 1, 'encanta': 2, 'encantado': 2, 'encantada': 2, 'gusta': 1,
+    'feliz': 2, 'alegria': 2, 'ole': 2, 'chapo': 2, 'grande': 1, 'grandes': 1, 'gran': 1,
+    'merecido': 1, 'merecida': 1, 'exito': 2, 'razon': 1, 'apoyo': 1, 'ejemplar': 2, 'increible': 1,
+    'buenisimo': 2, 'buenisima': 2, 'valiente': 1, 'impresionante': 1, 'disfrutar': 1, 'recomendable': 2,
+}
+LEXICO_NEGATIVO = {
+    'mal': 1, 'malo': 1, 'mala': 1, 'malos': 1, 'malas': 1, 'peor': 1, 'peores': 1,
+    'verguenza': 2, 'vergonzoso': 2, 'vergonzosa': 2, 'lamentable': 2, 'penoso': 2, 'penosa': 2,
+    'pena': 1, 'horrible': 2, 'horroroso': 2, 'asco': 2, 'asqueroso': 2, 'desastre': 2, 'ruina': 2,
+    'ridiculo': 2, 'ridicula': 2, 'indignante': 2, 'indignacion': 2, 'vergonzante': 2, 'basura': 2,
+    'mentira': 2, 'mentiras': 2, 'mentiroso': 2, 'mentirosos': 2, 'corrupto': 2, 'corruptos': 2,
+    'corrupcion': 2, 'robo': 2, 'robar': 2, 'ladron': 2, 'ladrones': 2, 'sinverguenza': 2,
+    'sinverguenzas': 2, 'inutil': 2, 'inutiles': 2, 'incompetente': 2, 'incompetentes': 2, 'triste': 1,
+    'tristeza': 1, 'culpa': 1, 'fatal': 2, 'terrible': 2, 'pesimo': 2, 'pesima': 2, 'abandono': 1,
+    'abandonado': 1, 'sucio': 1, 'sucia': 1, 'suciedad': 1, 'peligro': 1, 'peligroso': 1, 'odio': 2,
+    'harto': 2, 'harta': 2, 'hartos': 2, 'cansado': 1, 'cansados': 1, 'estafa': 2, 'tonto': 1,
+    'tonteria': 1, 'payaso': 2, 'payasos': 2, 'cutre': 2, 'chapuza': 2, 'fracaso': 2, 'escandalo': 2,
+}
+# Solo negadores que invierten lo que viene detrás. 'sin', 'ni' y 'nada' no: "sin duda,
+# excelente", "gracias por nada" o "ni bien ni mal" no se pueden leer invirtiendo la palabra siguiente
+NEGADORES = {'no', 'nunca', 'jamas', 'tampoco', 'nadie'}
+INTENSIFICADORES = {'muy': 1.5, 'mucho': 1.5, 'mucha': 1.5, 'tan': 1.5, 'super': 1.5, 'bastante': 1.25, 'totalmente': 1.5}
+# Palabras que quedan afectadas por un negador anterior (la negación acaba en el primer signo de puntuación)
+ALCANCE_NEGACION = 3
+# Un comentario solo se queda en local con al menos estas palabras del léxico del mismo signo y
+# ninguna del contrario: una sola palabra ("Genial, otra vez sin agua") puede ser ironía
+MIN_COINCIDENCIAS_LEXICO = 2
+# Confianza máxima del léxico para los comentarios que no cumplen esa condición
+CONFIANZA_MAXIMA_DUDOSO = 0.5
+
+PATRON_PALABRA = re.compile(r"\w+", re.UNICODE)
+# Para el léxico también cuentan los signos de puntuación, que cierran el alcance de la negación
+PATRON_PALABRA_O_PUNTUACION = re.compile(r"\w+|[.,;:!?¡¿()\"«»…-]", re.UNICODE)
+
+# Dimensión del espacio de características del modelo lineal (hashing de palabras y bigramas)
+DIMENSION_MODELO = 2 ** 18
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    """Palabras del texto en minúsculas y sin tildes."""
+    return PATRON_PALABRA.findall(_normalizar(texto))
+
+
+def clasificar_lexico(texto):
+    """
+    Clasifica un comentario con el léxico de polaridad, teniendo en cuenta negaciones
+    ("no es bueno") e intensificadores ("muy malo").
+
+    Retorna:
+    tuple: (etiqueta, confianza entre 0 y 1). Un comentario sin palabras del léxico, con
+        palabras de los dos signos o con menos de MIN_COINCIDENCIAS_LEXICO palabras tiene
+        confianza baja (como mucho CONFIANZA_MAXIMA_DUDOSO).
+    """
+    tokens = PATRON_PALABRA_O_PUNTUACION.findall(_normalizar(texto))
+    positivo = negativo = 0.0
+    coincidencias_pos = coincidencias_neg = 0
+    negacion = 0
+    factor = 1.0
+    for token in tokens:
+        if not token[0].isalnum() and token[0] != '_':
+            # Un signo de puntuación cierra la negación y el intensificador
+            negacion, factor = 0, 1.0
+            continue
+        peso_pos = LEXICO_POSITIVO.get(token, 0)
+        peso_neg = LEXICO_NEGATIVO.get(token, 0)
+        if token in NEGADORES:
+            negacion = ALCANCE_NEGACION
+            continue
+        if token in INTENSIFICADORES:
+            factor = INTENSIFICADORES[token]
+            continue
+        if peso_pos or peso_neg:
+            peso_pos, peso_neg = peso_pos * factor, peso_neg * factor
+            if negacion:
+                peso_pos, peso_neg = peso_neg, peso_pos
+            positivo += peso_pos
+            negativo += peso_neg
+            coincidencias_pos += peso_pos > 0
+            coincidencias_neg += peso_neg > 0
+        factor = 1.0
+        negacion = max(0, negacion - 1)
+
+    total = positivo + negativo
+    if not total:
+        return "NEUTRAL", 0.0
+    polaridad = abs(positivo - negativo) / total
+    intensidad = 1 - math.exp(-total)
+    confianza = polaridad * intensidad
+    coincidencias, contrarias = (
+        (coincidencias_pos, coincidencias_neg) if positivo > negativo else (coincidencias_neg, coincidencias_pos)
+    )
+    if coincidencias < MIN_COINCIDENCIAS_LEXICO or contrarias:
+        confianza = min(confianza, CONFIANZA_MAXIMA_DUDOSO)
+    return ("POSITIVO" if positivo > negativo else "NEGATIVO"), confianza
+
+
+def caracteristicas(texto):
+    """Índices de las características (palabras y bigramas) de un comentario en el modelo lineal."""
+    tokens = palabras(texto)
+    terminos = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [zlib.crc32(termino.encode('utf-8')) % DIMENSION_MODELO for termino in terminos]
+
+
+class ModeloLineal:
+    """
+    Regresión logística multiclase sobre palabras y bigramas (con hashing), entrenada con
+    los comentarios que ya etiquetaron Gemini o Azure. Se clasifica un lote entero con unas
+    pocas operaciones de NumPy.
+    """
+
+    def __init__(self, pesos, sesgo):
+        # (DIMENSION_MODELO + 1, 3): la última fila, siempre a 0, es la de los textos sin palabras
+        self.pesos = pesos
+        self.sesgo = sesgo  # (3,)
+
+    @classmethod
+    def cargar(cls, ruta):
+        datos = np.load(ruta)
+        return cls(datos['pesos'], datos['sesgo'])
+
+    def guardar(self, ruta):
+        np.savez_compressed(ruta, pesos=self.pesos, sesgo=self.sesgo)
+
+    @staticmethod
+    def _matriz(indices_por_texto):
+        """Índices concatenados y posición donde empieza cada texto, para np.add.reduceat."""
+        # Los textos sin características reciben un índice de relleno con peso 0 (el último)
+        indices = [idx or [DIMENSION_MODELO] for idx in indices_por_texto]
+        inicios = np.cumsum([0] + [len(idx) for idx in indices[:-1]])
+        return np.fromiter((i for idx in indices for i in idx), dtype=np.int64), inicios
+
+    def probabilidades(self, textos):
+        """Probabilidad de cada etiqueta (en el orden de ETIQUETAS) para cada texto."""
+        if not textos:
+            return np.zeros((0, len(ETIQUETAS)))
+        return self._probabilidades(*self._matriz([caracteristicas(texto) for texto in textos]))
+
+    def _probabilidades(self, indices, inicios):
+        puntuaciones = np.add.reduceat(self.pesos[indices], inicios, axis=0) + self.sesgo
+        puntuaciones -= puntuaciones.max(axis=1, keepdims=True)
+        exponenciales = np.exp(puntuaciones)
+        return exponenciales / exponenciales.sum(axis=1, keepdims=True)
+
+    @classmethod
+    def entrenar(cls, textos, etiquetas, epocas=20, tasa=0.5, regularizacion=1e-6):
+        """Descenso de gradiente por lotes sobre la entropía cruzada."""
+        clase = np.array([ETIQUETAS.index(etiqueta) for etiqueta in etiquetas])
+        objetivo = np.eye(len(ETIQUETAS))[clase]
+        indices, inicios = cls._matriz([caracteristicas(texto) for texto in textos])
+        longitudes = np.diff(np.append(inicios, len(indices)))
+        fila = np.repeat(np.arange(len(textos)), longitudes)
+
+        modelo = cls(np.zeros((DIMENSION_MODELO + 1, len(ETIQUETAS)), dtype=np.float32), np.zeros(len(ETIQUETAS)))
+        for _ in range(epocas):
+            error = (modelo._probabilidades(indices, inicios) - objetivo) / len(textos)
+            gradiente = np.zeros_like(modelo.pesos)
+            np.add.at(gradiente, indices, error[fila])
+            gradiente[-1] = 0
+            modelo.pesos -= tasa * (gradiente + regularizacion * modelo.pesos)
+            modelo.sesgo -= tasa * error.sum(axis=0)
+        return modelo
+
+
+_modelo = None
+_modelo_cargado = False
+_lock = threading.Lock()
+
+# Comentarios clasificados en local y enviados al proveedor
+contadores = {"locales": 0, "remotos": 0}
+
+
+def obtener_modelo():
+    """Modelo lineal de RUTA_MODELO_SENTIMIENTO, o None si no hay (o NumPy no está instalado)."""
+    global _modelo, _modelo_cargado
+    with _lock:
+        if not _modelo_cargado:
+            _modelo_cargado = True
+            if np is not None and RUTA_MODELO_SENTIMIENTO and os.path.exists(RUTA_MODELO_SENTIMIENTO):
+                try:
+                    _modelo = ModeloLineal.cargar(RUTA_MODELO_SENTIMIENTO)
+                    print(f"Modelo de sentimiento local cargado de {RUTA_MODELO_SENTIMIENTO}")
+                except Exception as e:
+                    print(f"No se pudo cargar el modelo de sentimiento local, se usa el léxico: {e}")
+        return _modelo
+
+
+def clasificar(textos):
+    """
+    Clasifica los comentarios en local: con el modelo lineal si hay uno entrenado y, si no,
+    con el léxico.
+
+    Retorna:
+    list: (etiqueta, confianza entre 0 y 1) por texto, en el mismo orden.
+    """
+    modelo = obtener_modelo()
+    if modelo is None:
+        return [clasificar_lexico(texto) for texto in textos]
+    probabilidades = modelo.probabilidades(textos)
+    return [(ETIQUETAS[int(fila.argmax())], float(fila.max())) for fila in probabilidades]
+
+
+def triaje(textos, remoto, formato, umbral=UMBRAL_CONFIANZA_LOCAL):
+    """
+    Se queda con la clasificación local de los comentarios claros y envía solo los dudosos
+    al proveedor.
+
+    Parámetros:
+    textos (list): Textos de los comentarios.
+    remoto (callable): Recibe la lista de textos dudosos y devuelve un resultado por texto.
+    formato (callable): Convierte (etiqueta, confianza) en el resultado con el formato del proveedor.
+    umbral (float): Confianza mínima para no enviar el comentario.
+
+    Retorna:
+    list: Un resultado por texto, en el mismo orden. Los clasificados en local llevan 'origen': 'local'.
+    """
+    if not SENTIMIENTO_LOCAL:
+        return remoto(textos)
+
+    resultados = [None] * len(textos)
+    dudosos = []
+    for posicion, (texto, (etiqueta, confianza)) in enumerate(zip(textos, clasificar([t or '' for t in textos]))):
+        if texto and texto.strip() and confianza >= umbral:
+            resultados[posicion] = dict(formato(etiqueta, confianza), origen='local')
+        else:
+            dudosos.append(posicion)
+
+    if dudosos:
+        for posicion, resultado in zip(dudosos, remoto([textos[i] for i in dudosos])):
+            resultados[posicion] = resultado
+
+    with _lock:
+        contadores["locales"] += len(textos) - len(dudosos)
+        contadores["remotos"] += len(dudosos)
+    return resultados
+
+
+def resumen_triaje():
+    """Texto con los comentarios clasificados en local y los enviados al proveedor."""
+    total = contadores["locales"] + contadores["remotos"]
+    if not total:
+        return "No se ha clasificado ningún comentario."
+    return (
+        f"Comentarios clasificados en local: {contadores['locales']} de {total} "
+        f"({100 * contadores['locales'] / total:.0f} %); enviados al proveedor: {contadores['remotos']}"
+    )
+
+
+def etiqueta_de(comentario):
+    """Etiqueta de un comentario guardado (formato de Gemini o de Azure), o None si no sirve para entrenar."""
+    if comentario.get('origen') == 'local':
+        return None
+    sentimiento = str(comentario.get('sentimiento') or '').upper()
+    return ETIQUETAS_PROVEEDORES.get(sentimiento)
+
+
+def comentarios_etiquetados(rutas):
+    """Lee los comentarios etiquetados por los proveedores de ficheros JSON Lines (ver SumideroJSON)."""
+    textos, etiquetas = [], []
+    for ruta in rutas:
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                for comentario in json.loads(linea).get('comentarios') or []:
+                    etiqueta = etiqueta_de(comentario)
+                    if etiqueta and comentario.get('texto_comentario'):
+                        textos.append(comentario['texto_comentario'])
+                        etiquetas.append(etiqueta)
+    return textos, etiquetas
+
+
+def entrenar(rutas, ruta_modelo=RUTA_MODELO_SENTIMIENTO):
+    """
+    Entrena el modelo lineal con los comentarios ya etiquetados, muestra su exactitud sobre
+    un 10 % de ellos que no se usa para entrenar y cuántos se habrían clasificado en local.
+    """
+    if np is None:
+        print("Hace falta NumPy para entrenar el modelo de sentimiento local.")
+        return
+    textos, etiquetas = comentarios_etiquetados(rutas)
+    if len(textos) < 20:
+        print(f"Hay solo {len(textos)} comentarios etiquetados; no se entrena el modelo.")
+        return
+    prueba = set(range(0, len(textos), 10))
+    entrenamiento = [i for i in range(len(textos)) if i not in prueba]
+
+    inicio = time.perf_counter()
+    modelo = ModeloLineal.entrenar([textos[i] for i in entrenamiento], [etiquetas[i] for i in entrenamiento])
+    print(f"Modelo entrenado con {len(entrenamiento)} comentarios en {time.perf_counter() - inicio:.1f} s")
+
+    inicio = time.perf_counter()
+    probabilidades = modelo.probabilidades([textos[i] for i in sorted(prueba)])
+    duracion = time.perf_counter() - inicio
+    aciertos = seguros = aciertos_seguros = 0
+    for i, fila in zip(sorted(prueba), probabilidades):
+        acierto = ETIQUETAS[int(fila.argmax())] == etiquetas[i]
+        aciertos += acierto
+        if fila.max() >= UMBRAL_CONFIANZA_LOCAL:
+            seguros += 1
+            aciertos_seguros += acierto
+    print(f"Exactitud: {100 * aciertos / len(prueba):.1f} % ({len(prueba) / max(duracion, 1e-9):.0f} comentarios/s)")
+    if seguros:
+        print(
+            f"Con confianza >= {UMBRAL_CONFIANZA_LOCAL:g}: {100 * seguros / len(prueba):.0f} % de los comentarios, "
+            f"exactitud {100 * aciertos_seguros / seguros:.1f} %"
+        )
+    modelo.guardar(ruta_modelo)
+    print(f"Modelo guardado en {ruta_modelo}")
+
+
+if __name__ == "__main__":
+    # Uso: python sentimiento_local.py noticias.jsonl [otras.jsonl ...]
+    rutas = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not rutas:
+        print("Indica los ficheros JSON Lines con comentarios ya etiquetados.")
+        sys.exit(1)
+    entrenar(rutas)
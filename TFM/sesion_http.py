@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import limites_proveedores
+
+# Timeouts (conexión, lectura) en segundos para cada endpoint
+TIMEOUTS = {
+    "portada": (5, 30),
+    "noticia": (5, 30),
+    "comentarios": (5, 15),
+    "imagen": (5, 15),
+    "azure_texto": (5, 30),
+    "azure_vision": (5, 30),
+    "ibm_nlu": (5, 60),
+    "gemini": (5, 60),
+    "defecto": (5, 30),
+}
+
+# Reintentos ante errores de conexión y respuestas 429/5xx, respetando la cabecera Retry-After
+REINTENTOS = int(os.getenv("HTTP_REINTENTOS", "3"))
+FACTOR_ESPERA = float(os.getenv("HTTP_FACTOR_ESPERA", "0.5"))
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+
+# Conexiones que se mantienen abiertas por host
+TAMANO_POOL = int(os.getenv("HTTP_TAMANO_POOL", "20"))
+
+_sesion = None
+_lock = threading.Lock()
+
+# Contadores por endpoint: peticiones, errores, reintentos, segundos y códigos de estado
+contadores = {}
+
+
+def crear_sesion():
+    """
+    Crea una sesión de requests que reutiliza conexiones (keep-alive) y reintenta
+    con espera exponencial las respuestas 429/5xx y los fallos de conexión.
+    """
+    reintentos = Retry(
+        total=REINTENTOS,
+        backoff_factor=FACTOR_ESPERA,
+        status_forcelist=ESTADOS_REINTENTABLES,
+        allowed_methods=None,  # Las APIs de análisis no tienen efectos secundarios: también se reintenta POST
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=TAMANO_POOL, pool_maxsize=TAMANO_POOL, max_retries=reintentos)
+
+    sesion = requests.Session()
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+
+def obtener_sesion():
+    """Devuelve la sesión compartida por todos los módulos, creándola la primera vez."""
+    global _sesion
+    with _lock:
+        if _sesion is None:
+            _sesion = crear_sesion()
+        return _sesion
+
+
+def timeout(endpoint):
+    """Timeout (conexión, lectura) configurado para `endpoint`."""
+    return TIMEOUTS.get(endpoint, TIMEOUTS["defecto"])
+
+
+def _contador(endpoint):
+    return contadores.setdefault(endpoint, {
+        "peticiones": 0,
+        "errores": 0,
+        "reintentos": 0,
+        "segundos": 0.0,
+        "estados": {},
+    })
+
+
+def registrar(endpoint, segundos, estado=None, reintentos=0, error=False):
+    """Suma una llamada a los contadores de `endpoint`."""
+    with _lock:
+        contador = _contador(endpoint)
+        contador["peticiones"] += 1
+        contador["segundos"] += segundos
+        contador["reintentos"] += reintentos
+        if error:
+            contador["errores"] += 1
+        if estado is not None:
+            contador["estados"][estado] = contador["estados"].get(estado, 0) + 1
+
+
+def _pausa_retry_after(valor):
+    """Segundos de la cabecera Retry-After, o None si no viene o no es un número."""
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def _es_429(error):
+    """True si la excepción de un SDK (Gemini, IBM) corresponde a una respuesta 429."""
+    return getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429
+
+
+def _actualizar_circuito(circuito, estado, prueba):
+    """
+    Informa al circuito del proveedor del resultado de una llamada (`prueba` es lo que devolvió
+    `Circuito.permitir` al empezarla). Cuentan como fallos los
+    errores de red y los timeouts (estado None), los 5xx y los 401/403; un 429 no dice nada
+    de si el proveedor funciona, y el resto de 4xx son errores de la petición, no del proveedor.
+    """
+    if circuito is None:
+        return
+    if estado == 429:
+        circuito.liberar(prueba)
+    elif estado is None or estado >= 500 or estado in (401, 403, 408):
+        circuito.fallo(prueba)
+    else:
+        circuito.exito(prueba)
+
+
+@contextmanager
+def medir(endpoint):
+    """
+    Cuenta una llamada hecha con un SDK que no usa `solicitar` (Gemini, IBM NLU).
+    Las excepciones se cuentan como errores y se vuelven a lanzar.
+    La llamada espera su turno según la cuota del proveedor y no se hace si su circuito
+    está abierto: se lanza ProveedorNoDisponible (ver limites_proveedores.py).
+    """
+    circuito = limites_proveedores.circuito(endpoint)
+    prueba = circuito.permitir() if circuito else False
+    with limites_proveedores.turno(endpoint):
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            limitada = _es_429(e)
+            registrar(endpoint, time.perf_counter() - inicio, estado=429 if limitada else None, error=True)
+            limitador = limites_proveedores.limite(endpoint)
+            if limitada and limitador:
+                respuesta = getattr(e, "http_response", None)
+                limitador.limitado(_pausa_retry_after(getattr(respuesta, "headers", {}).get("Retry-After")))
+            codigo = getattr(e, "code", None)
+            _actualizar_circuito(circuito, int(codigo) if isinstance(codigo, int) else None, prueba)
+            raise
+        registrar(endpoint, time.perf_counter() - inicio)
+        limitador = limites_proveedores.limite(endpoint)
+        if limitador:
+            limitador.exito()
+        _actualizar_circuito(circuito, 200, prueba)
+
+
+def solicitar(metodo, url, endpoint="defecto", **kwargs):
+    """
+    Hace una petición HTTP con la sesión compartida y el timeout de `endpoint`.
+
+    Parámetros:
+    metodo (str): 'GET', 'POST'...
+    url (str): URL de la petición.
+    endpoint (str): Nombre del endpoint para el timeout y los contadores.
+    **kwargs: Argumentos de `requests.Session.request` (headers, json, params...).
+
+    Retorna:
+    requests.Response: Respuesta final, después de los reintentos.
+
+    Lanza ProveedorNoDisponible, sin hacer la petición, si el circuito del proveedor está abierto.
+    """
+    kwargs.setdefault("timeout", timeout(endpoint))
+    circuito = limites_proveedores.circuito(endpoint)
+    prueba = circuito.permitir() if circuito else False
+    with limites_proveedores.turno(endpoint):
+        inicio = time.perf_counter()
+        try:
+            response = obtener_sesion().request(metodo, url, **kwargs)
+        except requests.RequestException:
+            registrar(endpoint, time.perf_counter() - inicio, error=True)
+            _actualizar_circuito(circuito, None, prueba)
+            raise
+        except Exception:
+            # Un error que no es de red (URL o argumentos no válidos) no dice nada del proveedor,
+            # pero si la llamada era la prueba del circuito hay que soltarla o quedaría abierto
+            registrar(endpoint, time.perf_counter() - inicio, error=True)
+            if circuito:
+                circuito.liberar(prueba)
+            raise
+
+    historial = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+    registrar(
+        endpoint,
+        time.perf_counter() - inicio,
+        estado=response.status_code,
+        reintentos=len(historial),
+        error=response.status_code >= 400,
+    )
+
+    # Los proveedores con cuota se frenan si han respondido 429, aunque un reintento haya funcionado
+    limitador = limites_proveedores.limite(endpoint)
+    if limitador:
+        if response.status_code == 429:
+            limitador.limitado(_pausa_retry_after(response.headers.get("Retry-After")))
+        elif any(getattr(intento, "status", None) == 429 for intento in historial):
+            limitador.limitado(0)
+        else:
+            limitador.exito()
+    _actualizar_circuito(circuito, response.status_code, prueba)
+    return response
+
+
+def get(url, endpoint="defecto", **kwargs):
+    return solicitar("GET", url, endpoint, **kwargs)
+
+
+def post(url, endpoint="defecto", **kwargs):
+    return solicitar("POST", url, endpoint, **kwargs)
+
+
+def configurar_servicio_ibm(servicio, endpoint="ibm_nlu"):
+    """Hace que un servicio del SDK de IBM use la sesión compartida y el timeout de `endpoint`."""
+    servicio.set_http_client(obtener_sesion())
+    servicio.set_http_config({"timeout": timeout(endpoint)})
+
+
+def resumen_contadores():
+    """Texto con los contadores de cada endpoint."""
+    with _lock:
+        copia = {endpoint: dict(contador) for endpoint, contador in contadores.items()}
+    if not copia:
+        return "No se ha hecho ninguna petición externa."
+    lineas = ["Peticiones por endpoint:"]
+    for endpoint, contador in sorted(copia.items()):
+        media = contador["segundos"] / contador["peticiones"]
+        lineas.append(
+            f"  {endpoint}: {contador['peticiones']} peticiones, {contador['errores']} errores, "
+            f"{contador['reintentos']} reintentos, media {media:.2f} s, estados {contador['estados']}"
+        )
+    lineas.append(limites_proveedores.resumen_limites())
+    return "\n".join(lineas)
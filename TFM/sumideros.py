@@ -0,0 +1,275 @@
+import json
+import os
+import threading
+from urllib.parse import urlparse
+
+from pymongo import MongoClient, ReplaceOne  # Importación para la conexión con Azure Cosmos DB
+
+# Noticias que se acumulan como máximo antes de enviarlas a Cosmos DB o a Service Bus
+TAMANO_LOTE = int(os.getenv("TAMANO_LOTE", "10"))
+
+# Un único cliente de MongoDB por cadena de conexión, compartido por todos los periódicos
+_clientes_mongo = {}
+_lock_mongo = threading.Lock()
+
+
+def conectar_a_cosmos(connection_string, db_name, collection_name):
+    try:
+        with _lock_mongo:
+            client = _clientes_mongo.get(connection_string)
+            if client is None:
+                client = MongoClient(connection_string)
+                _clientes_mongo[connection_string] = client
+        db = client[db_name]
+        print(f"Conectado a la base de datos: {db_name}")
+
+        if collection_name not in db.list_collection_names():
+            print(f"La colección '{collection_name}' no existe. Creándola...")
+            db.create_collection(collection_name)
+        else:
+            print(f"La colección '{collection_name}' ya existe.")
+
+        return db[collection_name]
+    except Exception as e:
+        print(f"Error al conectar a Cosmos DB: {e}")
+        return None
+
+def insertar_datos(collection, datos):
+    try:
+        if isinstance(datos, list):
+            collection.insert_many(datos)
+            print("Datos insertados con éxito en la colección.")
+        else:
+            collection.insert_one(datos)
+            print("Documento insertado con éxito en la colección.")
+    except Exception as e:
+        print(f"Error al insertar datos: {e}")
+
+def reemplazar_datos(collection, datos):
+    """
+    Guarda las noticias sustituyendo la versión anterior de cada una (por 'url_noticia'),
+    de modo que una noticia que se vuelve a procesar porque ha cambiado no se duplica.
+
+    Retorna:
+    bool: True si se han guardado todas las noticias.
+    """
+    try:
+        operaciones = [
+            ReplaceOne({'url_noticia': dato['url_noticia']}, dato, upsert=True) if dato.get('url_noticia') else None
+            for dato in datos
+        ]
+        sin_url = [dato for dato, operacion in zip(datos, operaciones) if operacion is None]
+        operaciones = [operacion for operacion in operaciones if operacion is not None]
+        if operaciones:
+            collection.bulk_write(operaciones, ordered=False)
+        if sin_url:
+            collection.insert_many(sin_url)
+        print("Datos insertados con éxito en la colección.")
+        return True
+    except Exception as e:
+        print(f"Error al insertar datos: {e}")
+        return False
+
+def extraer_nombre_de_coleccion(url):
+    domain = urlparse(url).netloc.replace('www.', '').split('.')[0]
+    return domain
+
+
+def a_json(articulo_data):
+    """Serializa una noticia. Los valores que no son JSON (como el _id de MongoDB) se guardan como texto."""
+    return json.dumps(articulo_data, ensure_ascii=False, default=str)
+
+
+# Cada sumidero devuelve, desde `guardar` y `cerrar`, las noticias que ha terminado de
+# escribir (o de intentar escribir) en esa llamada como pares (articulo_data, escrita).
+# Con lotes, una noticia no se escribe al llamar a `guardar`, sino al vaciar su lote.
+
+
+class SumideroCosmos:
+    """
+    Guarda cada noticia en la colección de Cosmos DB de su periódico. Las noticias se
+    insertan en lotes de `tamano_lote`, así que como mucho se pierde un lote si el proceso falla,
+    y sustituyen a la versión anterior de la misma noticia si ya estaba guardada.
+    """
+
+    def __init__(self, connection_string, db_name, tamano_lote=TAMANO_LOTE):
+        self.connection_string = connection_string
+        self.db_name = db_name
+        self.tamano_lote = tamano_lote
+        self._colecciones = {}
+        self._pendientes = {}
+
+    def guardar(self, url_portada, articulo_data):
+        nombre = extraer_nombre_de_coleccion(url_portada)
+        lote = self._pendientes.setdefault(nombre, [])
+        lote.append(articulo_data)
+        if len(lote) >= self.tamano_lote:
+            return self._vaciar(nombre)
+        return []
+
+    def _vaciar(self, nombre):
+        lote = self._pendientes.pop(nombre, [])
+        if not lote:
+            return []
+        if nombre not in self._colecciones:
+            self._colecciones[nombre] = conectar_a_cosmos(self.connection_string, self.db_name, nombre)
+        collection = self._colecciones[nombre]
+        escrito = False
+        if collection is not None:  # Comparación explícita con None
+            escrito = reemplazar_datos(collection, lote)
+        return [(articulo_data, escrito) for articulo_data in lote]
+
+    def cerrar(self):
+        terminadas = []
+        for nombre in list(self._pendientes):
+            terminadas.extend(self._vaciar(nombre))
+        return terminadas
+
+
+class SumideroServiceBus:
+    """
+    Envía cada noticia como un mensaje JSON a una cola de Azure Service Bus. Se mantiene
+    un único emisor abierto durante la exploración y los mensajes se envían por lotes.
+    """
+
+    def __init__(self, connection_str, queue_name, tamano_lote=TAMANO_LOTE):
+        # azure-servicebus solo es necesario si se usa este sumidero
+        from azure.servicebus import ServiceBusClient
+
+        self.tamano_lote = tamano_lote
+        self._client = ServiceBusClient.from_connection_string(connection_str)
+        self._sender = self._client.get_queue_sender(queue_name)
+        self._pendientes = []
+
+    def guardar(self, url_portada, articulo_data):
+        self._pendientes.append((articulo_data, a_json(articulo_data)))
+        if len(self._pendientes) >= self.tamano_lote:
+            return self._vaciar()
+        return []
+
+    def _vaciar(self):
+        from azure.servicebus import ServiceBusMessage
+
+        pendientes, self._pendientes = self._pendientes, []
+        if not pendientes:
+            return []
+        try:
+            self._sender.send_messages([ServiceBusMessage(mensaje) for _, mensaje in pendientes])
+            print(f"{len(pendientes)} mensajes enviados a Service Bus.")
+            enviado = True
+        except Exception as e:
+            print(f"Error al enviar {len(pendientes)} mensajes a Service Bus: {e}")
+            enviado = False
+        return [(articulo_data, enviado) for articulo_data, _ in pendientes]
+
+    def cerrar(self):
+        try:
+            return self._vaciar()
+        finally:
+            self._sender.close()
+            self._client.close()
+
+
+class SumideroJSON:
+    """
+    Escribe cada noticia en una línea de un fichero JSON Lines en cuanto está lista,
+    de modo que lo procesado se conserva aunque la exploración se interrumpa.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._fichero = open(ruta, 'a', encoding='utf-8')
+
+    def guardar(self, url_portada, articulo_data):
+        self._fichero.write(a_json(dict(articulo_data, portada=url_portada)) + '\n')
+        self._fichero.flush()
+        return [(articulo_data, True)]
+
+    def cerrar(self):
+        self._fichero.close()
+        return []
+
+
+class Sumideros:
+    """
+    Reparte cada noticia entre varios sumideros. Un fallo en uno de ellos no impide
+    que la noticia llegue a los demás. Se usa con `with` para vaciar los lotes al terminar.
+
+    `al_escribir(articulo_data)` se llama cuando todos los sumideros han escrito la noticia,
+    que con lotes puede ser varias llamadas a `guardar` después (o al cerrar). Si algún
+    sumidero falla, no se llama.
+    """
+
+    def __init__(self, sumideros, al_escribir=None):
+        self.sumideros = sumideros
+        self.al_escribir = al_escribir
+        # Noticias que algún sumidero aún no ha escrito: id -> [noticia, sumideros que faltan, escrita en todos]
+        self._en_curso = {}
+
+    def guardar(self, url_portada, articulo_data):
+        if self.sumideros:
+            self._en_curso[id(articulo_data)] = [articulo_data, len(self.sumideros), True]
+        for sumidero in self.sumideros:
+            try:
+                terminadas = sumidero.guardar(url_portada, articulo_data)
+            except Exception as e:
+                print(f"Error al guardar la noticia en {type(sumidero).__name__}: {e}")
+                terminadas = [(articulo_data, False)]
+            self._terminar(terminadas)
+
+    def _terminar(self, terminadas):
+        """Anota las noticias que un sumidero ha terminado y avisa de las que ya están en todos."""
+        for articulo_data, escrita in terminadas or []:
+            estado = self._en_curso.get(id(articulo_data))
+            if estado is None:
+                continue
+            estado[1] -= 1
+            estado[2] = estado[2] and escrita
+            if estado[1] == 0:
+                del self._en_curso[id(articulo_data)]
+                if estado[2] and self.al_escribir is not None:
+                    self.al_escribir(articulo_data)
+
+    def cerrar(self):
+        for sumidero in self.sumideros:
+            try:
+                self._terminar(sumidero.cerrar())
+            except Exception as e:
+                print(f"Error al cerrar {type(sumidero).__name__}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def crear_sumideros(nombres=None, al_escribir=None):
+    """
+    Crea los sumideros a los que se envían las noticias.
+
+    Parámetros:
+    nombres (list): 'cosmos', 'servicebus' y/o 'json'. Por defecto, los de la variable
+        de entorno SUMIDEROS (separados por comas), o solo 'cosmos'.
+    al_escribir (callable): Se llama con cada noticia cuando ya está escrita en todos los sumideros.
+
+    Retorna:
+    Sumideros: Sumideros listos para usar con `with`.
+    """
+    if nombres is None:
+        nombres = os.getenv("SUMIDEROS", "cosmos").split(',')
+
+    sumideros = []
+    for nombre in (nombre.strip().lower() for nombre in nombres):
+        try:
+            if nombre == 'cosmos':
+                sumideros.append(SumideroCosmos(os.getenv("COSMOS_CONNECTION_STRING"), os.getenv("COSMOS_DATABASE_NAME")))
+            elif nombre == 'servicebus':
+                sumideros.append(SumideroServiceBus(os.getenv("SERVICEBUS_CONNECTION_STR"), os.getenv("QUEUE_NAME")))
+            elif nombre == 'json':
+                sumideros.append(SumideroJSON(os.getenv("FICHERO_JSON", "noticias.jsonl")))
+            elif nombre:
+                print(f"Sumidero desconocido: {nombre}")
+        except Exception as e:
+            print(f"Error al crear el sumidero '{nombre}': {e}")
+    return Sumideros(sumideros, al_escribir)
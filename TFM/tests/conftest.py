@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del scraper son scripts sueltos en TFM/: se importan desde ese directorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
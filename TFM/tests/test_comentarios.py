@@ -0,0 +1,90 @@
+from contextlib import nullcontext
+
+import pytest
+
+import comentarios
+from comentarios import obtener_comentarios, validar_plantilla
+
+URL_NOTICIA = "https://www.diariodecadiz.es/cadiz/titular_0_2001234567.html"
+
+
+class Respuesta:
+    def __init__(self, datos):
+        self.datos = datos
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.datos
+
+
+def comentario(n, respuestas=()):
+    return {"id": n, "author": {"name": f"Lector {n}"}, "date": "2024-05-01", "text": f"Comentario {n}",
+            "replies": list(respuestas)}
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    """Sustituye la petición HTTP por `paginas(url)`; devuelve las URLs pedidas."""
+    pedidas = []
+
+    def configurar(paginas, plantilla="https://api.ejemplo.com/hilos/{id}/comentarios?pagina={pagina}"):
+        monkeypatch.setattr(comentarios, "COMENTARIOS_API_URL", plantilla)
+
+        def get(url, endpoint=None):
+            pedidas.append(url)
+            return Respuesta(paginas(url))
+
+        monkeypatch.setattr(comentarios.sesion_http, "get", get)
+        monkeypatch.setattr(comentarios, "turno_host", lambda url: nullcontext())
+        return pedidas
+
+    return configurar
+
+
+def pagina_de(url):
+    return int(url.rsplit("=", 1)[1])
+
+
+def test_lee_todas_las_paginas_aunque_sean_menores_que_el_tamano_pedido(endpoint):
+    # El servidor usa páginas de 2 aunque se pidan 50: se sigue hasta la página vacía
+    datos = {1: [comentario(1), comentario(2, [comentario(3)])], 2: [comentario(4), comentario(5)], 3: []}
+    pedidas = endpoint(lambda url: {"comments": datos.get(pagina_de(url), [])})
+
+    resultado = obtener_comentarios(URL_NOTICIA)
+
+    assert [c["texto_comentario"] for c in resultado] == [f"Comentario {n}" for n in range(1, 6)]
+    assert resultado[0] == {"nombre": "Lector 1", "tiempo": "2024-05-01", "texto_comentario": "Comentario 1"}
+    assert len(pedidas) == 3
+    assert "/hilos/2001234567/" in pedidas[0]
+
+
+def test_para_al_llegar_al_total(endpoint):
+    pedidas = endpoint(lambda url: {"comments": [comentario(pagina_de(url))], "total": 2})
+    assert len(obtener_comentarios(URL_NOTICIA)) == 2
+    assert len(pedidas) == 2
+
+
+def test_no_repite_comentarios_si_el_servidor_ignora_la_pagina(endpoint):
+    pedidas = endpoint(lambda url: {"comments": [comentario(1), comentario(2)]})
+    assert len(obtener_comentarios(URL_NOTICIA)) == 2
+    assert len(pedidas) == 2
+
+
+def test_formato_distinto_usa_el_navegador(endpoint):
+    endpoint(lambda url: {"comments": [{"id": 1, "body": "otro campo"}]})
+    assert obtener_comentarios(URL_NOTICIA) is None
+    endpoint(lambda url: {"resultados": []})
+    assert obtener_comentarios(URL_NOTICIA) is None
+
+
+def test_sin_endpoint_configurado(monkeypatch):
+    monkeypatch.setattr(comentarios, "COMENTARIOS_API_URL", None)
+    assert obtener_comentarios(URL_NOTICIA) is None
+
+
+def test_la_plantilla_debe_incluir_la_pagina():
+    with pytest.raises(ValueError):
+        validar_plantilla("https://api.ejemplo.com/hilos/{id}/comentarios")
+    assert validar_plantilla(None) is None
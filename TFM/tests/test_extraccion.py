@@ -0,0 +1,93 @@
+import pytest
+
+from extraccion import articulos_portada, crear_soup, sin_senal_comentarios
+
+BACKENDS = ["lxml", "html.parser"]
+
+
+def articulo(n, relacionada=None):
+    aside = ""
+    if relacionada:
+        aside = (f'<aside class="related-content"><a href="{relacionada}">'
+                 f'<h2 class="subtitle-atom">Rel {n}</h2></a></aside>')
+    return (f'<article class="module-text-below-atom"><a class="media" title="Noticia {n}" '
+            f'href="/noticia-{n}.html">x</a>{aside}</article>')
+
+
+def seccion(titulo, *contenido, etiqueta="section", clase="module"):
+    span = f'<span class="title-text-title"> {titulo} </span>' if titulo else ""
+    return f'<{etiqueta} class="{clase}">{span}{"".join(contenido)}</{etiqueta}>'
+
+
+def resumen(html, parser, **kwargs):
+    return [(a.get('url_noticia'), a.get('seccion')) for a in articulos_portada(html, parser, **kwargs)]
+
+
+@pytest.mark.parametrize("parser", BACKENDS)
+def test_portada_plana(parser):
+    html = "<html><body>" + "".join([
+        seccion("Cádiz", articulo(1), articulo(2), articulo(3), articulo(4)),
+        seccion(None, articulo(5)),
+        seccion("Deportes", articulo(6)),
+        seccion("Cultura", articulo(7)),
+    ]) + "</body></html>"
+
+    assert resumen(html, parser, max_secciones=3, max_articulos=3) == [
+        ("/noticia-1.html", "Cádiz"), ("/noticia-2.html", "Cádiz"), ("/noticia-3.html", "Cádiz"),
+        # Sin título se mantiene el de la sección anterior...
+        ("/noticia-5.html", "Cádiz"),
+        ("/noticia-6.html", "Deportes"),
+    ]
+    # ...o es "OTRO" si se pide así
+    assert resumen(html, parser, max_secciones=2, max_articulos=1, heredar_titulo=False) == [
+        ("/noticia-1.html", "Cádiz"), ("/noticia-5.html", "OTRO"),
+    ]
+
+
+@pytest.mark.parametrize("parser", BACKENDS)
+def test_relacionadas_y_articulos_sin_enlace(parser):
+    html = seccion("Cádiz", articulo(1, relacionada="/rel-1.html"), '<article class="swiper-slide">sin enlace</article>')
+    primero, segundo = articulos_portada(html, parser)
+    assert primero['titular'] == "Noticia 1"
+    assert primero['noticias_relacionadas'] == [{'titulo_relacionado': "Rel 1", 'url_relacionada': "/rel-1.html"}]
+    assert segundo == {}
+
+
+@pytest.mark.parametrize("parser", BACKENDS)
+def test_secciones_anidadas_como_find_all(parser):
+    # div.mosaic-wrapper > section.module: las dos cuentan como secciones y la exterior
+    # tiene también los artículos de la interior, como en el recorrido con find_all
+    html = seccion(
+        None,
+        seccion("Provincia", articulo(1), articulo(2)),
+        articulo(3),
+        etiqueta="div", clase="mosaic-wrapper",
+    ) + seccion("Deportes", articulo(4))
+
+    assert resumen(html, parser, max_secciones=3, max_articulos=2) == [
+        # La exterior toma el título del primer span que contiene
+        ("/noticia-1.html", "Provincia"), ("/noticia-2.html", "Provincia"),
+        ("/noticia-1.html", "Provincia"), ("/noticia-2.html", "Provincia"),
+        ("/noticia-4.html", "Deportes"),
+    ]
+    # La exterior y la anidada ocupan dos de las secciones
+    assert resumen(html, parser, max_secciones=2, max_articulos=3) == [
+        ("/noticia-1.html", "Provincia"), ("/noticia-2.html", "Provincia"), ("/noticia-3.html", "Provincia"),
+        ("/noticia-1.html", "Provincia"), ("/noticia-2.html", "Provincia"),
+    ]
+
+
+@pytest.mark.parametrize("parser", BACKENDS)
+def test_cada_seccion_tiene_su_copia_del_articulo(parser):
+    html = seccion("Exterior", seccion("Interior", articulo(1)), etiqueta="div", clase="mosaic")
+    exterior, interior = articulos_portada(html, parser)
+    assert exterior is not interior
+    exterior['url_noticia'] = "cambiada"
+    assert interior['url_noticia'] == "/noticia-1.html"
+
+
+def test_sin_senal_comentarios():
+    ld_json = {'@type': 'NewsArticle'}
+    assert sin_senal_comentarios(crear_soup("<html><body><p>Texto</p></body></html>"), ld_json)
+    assert not sin_senal_comentarios(crear_soup("<div id='comments'></div>"), ld_json)
+    assert not sin_senal_comentarios(crear_soup("<p>Texto</p>"), {'commentCount': 0})
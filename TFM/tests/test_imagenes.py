@@ -0,0 +1,70 @@
+import io
+import random
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image, ImageDraw
+
+from imagenes import DISTANCIA_MAXIMA_HUELLA, IndiceImagenes, distancia, preparar_imagen, url_canonica_imagen
+
+CLIP = "https://static.grupojoly.com/clip/0f1e2d3c-4b5a-6978-8a9b-0c1d2e3f4a5b"
+
+
+def foto(ancho=1600, calidad=90, desplazamiento=0, semilla=1):
+    """JPEG sintético: un degradado con elipses de colores, que se puede guardar a otro tamaño y calidad."""
+    aleatorio = random.Random(semilla)
+    imagen = Image.new('RGB', (1600, 1000))
+    dibujo = ImageDraw.Draw(imagen)
+    for x in range(1600):
+        dibujo.line([(x, 0), (x, 1000)], fill=(x * 255 // 1600, 80, 255 - x * 255 // 1600))
+    for _ in range(12):
+        x, y = aleatorio.randrange(1400) + desplazamiento, aleatorio.randrange(800)
+        color = tuple(aleatorio.randrange(256) for _ in range(3))
+        dibujo.ellipse([x, y, x + aleatorio.randrange(80, 300), y + aleatorio.randrange(80, 300)], fill=color)
+    if ancho != 1600:
+        imagen = imagen.resize((ancho, ancho * 1000 // 1600), Image.LANCZOS)
+    salida = io.BytesIO()
+    imagen.save(salida, 'JPEG', quality=calidad)
+    return salida.getvalue()
+
+
+def huella(contenido, lado_maximo=640):
+    return preparar_imagen(contenido, lado_maximo)[0]
+
+
+def test_url_canonica_une_los_tamanos_de_una_foto():
+    assert url_canonica_imagen("http://static.grupojoly.com/clip/0F1E2D3C-4B5A-6978-8A9B-0C1D2E3F4A5B_source-aspect-ratio_1600w_0.jpg") == CLIP
+    assert url_canonica_imagen(f"{CLIP}_16-9-aspect-ratio_800w_0.webp") == CLIP
+    assert (url_canonica_imagen("https://cdn.ejemplo.es/fotos/playa_1600w_0.jpg?w=800&quality=70#x")
+            == url_canonica_imagen("https://cdn.ejemplo.es/fotos/playa_800w_0.jpg"))
+
+
+def test_url_canonica_conserva_los_parametros_que_identifican_la_imagen():
+    assert url_canonica_imagen("http://ejemplo.es/getimage.php?w=300&id=101") == "http://ejemplo.es/getimage.php?id=101"
+    assert url_canonica_imagen("http://ejemplo.es/getimage.php?id=101") != url_canonica_imagen("http://ejemplo.es/getimage.php?id=102")
+
+
+def test_la_huella_no_depende_del_lado_enviado_al_proveedor():
+    contenido = foto()
+    assert huella(contenido, 640) == huella(contenido, 0) == huella(contenido, 200) == huella(contenido, 1600)
+
+
+@pytest.mark.parametrize("ancho, calidad", [(800, 70), (400, 60), (640, 40)])
+def test_otras_versiones_de_la_foto_tienen_la_misma_huella(ancho, calidad):
+    assert distancia(huella(foto()), huella(foto(ancho, calidad))) <= DISTANCIA_MAXIMA_HUELLA
+
+
+def test_el_indice_no_confunde_fotos_casi_iguales(tmp_path):
+    indice = IndiceImagenes(str(tmp_path / "indice.sqlite"))
+    original = huella(foto())
+    indice.agregar("azure_vision", "v1", original, "https://ejemplo.es/a.jpg", {"descripcion": "playa"})
+
+    assert indice.buscar("azure_vision", "v1", huella(foto(800, 70))) == {"descripcion": "playa"}
+    # La misma escena con los elementos desplazados es otra foto de la serie: su huella
+    # difiere en 3 bits, que con el umbral anterior (4) se tomaba por la misma foto
+    otra = huella(foto(desplazamiento=70))
+    assert distancia(original, otra) > DISTANCIA_MAXIMA_HUELLA
+    assert indice.buscar("azure_vision", "v1", otra) is None
+    assert indice.buscar("azure_vision", "v2", original) is None
+    indice.cerrar()
@@ -0,0 +1,86 @@
+import pytest
+
+import limites_proveedores
+from limites_proveedores import Circuito, LimiteProveedor, ProveedorNoDisponible
+
+
+def test_circuito_se_abre_tras_los_fallos_seguidos():
+    circuito = Circuito("prueba", fallos_para_abrir=3, segundos_abierto=60)
+    for _ in range(2):
+        assert circuito.permitir() is False
+        circuito.fallo()
+    assert circuito.estado == "cerrado"
+    circuito.fallo()
+    assert circuito.estado == "abierto"
+    with pytest.raises(ProveedorNoDisponible):
+        circuito.permitir()
+    assert circuito.omitidas == 1
+
+
+def test_exito_reinicia_los_fallos():
+    circuito = Circuito("prueba", fallos_para_abrir=2, segundos_abierto=60)
+    circuito.fallo()
+    circuito.exito()
+    circuito.fallo()
+    assert circuito.estado == "cerrado"
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    circuito = Circuito("prueba", fallos_para_abrir=1, segundos_abierto=0)
+    circuito.fallo()
+    assert circuito.permitir() is True
+    assert circuito.estado == "semiabierto"
+    with pytest.raises(ProveedorNoDisponible):
+        circuito.permitir()
+
+    circuito.exito(prueba=True)
+    assert circuito.estado == "cerrado"
+    assert circuito.permitir() is False
+
+
+def test_prueba_fallida_vuelve_a_abrir():
+    circuito = Circuito("prueba", fallos_para_abrir=1, segundos_abierto=0)
+    circuito.fallo()
+    assert circuito.permitir() is True
+    circuito.fallo(prueba=True)
+    assert circuito.estado == "abierto"
+    assert circuito.aperturas == 2
+
+
+def test_llamadas_antiguas_no_cuentan_con_el_circuito_abierto():
+    circuito = Circuito("prueba", fallos_para_abrir=1, segundos_abierto=60)
+    circuito.fallo()
+    # Una llamada que empezó antes de abrirlo no lo cierra ni cuenta otra apertura
+    circuito.exito()
+    circuito.fallo()
+    assert circuito.estado == "abierto"
+    assert circuito.aperturas == 1
+
+
+def test_liberar_suelta_la_prueba():
+    circuito = Circuito("prueba", fallos_para_abrir=1, segundos_abierto=0)
+    circuito.fallo()
+    assert circuito.permitir() is True
+    circuito.liberar(prueba=True)
+    assert circuito.permitir() is True
+
+
+def test_cubo_de_fichas_admite_rafaga_y_luego_espera():
+    limitador = LimiteProveedor("prueba", por_minuto=60, simultaneas=2)
+    assert limitador._reservar() == 0
+    assert limitador._reservar() == 0
+    # Sin fichas, la tercera petición espera a que se reponga una (1 por segundo)
+    assert limitador._reservar() == pytest.approx(1.0, abs=0.05)
+
+
+def test_429_reduce_la_tasa_y_los_exitos_la_recuperan(monkeypatch):
+    monkeypatch.setattr(limites_proveedores, "FRACCION_RECUPERACION", 0.25)
+    limitador = LimiteProveedor("prueba", por_minuto=60, simultaneas=1)
+    limitador.limitado(pausa=10)
+    assert limitador.tasa == pytest.approx(0.5)
+    assert limitador._reservar() >= 9
+    limitador.exito()
+    assert limitador.tasa == pytest.approx(0.75)
+    for _ in range(5):
+        limitador.exito()
+    assert limitador.tasa == pytest.approx(1.0)
@@ -0,0 +1,70 @@
+import threading
+
+import navegador
+from navegador import PoolNavegadores
+
+
+class DriverFalso:
+    def __init__(self):
+        self.cerrado = False
+
+    def quit(self):
+        self.cerrado = True
+
+
+def test_cerrar_mientras_arranca_un_navegador_no_lo_deja_abierto(monkeypatch):
+    arrancando = threading.Event()
+    continuar = threading.Event()
+    creados = []
+
+    def crear_navegador(driver_path, binary_location):
+        arrancando.set()
+        continuar.wait(5)
+        creados.append(DriverFalso())
+        return creados[-1]
+
+    monkeypatch.setattr(navegador, "crear_navegador", crear_navegador)
+    pool = PoolNavegadores(1)
+    errores = []
+
+    def obtener():
+        try:
+            pool._obtener()
+        except RuntimeError as e:
+            errores.append(e)
+
+    hilo = threading.Thread(target=obtener)
+    hilo.start()
+    assert arrancando.wait(5)
+    pool.cerrar()
+    continuar.set()
+    hilo.join(5)
+
+    assert len(errores) == 1
+    assert creados[0].cerrado
+
+
+def test_descartar_deja_hueco_para_quien_espera(monkeypatch):
+    monkeypatch.setattr(navegador, "crear_navegador", lambda *args: DriverFalso())
+    pool = PoolNavegadores(1)
+    primero = pool._obtener()
+    obtenido = []
+    hilo = threading.Thread(target=lambda: obtenido.append(pool._obtener()))
+    hilo.start()
+    pool._descartar(primero)
+    hilo.join(5)
+
+    assert primero.cerrado
+    assert obtenido and obtenido[0] is not primero
+    pool.cerrar()
+    assert obtenido[0].cerrado
+
+
+def test_relacionadas_del_navegador_con_urls_absolutas():
+    class DriverConRelacionadas:
+        def execute_script(self, script):
+            assert script == navegador.SCRIPT_RELACIONADAS
+            return [{'titulo_relacionado': "Uno", 'url_relacionada': "/cadiz/noticia_0_2.html"}]
+
+    relacionadas = navegador.extraer_relacionadas(DriverConRelacionadas(), "https://www.diariodecadiz.es/cadiz/noticia_0_1.html")
+    assert relacionadas == [{'titulo_relacionado': "Uno", 'url_relacionada': "https://www.diariodecadiz.es/cadiz/noticia_0_2.html"}]
@@ -0,0 +1,48 @@
+import planificacion
+from planificacion import Presupuesto, normalizar_url, planificar
+
+PORTADA = "https://www.diariodecadiz.es/"
+
+
+def noticia(n, seccion="Cádiz"):
+    return {'titular': f"Noticia {n}", 'url_noticia': f"/cadiz/noticia_0_{n}.html", 'seccion': seccion}
+
+
+def test_normalizar_url_reconoce_la_misma_noticia():
+    canonica = "https://diariodecadiz.es/cadiz/noticia_0_1.html"
+    assert normalizar_url("/cadiz/noticia_0_1.html#comentarios", PORTADA) == canonica
+    assert normalizar_url("http://WWW.DiariodeCadiz.es/cadiz/noticia_0_1.html?utm_source=x&fbclid=y") == canonica
+
+
+def test_normalizar_url_ordena_los_parametros_que_cambian_la_noticia():
+    assert (normalizar_url("https://diariodecadiz.es/buscar?q=feria&pagina=2")
+            == normalizar_url("https://diariodecadiz.es/buscar?pagina=2&q=feria&utm_medium=rss"))
+    assert normalizar_url("https://diariodecadiz.es") == "https://diariodecadiz.es/"
+
+
+def test_sin_presupuesto_se_mantiene_el_orden_de_la_portada():
+    articulos = [noticia(1), noticia(3), noticia(2)]
+    entregados = [a['titular'] for _, a in planificar({PORTADA: articulos}, Presupuesto(0, 0))]
+    assert entregados == ["Noticia 1", "Noticia 3", "Noticia 2"]
+
+
+def test_con_presupuesto_se_procesan_primero_las_mas_valiosas(monkeypatch):
+    monkeypatch.setattr(planificacion, "SECCIONES_PRIORITARIAS", ["deportes"])
+    articulos = [noticia(1), noticia(2), noticia(3, seccion="Deportes")]
+    entregados = [a['titular'] for _, a in planificar({PORTADA: articulos}, Presupuesto(2, 0))]
+    assert entregados == ["Noticia 3", "Noticia 1"]
+
+
+def test_cada_noticia_se_entrega_una_vez_y_por_turnos_entre_portadas():
+    otra = "https://www.europasur.es/"
+    articulos_por_sitio = {
+        PORTADA: [noticia(1), dict(noticia(1), seccion="Otra"), noticia(2)],
+        otra: [{'titular': "Europa 1", 'url_noticia': "https://www.europasur.es/noticia_0_5.html"}],
+    }
+    vistas = set()
+    entregados = [a['titular'] for _, a in planificar(articulos_por_sitio, Presupuesto(0, 0), vistas)]
+    assert entregados == ["Noticia 1", "Europa 1", "Noticia 2"]
+    assert len(vistas) == 3
+
+    # Las noticias ya vistas no se vuelven a entregar en el siguiente nivel
+    assert list(planificar({PORTADA: [noticia(2)]}, Presupuesto(0, 0), vistas)) == []
@@ -0,0 +1,62 @@
+import os
+
+import registro_noticias
+from registro_noticias import FiltroBloom, RegistroNoticias, SinRegistro, abrir_registro
+
+URL = "https://www.diariodecadiz.es/cadiz/noticia_0_1.html"
+
+
+def test_bloom_sin_falsos_negativos_y_persistente(tmp_path):
+    ruta = str(tmp_path / "filtro.bloom")
+    filtro = FiltroBloom(ruta, tamano_bytes=4096)
+    claves = [f"https://ejemplo.es/noticia_{n}.html" for n in range(500)]
+    for clave in claves:
+        filtro.agregar(clave)
+    assert all(clave in filtro for clave in claves)
+    falsos_positivos = sum(f"https://ejemplo.es/otra_{n}.html" in filtro for n in range(1000))
+    assert falsos_positivos < 20
+    filtro.cerrar()
+
+    filtro = FiltroBloom(ruta)
+    assert not filtro.nuevo
+    assert filtro.num_bits == 4096 * 8
+    assert all(clave in filtro for clave in claves)
+    filtro.cerrar()
+
+
+def test_registro_reconoce_la_noticia_por_url_normalizada(tmp_path):
+    with RegistroNoticias(str(tmp_path / "registro")) as registro:
+        assert registro.fecha_guardada(URL) is None
+        registro.registrar(URL, "2026-10-18T10:00:00+02:00")
+        assert registro.fecha_guardada("http://diariodecadiz.es/cadiz/noticia_0_1.html?utm_source=x#c") == "2026-10-18T10:00:00+02:00"
+
+
+def test_registro_reconstruye_el_filtro_borrado(tmp_path):
+    ruta = str(tmp_path / "registro")
+    with RegistroNoticias(ruta) as registro:
+        registro.registrar(URL, "2026-10-18")
+    os.remove(ruta + ".bloom")
+    with RegistroNoticias(ruta) as registro:
+        assert registro.fecha_guardada(URL) == "2026-10-18"
+
+
+def test_noticias_sin_fecha_se_reprocesan_pasado_el_plazo(tmp_path, monkeypatch):
+    ahora = [1000000.0]
+    monkeypatch.setattr(registro_noticias.time, "time", lambda: ahora[0])
+    with RegistroNoticias(str(tmp_path / "registro"), horas_sin_fecha=24) as registro:
+        registro.registrar(URL, None)
+        assert registro.fecha_guardada(URL) == ''
+        ahora[0] += 24 * 3600
+        assert registro.fecha_guardada(URL) is None
+
+        # Las que tienen dateModified no caducan
+        registro.registrar(URL, "2026-10-18")
+        ahora[0] += 365 * 24 * 3600
+        assert registro.fecha_guardada(URL) == "2026-10-18"
+
+
+def test_sin_ruta_no_hay_registro():
+    registro = abrir_registro("")
+    assert isinstance(registro, SinRegistro)
+    registro.registrar(URL, "2026-10-18")
+    assert registro.fecha_guardada(URL) is None
@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+import sentimiento_gemini
+from sentimiento_gemini import INDETERMINADO, RespuestaInvalida, lotes, validar_respuesta
+
+
+def test_validar_respuesta_descarta_los_elementos_no_validos():
+    respuesta = json.dumps([
+        {"id": 0, "sentimiento": "positivo", "confianza": 90.4},
+        {"id": 0, "sentimiento": "NEGATIVO", "confianza": 80},  # id repetido
+        {"id": 1, "sentimiento": "ENFADADO", "confianza": 80},
+        {"id": 2, "sentimiento": "NEUTRAL", "confianza": 120},
+        {"id": 7, "sentimiento": "NEUTRAL", "confianza": 50},  # fuera del lote
+        "texto suelto",
+        {"id": 3, "sentimiento": "NEGATIVO", "confianza": 65},
+    ])
+    assert validar_respuesta(respuesta, 4) == {
+        0: {"sentimiento": "POSITIVO", "confianza": 90},
+        3: {"sentimiento": "NEGATIVO", "confianza": 65},
+    }
+
+
+@pytest.mark.parametrize("texto", ['[{"id": 0, "sentimiento": "POSI', '{"id": 0}'])
+def test_validar_respuesta_rechaza_json_cortado_o_sin_lista(texto):
+    with pytest.raises(RespuestaInvalida):
+        validar_respuesta(texto, 1)
+
+
+def test_lotes_respeta_comentarios_y_caracteres(monkeypatch):
+    monkeypatch.setattr(sentimiento_gemini, "COMENTARIOS_POR_LOTE_GEMINI", 3)
+    monkeypatch.setattr(sentimiento_gemini, "CARACTERES_POR_LOTE_GEMINI", 10)
+    pares = list(enumerate(["aaaa", "bbbb", "cc", "ddd", "e", "f", "g", "hhhhhhhhhhhhhh"]))
+    # Se corta al llegar a 3 comentarios o al pasar de 10 caracteres; un comentario más largo va solo
+    assert [[posicion for posicion, _ in lote] for lote in lotes(pares)] == [[0, 1, 2], [3, 4, 5], [6], [7]]
+
+
+def respuesta(texto=None, motivo="STOP", bloqueo=None):
+    candidatos = [] if motivo is None else [SimpleNamespace(finish_reason=SimpleNamespace(name=motivo))]
+    return SimpleNamespace(
+        prompt_feedback=SimpleNamespace(block_reason=SimpleNamespace(name=bloqueo) if bloqueo else None),
+        candidates=candidatos,
+        text=texto,
+    )
+
+
+@pytest.mark.parametrize("falsa", [
+    respuesta(motivo="SAFETY"),
+    respuesta(motivo="MAX_TOKENS"),
+    respuesta(bloqueo="OTHER"),
+    respuesta(motivo=None),
+])
+def test_respuestas_bloqueadas_o_cortadas_no_son_validas(monkeypatch, falsa):
+    monkeypatch.setattr(sentimiento_gemini, "model", SimpleNamespace(generate_content=lambda *a, **k: falsa))
+    with pytest.raises(RespuestaInvalida):
+        sentimiento_gemini._clasificar_lote([(0, "comentario")])
+
+
+def test_clasificar_aisla_el_comentario_bloqueado(monkeypatch):
+    def clasificar_lote(lote):
+        if any(texto == "ofensivo" for _, texto in lote):
+            raise RespuestaInvalida("Gemini ha bloqueado la respuesta (SAFETY)")
+        return {i: {"sentimiento": "NEUTRAL", "confianza": 70} for i in range(len(lote))}
+
+    monkeypatch.setattr(sentimiento_gemini, "_clasificar_lote", clasificar_lote)
+    resultados = {}
+    sentimiento_gemini._clasificar(list(enumerate(["uno", "dos", "ofensivo", "cuatro"])), resultados)
+    assert resultados[2] == INDETERMINADO
+    assert all(resultados[i] == {"sentimiento": "NEUTRAL", "confianza": 70} for i in (0, 1, 3))
@@ -0,0 +1,71 @@
+import pytest
+
+import sentimiento_local
+from sentimiento_local import clasificar_lexico, triaje, UMBRAL_CONFIANZA_LOCAL
+
+
+@pytest.fixture(autouse=True)
+def sin_modelo(monkeypatch):
+    # Las pruebas usan solo el léxico, aunque haya un modelo entrenado en el directorio
+    monkeypatch.setattr(sentimiento_local, "_modelo", None)
+    monkeypatch.setattr(sentimiento_local, "_modelo_cargado", True)
+    monkeypatch.setattr(sentimiento_local, "SENTIMIENTO_LOCAL", True)
+
+
+@pytest.mark.parametrize("texto, etiqueta", [
+    ("Muy bueno, enhorabuena", "POSITIVO"),
+    ("Qué vergüenza, sois unos inútiles", "NEGATIVO"),
+    ("Una chapuza lamentable", "NEGATIVO"),
+])
+def test_comentarios_claros_superan_el_umbral(texto, etiqueta):
+    resultado, confianza = clasificar_lexico(texto)
+    assert resultado == etiqueta
+    assert confianza >= UMBRAL_CONFIANZA_LOCAL
+
+
+@pytest.mark.parametrize("texto", [
+    # 'sin' y 'nada' no invierten la palabra siguiente
+    "Sin duda, excelente trabajo",
+    "Gracias por nada, payasos",
+    # Ironía: una sola palabra positiva
+    "Genial, otra vez sin agua en el barrio",
+    # La negación no pasa de la coma, y las dos partes se contradicen
+    "No es bueno, es excelente y genial",
+])
+def test_comentarios_dudosos_no_se_quedan_en_local(texto):
+    _, confianza = clasificar_lexico(texto)
+    assert confianza < UMBRAL_CONFIANZA_LOCAL
+
+
+def test_sin_duda_no_es_negativo():
+    assert clasificar_lexico("Sin duda, excelente trabajo")[0] == "POSITIVO"
+
+
+def test_gracias_por_nada_no_es_positivo():
+    assert clasificar_lexico("Gracias por nada, payasos")[0] == "NEGATIVO"
+
+
+def test_negacion_invierte_hasta_la_puntuacion():
+    assert clasificar_lexico("no es bueno ni bonito")[0] == "NEGATIVO"
+    # Tras la coma ya no hay negación: "excelente" sigue siendo positivo
+    etiqueta, _ = clasificar_lexico("no me lo esperaba, excelente y genial")
+    assert etiqueta == "POSITIVO"
+
+
+def test_sin_palabras_del_lexico_es_neutral():
+    assert clasificar_lexico("El pleno se celebra el martes") == ("NEUTRAL", 0.0)
+
+
+def test_triaje_envia_solo_los_dudosos():
+    enviados = []
+
+    def remoto(textos):
+        enviados.extend(textos)
+        return [{"sentimiento": "REMOTO"} for _ in textos]
+
+    textos = ["Muy bueno, enhorabuena", "Genial, otra vez sin agua en el barrio", ""]
+    resultados = triaje(textos, remoto, lambda etiqueta, confianza: {"sentimiento": etiqueta})
+
+    assert enviados == ["Genial, otra vez sin agua en el barrio", ""]
+    assert resultados[0] == {"sentimiento": "POSITIVO", "origen": "local"}
+    assert resultados[1] == resultados[2] == {"sentimiento": "REMOTO"}
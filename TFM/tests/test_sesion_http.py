@@ -0,0 +1,25 @@
+import pytest
+
+import sesion_http
+from limites_proveedores import Circuito
+
+
+class SesionQueFalla:
+    def __init__(self, error):
+        self.error = error
+
+    def request(self, metodo, url, **kwargs):
+        raise self.error
+
+
+def test_error_que_no_es_de_red_suelta_la_prueba_del_circuito(monkeypatch):
+    circuito = Circuito("prueba", fallos_para_abrir=1, segundos_abierto=0)
+    circuito.fallo()
+    monkeypatch.setattr(sesion_http.limites_proveedores, "circuito", lambda endpoint: circuito)
+    monkeypatch.setattr(sesion_http, "obtener_sesion", lambda: SesionQueFalla(ValueError("URL no válida")))
+
+    with pytest.raises(ValueError):
+        sesion_http.get("http://ejemplo.invalid/", endpoint="prueba")
+
+    # La siguiente llamada puede volver a probar el proveedor
+    assert circuito.permitir() is True